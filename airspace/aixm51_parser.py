@@ -0,0 +1,284 @@
+'''Airspace airspace.aixm51_parser Module
+
+Airspace source for the AIXM 5.1 (GML) format.
+
+The file is streamed with iterparse: every <aixm:Airspace> feature is decoded as soon as
+it is complete and the XML elements are released right away. Only the normalized admin
+data & a compact coordinate array are kept per Airspace, so multi-GB EAD exports are
+processed in bounded memory.
+
+Supported horizontal projection segments:
+
+    - gml:GeodesicString / gml:LineStringSegment (gml:posList or gml:pos)
+    - gml:ArcByCenterPoint (startAngle/endAngle as bearings from the true north, the arc is
+      drawn clockwise when endAngle > startAngle, counter-clockwise otherwise)
+    - gml:CircleByCenterPoint
+
+The coordinate lists are decoded with NumPy and the arcs are densified with vectorized
+geodesic computations.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+
+from lxml import etree
+
+from .aixm_parser import AirspaceSource, format_vertical_limit, get_geod
+
+logger = logging.getLogger(__name__)
+
+AIXM_NS = 'http://www.aixm.aero/schema/5.1'
+GML_NS = 'http://www.opengis.net/gml/3.2'
+
+AIXM = '{' + AIXM_NS + '}'
+GML = '{' + GML_NS + '}'
+
+# Angular step used to densify the arcs & circles (degree)
+ARC_STEP = 5.625
+
+# Radius units => meter
+RADIUS_UNITS = {
+    'NM': 1852.0,
+    '[NMI_I]': 1852.0,
+    'KM': 1000.0,
+    'M': 1.0,
+    'FT': 0.3048,
+    '[FT_I]': 0.3048,
+}
+
+# AIXM 5.1 vertical reference => AIXM 4.5 vertical distance code
+VERTICAL_REFERENCES = {
+    'STD': 'STD',
+    'MSL': 'ALT',
+    'W84': 'ALT',
+    'SFC': 'HEI',
+}
+
+
+def parse_pos_list(text, axis_lon_first=False):
+    '''Decode a gml:posList (or a sequence of gml:pos) in one vectorized operation
+
+    Args:
+        text ([str]): the whitespace separated coordinates
+        axis_lon_first ([bool], optional): Defaults to False (EPSG:4326 lat/long order)
+
+    Returns:
+        [ndarray]: (n, 2) array of [lat, long]
+    '''
+
+    coordinates = np.array(text.split(), dtype=np.float64).reshape(-1, 2)
+    if axis_lon_first:
+        coordinates = coordinates[:, ::-1]
+    return coordinates
+
+
+def arc_points(center, radius, start_angle, end_angle, clockwise):
+    '''Densify an arc of geodesic circle
+
+    Args:
+        center ([lat, long]): the center of the arc
+        radius ([float]): the radius in meter
+        start_angle ([float]): bearing of the first point (degree)
+        end_angle ([float]): bearing of the last point (degree)
+        clockwise ([bool]): the drawing direction
+
+    Returns:
+        [ndarray]: (n, 2) array of [lat, long] including both ends
+    '''
+
+    if clockwise:
+        sweep = (end_angle - start_angle) % 360 or 360
+    else:
+        sweep = -((start_angle - end_angle) % 360 or 360)
+    count = max(int(abs(sweep) / ARC_STEP), 1) + 1
+    angles = start_angle + np.linspace(0, sweep, count)
+
+    longs, lats, _ = get_geod().fwd(
+        np.full(count, center[1]), np.full(count, center[0]), angles, np.full(count, radius)
+    )
+    return np.column_stack((lats, longs))
+
+
+def _radius(elem):
+    '''Radius of an arc/circle segment in meter
+    '''
+
+    radius = elem.find(GML + 'radius')
+    return float(radius.text) * RADIUS_UNITS[radius.get('uom', 'M').upper()]
+
+
+def _center(elem, axis_lon_first):
+    '''Center of an arc/circle segment ([lat, long])
+    '''
+
+    pos = elem.find('.//' + GML + 'pos')
+    return parse_pos_list(pos.text, axis_lon_first)[0]
+
+
+def _vertical_limit(volume, side):
+    '''Normalize the upper/lower limit of an AirspaceVolume like the AIXM 4.5 ones
+
+    Args:
+        volume ([Element]): the aixm:AirspaceVolume
+        side ([str]): 'upper' or 'lower'
+
+    Returns:
+        [str]: the normalized limit (see format_vertical_limit) or None
+    '''
+
+    limit = volume.find(AIXM + side + 'Limit')
+    if limit is None or limit.text is None:
+        return None
+    value = limit.text.strip()
+    if value == 'GND':
+        return format_vertical_limit('HEI', '0', 'FT')
+    if value == 'UNL':
+        return format_vertical_limit('STD', '999', 'FL')
+    reference = volume.findtext(AIXM + side + 'LimitReference', 'MSL')
+    return format_vertical_limit(
+        VERTICAL_REFERENCES.get(reference, reference), value, limit.get('uom', 'FT').upper()
+    )
+
+
+def decode_surface(surface):
+    '''Decode the exterior ring of an aixm:Surface
+
+    Args:
+        surface ([Element]): the aixm:Surface (or any element containing gml:segments / gml:posList)
+
+    Returns:
+        [ndarray]: (n, 2) array of [lat, long]
+    '''
+
+    axis_lon_first = 'CRS84' in (surface.get('srsName') or '')
+    parts = []
+
+    exterior = surface.find('.//' + GML + 'exterior')
+    if exterior is None:
+        exterior = surface
+
+    for elem in exterior.iter(GML + 'GeodesicString', GML + 'LineStringSegment',
+                              GML + 'ArcByCenterPoint', GML + 'CircleByCenterPoint',
+                              GML + 'LinearRing'):
+        if elem.tag == GML + 'ArcByCenterPoint':
+            start_angle = float(elem.findtext(GML + 'startAngle'))
+            end_angle = float(elem.findtext(GML + 'endAngle'))
+            parts.append(arc_points(
+                _center(elem, axis_lon_first), _radius(elem),
+                start_angle, end_angle, clockwise=end_angle > start_angle
+            ))
+        elif elem.tag == GML + 'CircleByCenterPoint':
+            parts.append(arc_points(_center(elem, axis_lon_first), _radius(elem), 0, 360, True))
+        else:
+            pos_list = elem.findtext(GML + 'posList')
+            if pos_list is None:
+                pos_list = ' '.join(pos.text for pos in elem.iter(GML + 'pos'))
+            parts.append(parse_pos_list(pos_list, axis_lon_first))
+
+    if not parts:
+        return np.empty((0, 2))
+    return np.concatenate(parts)
+
+
+class Aixm51Source(AirspaceSource):
+    '''Class to process Airspace information contained in an AIXM 5.1 source file
+
+    The Airspace uuid is the gml:identifier of the feature.
+    '''
+
+    def __init__(self, filename):
+        '''Stream the AIXM 5.1 source & decode all its Airspace features
+
+        Args:
+            filename ([str]): the file system file containing the AIXM 5.1 Airspace Informations
+        '''
+
+        self.filename = filename
+        self._arc_lookup = []
+        self._airspaces = []
+        self._admin_data = {}
+        self._geometry = {}
+
+        for _, elem in etree.iterparse(filename, events=('end',)):
+            if elem.tag == AIXM + 'Airspace':
+                self._add_airspace(elem)
+
+            parent = elem.getparent()
+            if parent is not None and parent.getparent() is None:
+                # Top-level member completed: release it & everything before it
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+        logger.debug('AIXM 5.1 %s: %s airspaces decoded', filename, len(self._airspaces))
+
+    def _add_airspace(self, elem):
+        '''Decode & store an aixm:Airspace feature
+
+        Args:
+            elem ([Element]): the aixm:Airspace
+        '''
+
+        uuid = elem.findtext(GML + 'identifier') or elem.get(GML + 'id')
+        time_slice = elem.find('.//' + AIXM + 'AirspaceTimeSlice')
+        if time_slice is None:
+            logger.warning('AIXM 5.1 %s: airspace %s without time slice', self.filename, uuid)
+            return
+
+        admin_data = {}
+        admin_data['codeId'] = time_slice.findtext(AIXM + 'designator')
+        admin_data['codeType'] = time_slice.findtext(AIXM + 'type')
+        admin_data['txtName'] = time_slice.findtext(AIXM + 'name')
+        admin_data['codeClass'] = time_slice.findtext(
+            AIXM + 'class/' + AIXM + 'AirspaceLayerClass/' + AIXM + 'classification')
+        admin_data['codeActivity'] = time_slice.findtext(AIXM + 'activity') or time_slice.findtext(
+            './/' + AIXM + 'AirspaceActivation/' + AIXM + 'activity')
+        volume = time_slice.find('.//' + AIXM + 'AirspaceVolume')
+        admin_data['upper'] = _vertical_limit(volume, 'upper') if volume is not None else None
+        admin_data['lower'] = _vertical_limit(volume, 'lower') if volume is not None else None
+
+        surface = time_slice.find('.//' + AIXM + 'horizontalProjection/' + AIXM + 'Surface')
+        if surface is not None:
+            geometry = decode_surface(surface)
+        else:
+            geometry = np.empty((0, 2))
+
+        self._airspaces.append({'uuid': uuid, 'name': admin_data['codeId']})
+        self._admin_data[uuid] = admin_data
+        self._geometry[uuid] = geometry
+
+    def list_airspace_uuid(self):
+        '''List all Airspace contained in the specific source file
+
+        Returns:
+            list: list of dictionary {'uuid': file_specific_uuid , 'name': airspace_name }
+        '''
+
+        return list(self._airspaces)
+
+    def airspace_admin_data(self, uuid):
+        '''Extract & normalize the Airspace Admin data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [dict]: the Airspace Admin data as a dictionary
+        '''
+
+        return dict(self._admin_data[uuid])
+
+    def airspace_geometry_data(self, uuid):
+        '''Extract & normalize the Airspace GIS data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [list]: the Airspace GIS data as a list of coordinates that can be used to create a "Polygon"
+        '''
+
+        return [[lat, long, None] for lat, long in self._geometry[uuid].tolist()]
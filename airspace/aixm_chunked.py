@@ -0,0 +1,340 @@
+'''Airspace airspace.aixm_chunked Module
+
+Multi-core parsing of a single (huge) AIXM 4.5 file.
+
+The file is split into byte ranges aligned on the top-level <Ase>, <Abd> and <Gbr>
+element boundaries. Each range is parsed by a worker process building a per-chunk
+index of the byte ranges of these elements (keyed by their "mid"). The per-chunk indices
+are merged into a ChunkedAixmSource which is a drop-in replacement of the AixmSource.
+
+Only the byte ranges are kept in memory: a lookup reads & parses the element from the
+file. The last ELEMENT_CACHE_SIZE parsed elements are cached (least recently used
+eviction: a <Gbr> border is shared by many Airspaces).
+
+The split is a single forward pass on the file skipping the comments & CDATA sections: only
+the section openers & the first element after each split offset are searched.
+
+Limits of the split:
+    - a top-level element must not start inside a processing instruction
+    - the chunk wrapper declares the prefixed namespaces of the root element (ex. xsi). A
+      default namespace (xmlns="...") is not supported, like in the AixmSource XPath queries
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+import mmap
+import multiprocessing
+import os
+import re
+from collections import OrderedDict
+
+from lxml import etree
+
+from .aixm_parser import AixmSource
+
+logger = logging.getLogger(__name__)
+
+# Top-level elements we are splitting the file on
+CHUNK_OPEN_TAG = re.compile(br'<(?:Ase|Abd|Gbr)[\s>]')
+CHUNK_TAG = re.compile(br'<(/?)(Ase|Abd|Gbr)[\s>]')
+# Last end tag of a byte range (the greedy prefix backtracks from the end of the range)
+LAST_CLOSE_TAG = re.compile(br'.*</(?:Ase|Abd|Gbr)>', re.DOTALL)
+
+# Comments & CDATA sections: a tag inside them is not an element boundary
+SECTION_OPEN = re.compile(br'<!--|<!\[CDATA\[')
+SECTION_CLOSE = {b'<!--': b'-->', b'<![CDATA[': b']]>'}
+
+# Root element start tag & its prefixed namespace declarations
+ROOT_TAG = re.compile(br'<(?![?!])[^>]*>')
+NAMESPACE_DECLARATION = re.compile(br'xmlns:[\w.-]+\s*=\s*("[^"]*"|\'[^\']*\')')
+
+# Wrapper making a chunk a well formed XML document (see chunk_header)
+CHUNK_HEADER = b'<chunk xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+CHUNK_FOOTER = b'</chunk>'
+
+# Parsed elements kept by a ChunkedAixmSource (least recently used eviction)
+ELEMENT_CACHE_SIZE = 256
+
+
+def _regions(data, position=0):
+    '''Byte ranges outside of the comments & CDATA sections (forward pass)
+
+    Args:
+        data ([bytes]): the file content (bytes or mmap)
+        position ([int], optional): Defaults to 0. Start offset (outside of any section)
+
+    Returns:
+        [generator]: generator of (start, stop) byte offsets
+    '''
+
+    while True:
+        match = SECTION_OPEN.search(data, position)
+        if match is None:
+            yield position, len(data)
+            return
+        yield position, match.start()
+        close = SECTION_CLOSE[match.group(0)]
+        position = data.find(close, match.end())
+        if position < 0:
+            return
+        position += len(close)
+
+
+def chunk_header(data):
+    '''Chunk wrapper start tag declaring the prefixed namespaces of the root element
+
+    Args:
+        data ([bytes]): the beginning of the file (up to the first top-level element)
+
+    Returns:
+        [bytes]: the <chunk> start tag
+    '''
+
+    for start, stop in _regions(data):
+        match = ROOT_TAG.search(data, start, stop)
+        if match is not None:
+            break
+    else:
+        return CHUNK_HEADER
+    declarations = [declaration.group(0) for declaration in NAMESPACE_DECLARATION.finditer(match.group(0))]
+    if not declarations:
+        return b'<chunk>'
+    return b'<chunk ' + b' '.join(declarations) + b'>'
+
+
+def split_aixm(filename, chunks):
+    '''Split an AIXM 4.5 file into byte ranges aligned on top-level elements
+
+    The tags inside the comments & CDATA sections are not boundaries (see the module limits).
+
+    Args:
+        filename ([str]): the AIXM 4.5 file
+        chunks ([int]): the expected number of byte ranges
+
+    Returns:
+        [list]: list of (start, stop) byte offsets
+    '''
+
+    with open(filename, 'rb') as aixm_file:
+        size = os.fstat(aixm_file.fileno()).st_size
+        if size == 0:
+            return []
+        data = mmap.mmap(aixm_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            boundaries = []
+            data_stop = -1
+            step = 0
+            for start, stop in _regions(data):
+                position = start
+                while len(boundaries) < max(chunks, 1):
+                    if boundaries:
+                        # First element after the next split offset
+                        position = max(position, boundaries[0] + len(boundaries) * step)
+                    match = CHUNK_OPEN_TAG.search(data, position, stop) if position < stop else None
+                    if match is None:
+                        break
+                    if not boundaries:
+                        step = (size - match.start()) // max(chunks, 1)
+                    boundaries.append(match.start())
+                    position = match.end()
+                if boundaries:
+                    match = LAST_CLOSE_TAG.match(data, max(start, boundaries[-1]), stop)
+                    if match is not None:
+                        data_stop = match.end()
+        finally:
+            data.close()
+
+    if not boundaries or data_stop < 0:
+        return []
+    boundaries.append(data_stop)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def _element_ranges(data):
+    '''Byte ranges of the top-level <Ase>, <Abd> and <Gbr> elements of a chunk
+
+    Args:
+        data ([bytes]): the chunk
+
+    Returns:
+        [list]: list of (tag, start, stop) in the document order
+    '''
+
+    ranges = []
+    element_start = None
+    for start, stop in _regions(data):
+        for match in CHUNK_TAG.finditer(data, start, stop):
+            if not match.group(1):
+                element_start = match.start()
+            elif element_start is not None:
+                ranges.append((match.group(2).decode('ascii'), element_start, match.end()))
+                element_start = None
+    return ranges
+
+
+def _index_chunk(args):
+    '''Parse a byte range of the file & index its <Ase>, <Abd> and <Gbr> elements
+
+    Executed in a worker process.
+
+    Args:
+        args ((filename, start, stop, header)): the file, the byte range to parse & the
+            chunk wrapper start tag (see chunk_header)
+
+    Returns:
+        [dict]: {'Ase': [(mid, codeId, (start, stop))], 'Abd': {mid: (start, stop)},
+            'Gbr': {mid: (start, stop)}} with the byte ranges in the file
+    '''
+
+    filename, start, stop, header = args
+    with open(filename, 'rb') as aixm_file:
+        aixm_file.seek(start)
+        data = aixm_file.read(stop - start)
+
+    elements = [elem for elem in etree.fromstring(header + data + CHUNK_FOOTER)
+                if elem.tag in ('Ase', 'Abd', 'Gbr')]
+    ranges = _element_ranges(data)
+    if [tag for tag, _, _ in ranges] != [elem.tag for elem in elements]:
+        raise ValueError('Unexpected top-level elements in {} [{}:{}]'.format(filename, start, stop))
+
+    index = {'Ase': [], 'Abd': {}, 'Gbr': {}}
+    for elem, (_, elem_start, elem_stop) in zip(elements, ranges):
+        byte_range = (start + elem_start, start + elem_stop)
+        if elem.tag == 'Ase':
+            ase_uid = elem.find('AseUid')
+            index['Ase'].append((ase_uid.get('mid'), ase_uid.findtext('codeId'), byte_range))
+        elif elem.tag == 'Abd':
+            index['Abd'][elem.find('AbdUid/AseUid').get('mid')] = byte_range
+        else:
+            index['Gbr'][elem.find('GbrUid').get('mid')] = byte_range
+    return index
+
+
+class ChunkedAixmSource(AixmSource):
+    '''AIXM 4.5 source parsed in parallel worker processes
+
+    Drop-in replacement of the AixmSource: the elements are read from their byte ranges
+    (merged per-chunk indices) instead of a single in-memory tree.
+    '''
+
+    def __init__(self, filename, processes=None, chunks=None):
+        '''Split, parse & index the AIXM source
+
+        Args:
+            filename ([str]): the file system file containing the AIXM 4.5 Airspace Informations
+            processes ([int], optional): Defaults to None (number of CPU). Number of worker processes
+                (1 parses the chunks in the current process)
+            chunks ([int], optional): Defaults to None (4 chunks per process). Number of byte ranges
+        '''
+
+        self.filename = filename
+        self.tree = None
+        self.airspace_mids = []
+        self._border_lookup = []
+        self._arc_lookup = []
+        self.grc_buf = ['', '']
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        if chunks is None:
+            chunks = 4 * processes
+
+        ranges = split_aixm(filename, chunks)
+        self._header = CHUNK_HEADER
+        if ranges:
+            with open(filename, 'rb') as aixm_file:
+                self._header = chunk_header(aixm_file.read(ranges[0][0]))
+        tasks = [(filename, start, stop, self._header) for start, stop in ranges]
+        logger.debug('Parsing %s in %s chunks with %s processes', filename, len(tasks), processes)
+
+        if processes > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(processes)
+            try:
+                indices = pool.map(_index_chunk, tasks)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            indices = [_index_chunk(task) for task in tasks]
+
+        # Merging the per-chunk indices (the chunk order is the file order)
+        self._ase_list = []
+        self._ranges = {'Ase': {}, 'Abd': {}, 'Gbr': {}}
+        self._elements = OrderedDict()
+        for index in indices:
+            for mid, code_id, byte_range in index['Ase']:
+                self._ase_list.append({'uuid': mid, 'name': code_id})
+                self._ranges['Ase'][mid] = byte_range
+            self._ranges['Abd'].update(index['Abd'])
+            self._ranges['Gbr'].update(index['Gbr'])
+
+    def list_airspace_uuid(self):
+        '''List all Airspace contained in the specific source file
+
+        Returns:
+            list: list of dictionary {'uuid': file_specific_uuid , 'name': airspace_name }
+        '''
+
+        return list(self._ase_list)
+
+    def _element(self, tag, uid):
+        '''Read & parse (or get from the cache) an element
+
+        Args:
+            tag ([string]): 'Ase', 'Abd' or 'Gbr'
+            uid ([string]): the element UUID
+
+        Returns:
+            [Element]: the element (shared by the callers, not to be modified)
+        '''
+
+        key = (tag, uid)
+        elem = self._elements.pop(key, None)
+        if elem is None:
+            start, stop = self._ranges[tag][uid]
+            with open(self.filename, 'rb') as aixm_file:
+                aixm_file.seek(start)
+                data = aixm_file.read(stop - start)
+            elem = etree.fromstring(self._header + data + CHUNK_FOOTER)[0]
+            if len(self._elements) >= ELEMENT_CACHE_SIZE:
+                self._elements.popitem(last=False)
+        # Inserted as the most recently used
+        self._elements[key] = elem
+        return elem
+
+    def _ase_elem(self, ase_uid):
+        '''Lookup the <Ase> element of an Airspace
+
+        Args:
+            ase_uid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [Element]: the <Ase> element
+        '''
+
+        return self._element('Ase', ase_uid)
+
+    def _abd_elem(self, ase_uid):
+        '''Lookup the <Abd> element (geometry) of an Airspace
+
+        Args:
+            ase_uid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [Element]: the <Abd> element
+        '''
+
+        return self._element('Abd', ase_uid)
+
+    def _gbr_elem(self, gbr_uid):
+        '''Lookup the <Gbr> element of a border
+
+        Args:
+            gbr_uid ([string]): The UUID ot the border
+
+        Returns:
+            [Element]: the <Gbr> element
+        '''
+
+        return self._element('Gbr', gbr_uid)
@@ -3,20 +3,43 @@ from __future__ import absolute_import, division, print_function
 import re
 import logging
 
-import pyproj
-import simplekml
-
-from lxml import etree
-from shapely.geometry import Point
-from shapely.ops import transform
+# pyproj, shapely & lxml are imported on first use: the consumers of a precompiled export
+# (airspace.encoding, AirspaceGraph.load, ...) never pay their import cost
 
 logger = logging.getLogger(__name__)
 
-geod = pyproj.Geod(ellps='WGS84')
+_GEOD = None
+
+
+def get_geod():
+    '''The WGS84 pyproj.Geod (created on first use)
+
+    Returns:
+        [Geod]: the pyproj Geod
+    '''
+
+    global _GEOD
+    if _GEOD is None:
+        import pyproj
+        _GEOD = pyproj.Geod(ellps='WGS84')
+    return _GEOD
+
+
+def __getattr__(name):
+    '''Lazy module attributes (Python 3.7+): "geod" is created on first access
+    '''
+
+    if name == 'geod':
+        return get_geod()
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
 
 FREE_GEOM = 1
 CIRCLE_GEOM = 2
 
+# Circles created on Earth, keyed by (lat, long, radius)
+CIRCLE_CACHE_SIZE = 4096
+_CIRCLE_CACHE = {}
+
 
 class AixmSourceError(Exception):
     '''Exception class building a common message format including AIXM info
@@ -69,6 +92,37 @@ def format_vertical_limit(code, value, unit):
     #TODO: AGL/AMSL ? Ft/FL ? ...
     return '{}-{}-{}'.format(code, value, unit)
 
+def vertical_limit_to_feet(limit):
+    '''Convert a normalized vertical limit into a numeric altitude in feet
+
+    The reference (AGL/AMSL/STD) is not taken into account: HEI-1000-FT & ALT-1000-FT both
+    return 1000. Flight levels are converted with 1 FL = 100 ft.
+
+    Args:
+        limit ([str]): a vertical limit produced by format_vertical_limit (ex. 'STD-95-FL')
+
+    Returns:
+        [float]: the altitude in feet (inf for unlimited, None if not decoded)
+    '''
+
+    if not limit:
+        return None
+    code, _, rest = limit.partition('-')
+    value, _, unit = rest.rpartition('-')
+    if value in ('GND', 'SFC'):
+        return 0.0
+    if value == 'UNL':
+        return float('inf')
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    if unit == 'FL':
+        return value * 100
+    if unit == 'M':
+        return value / 0.3048
+    return value
+
 def format_geo_size(value, unit):
 
     #TODO: cover all possible unit
@@ -78,23 +132,20 @@ def format_geo_size(value, unit):
         return float(value)*1000
 
 def compute_distance(geo_pt1, geo_pt2):
-    '''Compute great circle distance between 2 points
+    '''Compute the geodesic distance between 2 points (WGS84 ellipsoid)
 
-    TODO: Not really used but we might reuse it to compute the "mean" circle radius
+    See airspace.proximity for batched distances between points & Airspace boundaries.
 
     Args:
-        geo_center ([latitude, longitude]): the geo coordinates of the first point
-        geo_point ([latitude, longitude]): the geo coordinates of the second point
+        geo_pt1 ([latitude, longitude]): the geo coordinates of the first point
+        geo_pt2 ([latitude, longitude]): the geo coordinates of the second point
+
+    Returns:
+        [float]: the distance in meter
     '''
 
-    dstproj = pyproj.Proj('+proj=ortho +lon_0=%f +lat_0=%f' % (geo_pt1[0], geo_pt2[1]))
-    srcproj = pyproj.Proj(ellps='WGS84', proj='latlong')
-    new_cx, new_cy = pyproj.transform(srcproj, dstproj, geo_pt1[0], geo_pt1[1])
-    new_px, new_py = pyproj.transform(srcproj, dstproj, geo_pt2[0], geo_pt2[1])
-    radius = Point(new_cx, new_cy).distance(Point(new_px, new_py))
-    logger.debug('Computed radius by shapely %s', radius)
-    azimuth1, azimuth2, radius2 = geod.inv(geo_pt1[0], geo_pt1[1], geo_pt2[0], geo_pt2[1])
-    logger.debug('Computed radius by pyproj only %s', radius2)
+    return get_geod().inv(geo_pt1[1], geo_pt1[0], geo_pt2[1], geo_pt2[0])[2]
+
 
 def dms2dd(degree, minute, second, decimal=0):
     '''Degree Minute Second (Decimal) => Decimal Degree
@@ -192,6 +243,27 @@ def format_decimal_degree(coordinate_string):
         )
     #TODO: Raise an exception if we received a format not supported
 
+def decode_element(elem):
+    '''Decode all the child fields of an AIXM element in a single pass
+
+    Works for <Avx>, <Gbv>, <Circle>, ... The <GbrUid> reference of a <Avx> is decoded
+    as its "mid" attribute.
+
+    Args:
+        elem ([Element]): the AIXM element
+
+    Returns:
+        [dict]: child tag => text (e.g. {'codeType': 'GRC', 'geoLat': '502536N', ...})
+    '''
+
+    record = {}
+    for child in elem:
+        if child.tag == 'GbrUid':
+            record['GbrUid'] = child.get('mid')
+        else:
+            record[child.tag] = child.text
+    return record
+
 class Airspace(object):
     '''Airspace Interface Abstraction Class
 
@@ -220,7 +292,245 @@ class Airspace(object):
         self.admin_data = self.source.airspace_admin_data(self.uuid)
         self.gis_data = self.source.airspace_geometry_data(self.uuid)
 
-class AixmSource(object):
+class AirspaceSource(object):
+    '''Base class of the Airspace sources
+
+    Define the interface expected by the Airspace class & provide the geodesic
+    arc/circle machinery shared by all the sources.
+
+    Raises:
+        NotImplementedError: raised if the child class has not implemented the overriding of the method
+    '''
+
+    def list_airspace_uuid(self):
+        '''List all Airspace contained in the source
+
+        Returns:
+            list: list of dictionary {'uuid': source_specific_uuid , 'name': airspace_name }
+        '''
+
+        raise NotImplementedError('Airspace listing not implemented for this source')
+
+    def airspace_admin_data(self, uuid):
+        '''Extract & normalize the Airspace Admin data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [dict]: the Airspace Admin data as a dictionary
+        '''
+
+        raise NotImplementedError('Admin data extraction not implemented for this source')
+
+    def airspace_geometry_data(self, uuid):
+        '''Extract & normalize the Airspace GIS data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [list]: the Airspace GIS data as a list of coordinates that can be used to create a "Polygon"
+        '''
+
+        raise NotImplementedError('GIS data extraction not implemented for this source')
+
+    def extract_arc_points(self, direction, arc_center, arc_radius, arc_start, arc_stop):
+        '''Extract a subset of Circle points forming a specific Arc of Circle
+
+        TODO: confirm the arc_radius needs to be in meter
+
+        Args:
+            direction ([-1, 1]): Counter clockwise (-1) or clockwise (1) direction to move on circle
+            arc_center ([lat, long]): The geo coord. (lat/long) of the Arc center
+            arc_radius ([float]): The radius of the Arc
+            arc_start ([lat, long]): The geo coord. (lat/long) of the start point of the Arc
+            arc_stop ([lat, long]): The geo coord. (lat/long) of the end point of the Arc
+
+        Returns:
+            [list]: a list of coordinates that can be used to create a "Polygon"
+        '''
+
+        logger.debug('Extracting Arc')
+
+        # Buffer the full circle in a data structure that we will lookup to isolate or arc points
+        self._prepare_arc_lookup(arc_center, arc_radius)
+
+        # Finding the closest surrounding points around the start/stop points of our Arc on the Circle
+        # idx_ are tupples of point index on the circle
+        idx_start = self._get_idx_around_arc_point(latitude=arc_start[0], longitude=arc_start[1])
+        idx_stop = self._get_idx_around_arc_point(latitude=arc_stop[0], longitude=arc_stop[1])
+
+        # The actual extraction of the points
+        return self._get_arc_points(direction, idx_start, idx_stop)
+
+
+    def _prepare_arc_lookup(self, arc_center, arc_radius):
+        '''Circle points indexed "lookup" structure
+
+        Args:
+            arc_center ([lat, long]): the The geo coord. (lat/long) of the Circle center
+            arc_radius ([float]): the radius of the Circle
+        '''
+
+        # Cleanup to remove any previous circle "lookup" data from a previous circle
+        logger.debug('Cleaning up the arc lookup structure')
+        self._arc_lookup = []
+        # Reprojected Circle (v3 because I tried several approach to get a proper circle drawn on a sphere)
+        points = self._create_circle((arc_center[0], arc_center[1]), arc_radius)
+
+        for i, point in enumerate(points):
+            self._arc_lookup.append([point[1],point[0], i])
+
+    def _get_idx_around_arc_point(self, latitude, longitude):
+        '''Define the index of the 2 circle points that are the closest from a POI (lat, long).
+
+        The POI is on or very close from the circle.
+        We measure the distance between 2 point and our POI as follow using Pythagore
+
+          - sqr(distance) = sqr(delta_lat) + sqr(delta_long)
+
+        We compute a cumulated distance by summing up the 2 sqr(distance)
+
+        The 2 consecutive circle points minimizing this cumulated distance are the interesting
+        point of the circle.
+
+        The main difference with the "Border" equivalent method is that we use in this case
+        an integer value that we add on each and every circle point as "index" lookup value 
+        for the extraction
+
+        Args:
+            latitude ([float]): Geo Lat. in decimal degree of the POI we want to locate on the circle
+            longitude ([float]): Geo Long. in decimal degree of the POI we want to locate on the circle
+
+        Returns:
+            [tupple]: the 2 index of the circle points surrounding our POI
+        '''
+
+
+        logger.debug('Finding position on Arc for Lat:%s / Long:%s', latitude, longitude)
+        # TODO: replace with "max float" or a meaningfull max distance ever possible on earth
+        min_distance = float(1000000000000)
+        idx_left = ''
+        idx_right = ''
+        # TODO: converge more quickly if once prooven to be slow to process
+        for i in range(len(self._arc_lookup)-1):
+            geo_lat_1 = self._arc_lookup[i][0]
+            geo_long_1 = self._arc_lookup[i][1]
+            geo_lat_2 = self._arc_lookup[i+1][0]
+            geo_long_2 = self._arc_lookup[i+1][1]
+
+            # Compute the distance
+            distance = (latitude - geo_lat_1)**2 + \
+                    (longitude - geo_long_1)**2 + \
+                    (geo_lat_2 - latitude)**2 + \
+                    (geo_long_2 - longitude)**2
+
+            # Looking up the minimum 
+            if distance < min_distance:
+                min_distance = distance
+                idx_left = self._arc_lookup[i][2]
+                idx_right = self._arc_lookup[i+1][2]
+
+        return (idx_left, idx_right)
+
+    def _get_arc_points(self, direction, idx_start, idx_stop):
+        '''Get the subset of the Arc point in the good direction
+
+        Args:
+            direction (-1, 1): counter-clockwise=-1, clockwise=1 
+            index_start ([tupple]): the index of the 2 points around our first border point
+            index_stop ([type]): the index of the 2 points around our last border point
+        '''
+
+        # Remember that index_ are still tupple for now.
+        # Let's first define the direction in which need to navigate the border
+
+        if direction == 1 and (idx_start[0] < idx_stop[0]):
+            # We can just extract the points
+            start = max(idx_start)
+            stop = min(idx_stop) + 1
+            return self._arc_lookup[start:stop]
+
+        if direction == 1 and (idx_start[0] > idx_stop[0]):
+            # We need to pass over 0
+
+            # There is 2 extraction
+            #     from max(idx_start) to the end
+            start = max(idx_start)
+            start_list = self._arc_lookup[start:]
+            #     from 0 to min(idx_stop) + 1
+            stop = min(idx_stop) + 1
+            end_list = self._arc_lookup[0:stop]
+            logger.debug('Extracting in CW direction from %s to %s', start, stop)
+            return start_list + end_list
+
+        # Counter Clockwise
+        if direction == -1 and (idx_start[0] < idx_stop[0]):
+            # We can just extract the points
+            start = min(idx_start) + 1
+            stop = max(idx_stop)
+            return list(reversed(self._arc_lookup[0:start])) + list(reversed(self._arc_lookup[stop:]))
+
+        if direction == -1 and (idx_start[0] > idx_stop[0]):
+            # We need to pass over 0
+
+            # There is 2 extraction
+            #     from max(idx_start) to the end
+            start = max(idx_stop)
+            stop = min(idx_start)+1
+            return list(reversed(self._arc_lookup[start:stop]))
+
+    def _create_circle(self, center_point, radius):
+        '''Create a circle on Earth 
+
+        Circle drawn in normal Cartesian geometry by shapely becomes Ellipsoid on Earth
+
+        It is necessary to introduce a concept of projection   
+        
+        Args:
+            center_point ([type]): [description]
+            radius ([type]): [description]
+        '''
+
+
+        lat, lon = center_point
+
+        # The same circles (arcs centered on the same navaid, ...) are used again & again
+        cache_key = (lat, lon, radius)
+        if cache_key in _CIRCLE_CACHE:
+            return _CIRCLE_CACHE[cache_key]
+
+        logger.debug('Circle Creation')
+        logger.debug('Center Lat: %s Long: %s', center_point[0], center_point[1])
+
+        import pyproj
+        from shapely.geometry import Point
+        from shapely.ops import transform
+
+        AEQD = pyproj.Proj(proj='aeqd', lat_0=lat, lon_0=lon, x_0=lon, y_0=lat)
+        WGS84 = pyproj.Proj(init='epsg:4326')
+
+        # transform the given lat-long onto the flat AEQD plane
+        tx_lon, tx_lat = pyproj.transform(WGS84, AEQD, lon, lat)
+        circle = Point(tx_lat, tx_lon).buffer(radius)
+
+        def inverse_tx(x, y, z=None):
+            x, y = pyproj.transform(AEQD, WGS84, x, y)
+            return (x, y)
+
+        # inverse projection from AEQD to EPSG4326-WGS84
+        projected_circle = transform(inverse_tx, circle)
+
+        projected_circle_points = list(projected_circle.exterior.coords)
+        #for i, projected_circle_point in enumerate(projected_circle_points):
+        #    print('{} {}'.format(i, projected_circle_point))
+        if len(_CIRCLE_CACHE) >= CIRCLE_CACHE_SIZE:
+            _CIRCLE_CACHE.clear()
+        _CIRCLE_CACHE[cache_key] = projected_circle_points
+        return projected_circle_points
+
+class AixmSource(AirspaceSource):
     '''Class to process Airspace information contained in an AIXM 4.5 source file
 
     This class should implement all the method expected by the Airspace class to
@@ -235,6 +545,8 @@ class AixmSource(object):
             filename ([type]): the file system file containing the AIXM 4.5 Airspace Informations
         '''
 
+        from lxml import etree
+
         self.filename = filename
         self.tree =  etree.parse(self.filename)
         self.airspace_mids = []
@@ -257,7 +569,7 @@ class AixmSource(object):
 
         tmp = []
 
-        for ase_uid in self.tree.xpath('//AseUid'):
+        for ase_uid in self.tree.xpath('//Ase/AseUid'):
             tmp.append(
                 {
                     'uuid': ase_uid.get('mid'),
@@ -267,6 +579,42 @@ class AixmSource(object):
 
         return tmp
 
+    def _ase_elem(self, ase_uid):
+        '''Lookup the <Ase> element of an Airspace
+
+        Args:
+            ase_uid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [Element]: the <Ase> element
+        '''
+
+        return self.tree.xpath('//Ase[AseUid[@mid="' + ase_uid + '"]]')[0]
+
+    def _abd_elem(self, ase_uid):
+        '''Lookup the <Abd> element (geometry) of an Airspace
+
+        Args:
+            ase_uid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [Element]: the <Abd> element
+        '''
+
+        return self.tree.xpath('//Abd[AbdUid[AseUid[@mid="' + ase_uid + '"]]]')[0]
+
+    def _gbr_elem(self, gbr_uid):
+        '''Lookup the <Gbr> element of a border
+
+        Args:
+            gbr_uid ([string]): The UUID ot the border
+
+        Returns:
+            [Element]: the <Gbr> element
+        '''
+
+        return self.tree.xpath('//Gbr[GbrUid[@mid="' + gbr_uid + '"]]')[0]
+
 #    def list_code_type(self):
 #
 #        for avx in self.tree.xpath('//Abd/Avx'):
@@ -282,18 +630,25 @@ class AixmSource(object):
             [dict]: the Airspace Admin data as a dictionary
         '''
 
-        #TODO: continue to extract all admin data of the Airspace
-        #TODO: more formating expected
-
         # Parse admin data
         admin_data = {}
-        ase_elem = self.tree.xpath('//Ase[AseUid[@mid="' + ase_uid + '"]]')
-        admin_data['codeId'] = ase_elem[0].xpath('AseUid/codeId/text()')[0]
-        admin_data['txtName'] = ase_elem[0].xpath('AseUid/codeId/text()')[0]
+        ase_elem = self._ase_elem(ase_uid)
+        admin_data['codeId'] = ase_elem.findtext('AseUid/codeId')
+        admin_data['codeType'] = ase_elem.findtext('AseUid/codeType')
+        admin_data['txtName'] = ase_elem.findtext('txtName')
+        admin_data['codeClass'] = ase_elem.findtext('codeClass')
+        admin_data['codeActivity'] = ase_elem.findtext('codeActivity')
+        admin_data['codeWorkHr'] = ase_elem.findtext('Att/codeWorkHr')
+        admin_data['txtRmk'] = ase_elem.findtext('txtRmk')
         admin_data['upper'] = format_vertical_limit(
-            code=ase_elem[0].xpath('codeDistVerUpper/text()')[0],
-            value=ase_elem[0].xpath('valDistVerUpper/text()')[0],
-            unit=ase_elem[0].xpath('uomDistVerUpper/text()')[0]
+            code=ase_elem.xpath('codeDistVerUpper/text()')[0],
+            value=ase_elem.xpath('valDistVerUpper/text()')[0],
+            unit=ase_elem.xpath('uomDistVerUpper/text()')[0]
+        )
+        admin_data['lower'] = format_vertical_limit(
+            code=ase_elem.xpath('codeDistVerLower/text()')[0],
+            value=ase_elem.xpath('valDistVerLower/text()')[0],
+            unit=ase_elem.xpath('uomDistVerLower/text()')[0]
         )
 
         # This method should return the data in the expected format expected by the Airspace
@@ -315,53 +670,55 @@ class AixmSource(object):
         '''
 
 
-        abd_elem = self.tree.xpath('//Abd[AbdUid[AseUid[@mid="' + ase_uid + '"]]]')
-        if abd_elem[0].xpath('Avx'):
-            print(abd_elem[0].xpath('Avx'))
+        abd_elem = self._abd_elem(ase_uid)
+        if abd_elem.find('Avx') is not None:
             logger.debug('Free geometry detected')
-            return self._airspace_free_geometry(ase_uid)
+            return self._airspace_free_geometry(ase_uid, abd_elem)
 
-        if abd_elem[0].xpath('Circle'):
+        if abd_elem.find('Circle') is not None:
             logger.debug('Circle geometry detected')
-            return self._airspace_circle_geometry(ase_uid)
+            return self._airspace_circle_geometry(ase_uid, abd_elem)
 
         raise AirspaceGeomUnknown(self, ase_uid)
 
-    def _airspace_circle_geometry(self, ase_uid):
+    def _airspace_circle_geometry(self, ase_uid, abd_elem=None):
         '''Create a polygon for a Circle geometry
 
         Args:
             ase_uid ([string]): The UUID ot the Airspace
+            abd_elem ([Element], optional): Defaults to None (looked up). The <Abd> of the Airspace
 
         Returns:
             [list]: a list of coordinates that can be used to create a "Polygon"
         '''
 
-        abd_elem = self.tree.xpath('//Abd[AbdUid[AseUid[@mid="' + ase_uid + '"]]]')
-        circle_elem = abd_elem[0].xpath('Circle')[0]
+        if abd_elem is None:
+            abd_elem = self._abd_elem(ase_uid)
+        circle = decode_element(abd_elem.find('Circle'))
 
         # Collect the center & the radius of the Circle
         arc_center = [
-            format_decimal_degree(circle_elem.xpath('geoLatCen/text()')[0]),
-            format_decimal_degree(circle_elem.xpath('geoLongCen/text()')[0]),
-            circle_elem.xpath('valCrc/text()')[0]]
+            format_decimal_degree(circle['geoLatCen']),
+            format_decimal_degree(circle['geoLongCen']),
+            circle['valCrc']]
 
         # Collect the radius
         arc_radius = format_geo_size(
-            value=circle_elem.xpath('valRadius/text()')[0],
-            unit=circle_elem.xpath('uomRadius/text()')[0])
+            value=circle['valRadius'],
+            unit=circle['uomRadius'])
 
         self._prepare_arc_lookup((arc_center[0], arc_center[1]), arc_radius)
-        return self._arc_lookup
+        return list(self._arc_lookup)
 
 
-    def _airspace_free_geometry(self, ase_uid):
+    def _airspace_free_geometry(self, ase_uid, abd_elem=None):
         '''Create a polygon for a Free geometry
 
         Free geometry are made of points, border points, arc of circle
 
         Args:
             ase_uid ([string]): The UUID ot the Airspace
+            abd_elem ([Element], optional): Defaults to None (looked up). The <Abd> of the Airspace
 
         Returns:
             [list]: a list of coordinates that can be used to create a "Polygon"
@@ -371,10 +728,13 @@ class AixmSource(object):
         avx_function_buffer = ['', '']
         gis_data = []
 
-        abd_elem = self.tree.xpath('//Abd[AbdUid[AseUid[@mid="' + ase_uid + '"]]]')
-        avx_elems = abd_elem[0].xpath('Avx')
+        if abd_elem is None:
+            abd_elem = self._abd_elem(ase_uid)
         # Loop in all avx in order
-        for avx_elem in avx_elems:
+        for avx_elem in abd_elem.iterchildren('Avx'):
+            # All the fields of the <Avx> are decoded in a single pass
+            avx = decode_element(avx_elem)
+
             # In an AVX, there is always a reference to a point
             # We will store this point in a sliding buffer so that the
             # previous point remains available if we need it
@@ -386,53 +746,35 @@ class AixmSource(object):
 
             # Collect next point
             grc_buffer[1] = [
-                    format_decimal_degree(avx_elem.xpath('geoLat/text()')[0]),
-                    format_decimal_degree(avx_elem.xpath('geoLong/text()')[0]),
-                    avx_elem.xpath('valCrc/text()')[0]
+                    format_decimal_degree(avx['geoLat']),
+                    format_decimal_degree(avx['geoLong']),
+                    avx['valCrc']
                 ]
 
-            if avx_elem.xpath('codeType/text()')[0] == 'GRC':
-                avx_function_buffer[1] = 'GRC'
+            code_type = avx['codeType']
+            if code_type in ('GRC', 'RHL'):
+                avx_function_buffer[1] = code_type
                 # Nothing more to collect
 
-            if avx_elem.xpath('codeType/text()')[0] == 'RHL':
-                avx_function_buffer[1] = 'RHL'
-                # Nothing more to collect
-
-            if avx_elem.xpath('codeType/text()')[0] == 'FNT':
+            if code_type == 'FNT':
                 avx_function_buffer[1] = 'FNT'
 
                 # Collect the border id information
-                gbr_uid = avx_elem.xpath('GbrUid')[0].get('mid')
+                gbr_uid = avx['GbrUid']
 
-            if avx_elem.xpath('codeType/text()')[0] == 'CCA':
-                avx_function_buffer[1] = 'CCA'
+            if code_type in ('CCA', 'CWA'):
+                avx_function_buffer[1] = code_type
 
                 # Collect the center & the radius of the Circle Arc
                 arc_center = [
-                    format_decimal_degree(avx_elem.xpath('geoLatArc/text()')[0]),
-                    format_decimal_degree(avx_elem.xpath('geoLongArc/text()')[0]),
-                    avx_elem.xpath('valCrc/text()')[0]
+                    format_decimal_degree(avx['geoLatArc']),
+                    format_decimal_degree(avx['geoLongArc']),
+                    avx['valCrc']
                 ]
 
                 arc_radius = format_geo_size(
-                    value=avx_elem.xpath('valRadiusArc/text()')[0],
-                    unit=avx_elem.xpath('uomRadiusArc/text()')[0]
-                )
-            #TODO: Refactor to make it DRY (too similar with previous code extract)
-            if avx_elem.xpath('codeType/text()')[0] == 'CWA':
-                avx_function_buffer[1] = 'CWA'
-
-                # Collect the center & the radius of the Circle Arc
-                arc_center = [
-                    format_decimal_degree(avx_elem.xpath('geoLatArc/text()')[0]),
-                    format_decimal_degree(avx_elem.xpath('geoLongArc/text()')[0]),
-                    avx_elem.xpath('valCrc/text()')[0]
-                ]
-
-                arc_radius = format_geo_size(
-                    value=avx_elem.xpath('valRadiusArc/text()')[0],
-                    unit=avx_elem.xpath('uomRadiusArc/text()')[0]
+                    value=avx['valRadiusArc'],
+                    unit=avx['uomRadiusArc']
                 )
 
             # Now we implement the previous avx_function
@@ -488,153 +830,6 @@ class AixmSource(object):
 
         return gis_data
 
-    def extract_arc_points(self, direction, arc_center, arc_radius, arc_start, arc_stop):
-        '''Extract a subset of Circle points forming a specific Arc of Circle
-
-        TODO: confirm the arc_radius needs to be in meter
-
-        Args:
-            direction ([-1, 1]): Counter clockwise (-1) or clockwise (1) direction to move on circle
-            arc_center ([lat, long]): The geo coord. (lat/long) of the Arc center
-            arc_radius ([float]): The radius of the Arc
-            arc_start ([lat, long]): The geo coord. (lat/long) of the start point of the Arc
-            arc_stop ([lat, long]): The geo coord. (lat/long) of the end point of the Arc
-
-        Returns:
-            [list]: a list of coordinates that can be used to create a "Polygon"
-        '''
-
-        logger.debug('Extracting Arc')
-
-        # Buffer the full circle in a data structure that we will lookup to isolate or arc points
-        self._prepare_arc_lookup(arc_center, arc_radius)
-
-        # Finding the closest surrounding points around the start/stop points of our Arc on the Circle
-        # idx_ are tupples of point index on the circle
-        idx_start = self._get_idx_around_arc_point(latitude=arc_start[0], longitude=arc_start[1])
-        idx_stop = self._get_idx_around_arc_point(latitude=arc_stop[0], longitude=arc_stop[1])
-
-        # The actual extraction of the points
-        return self._get_arc_points(direction, idx_start, idx_stop)
-
-
-    def _prepare_arc_lookup(self, arc_center, arc_radius):
-        '''Circle points indexed "lookup" structure
-
-        Args:
-            arc_center ([lat, long]): the The geo coord. (lat/long) of the Circle center
-            arc_radius ([float]): the radius of the Circle
-        '''
-
-        # Cleanup to remove any previous circle "lookup" data from a previous circle
-        logger.debug('Cleaning up the arc lookup structure')
-        self._arc_lookup = []
-        # Reprojected Circle (v3 because I tried several approach to get a proper circle drawn on a sphere)
-        points = self._create_circle((arc_center[0], arc_center[1]), arc_radius)
-
-        for i, point in enumerate(points):
-            print(point)
-            self._arc_lookup.append([point[1],point[0], i])
-
-    def _get_idx_around_arc_point(self, latitude, longitude):
-        '''Define the index of the 2 circle points that are the closest from a POI (lat, long).
-
-        The POI is on or very close from the circle.
-        We measure the distance between 2 point and our POI as follow using Pythagore
-
-          - sqr(distance) = sqr(delta_lat) + sqr(delta_long)
-
-        We compute a cumulated distance by summing up the 2 sqr(distance)
-
-        The 2 consecutive circle points minimizing this cumulated distance are the interesting
-        point of the circle.
-
-        The main difference with the "Border" equivalent method is that we use in this case
-        an integer value that we add on each and every circle point as "index" lookup value 
-        for the extraction
-
-        Args:
-            latitude ([float]): Geo Lat. in decimal degree of the POI we want to locate on the circle
-            longitude ([float]): Geo Long. in decimal degree of the POI we want to locate on the circle
-
-        Returns:
-            [tupple]: the 2 index of the circle points surrounding our POI
-        '''
-
-
-        logger.debug('Finding position on Arc for Lat:%s / Long:%s', latitude, longitude)
-        # TODO: replace with "max float" or a meaningfull max distance ever possible on earth
-        min_distance = float(1000000000000)
-        idx_left = ''
-        idx_right = ''
-        # TODO: converge more quickly if once prooven to be slow to process
-        for i in range(len(self._arc_lookup)-1):
-            geo_lat_1 = self._arc_lookup[i][0]
-            geo_long_1 = self._arc_lookup[i][1]
-            geo_lat_2 = self._arc_lookup[i+1][0]
-            geo_long_2 = self._arc_lookup[i+1][1]
-
-            # Compute the distance
-            distance = (latitude - geo_lat_1)**2 + \
-                    (longitude - geo_long_1)**2 + \
-                    (geo_lat_2 - latitude)**2 + \
-                    (geo_long_2 - longitude)**2
-
-            # Looking up the minimum 
-            if distance < min_distance:
-                min_distance = distance
-                idx_left = self._arc_lookup[i][2]
-                idx_right = self._arc_lookup[i+1][2]
-
-        return (idx_left, idx_right)
-
-    def _get_arc_points(self, direction, idx_start, idx_stop):
-        '''Get the subset of the Arc point in the good direction
-
-        Args:
-            direction (-1, 1): counter-clockwise=-1, clockwise=1 
-            index_start ([tupple]): the index of the 2 points around our first border point
-            index_stop ([type]): the index of the 2 points around our last border point
-        '''
-
-        # Remember that index_ are still tupple for now.
-        # Let's first define the direction in which need to navigate the border
-
-        if direction == 1 and (idx_start[0] < idx_stop[0]):
-            # We can just extract the points
-            start = max(idx_start)
-            stop = min(idx_stop) + 1
-            return self._arc_lookup[start:stop]
-
-        if direction == 1 and (idx_start[0] > idx_stop[0]):
-            # We need to pass over 0
-
-            # There is 2 extraction
-            #     from max(idx_start) to the end
-            start = max(idx_start)
-            start_list = self._arc_lookup[start:]
-            #     from 0 to min(idx_stop) + 1
-            stop = min(idx_stop) + 1
-            end_list = self._arc_lookup[0:stop]
-            logger.debug('Extracting in CW direction from %s to %s', start, stop)
-            return start_list + end_list
-
-        # Counter Clockwise
-        if direction == -1 and (idx_start[0] < idx_stop[0]):
-            # We can just extract the points
-            start = min(idx_start) + 1
-            stop = max(idx_stop)
-            return list(reversed(self._arc_lookup[0:start])) + list(reversed(self._arc_lookup[stop:]))
-
-        if direction == -1 and (idx_start[0] > idx_stop[0]):
-            # We need to pass over 0
-
-            # There is 2 extraction
-            #     from max(idx_start) to the end
-            start = max(idx_stop)
-            stop = min(idx_start)+1
-            return list(reversed(self._arc_lookup[start:stop]))
-
     def extract_border_points(self, gbr_uid, border_start, border_stop):
         '''Get the subset of the relevant border point betwwen a start/stop border points
         
@@ -672,19 +867,20 @@ class AixmSource(object):
             gbr_uid ([string]): the UUID of the specific border segment in the source
         '''
 
-        # The <Gbr>
-        gbr_elem = self.tree.xpath('//Gbr[GbrUid[@mid="' + gbr_uid + '"]]')
+        # Cleanup to remove the points of a previous border
+        self._border_lookup = []
 
-        # Find all <Gbv>
-        gbv_elems = gbr_elem[0].xpath('Gbv')
+        # The <Gbr>
+        gbr_elem = self._gbr_elem(gbr_uid)
 
-        for gbv_elem in gbv_elems:
+        # All <Gbv>
+        for gbv_elem in gbr_elem.iterchildren('Gbv'):
+            gbv = decode_element(gbv_elem)
             # We need to be sure the points are coded in decimal degree
             # If not, we transform them
-            geo_lat = format_decimal_degree(gbv_elem.xpath('geoLat/text()')[0])
-            geo_long = format_decimal_degree(gbv_elem.xpath('geoLong/text()')[0])
-            val_crc = gbv_elem.xpath('valCrc/text()')[0]
-            self._border_lookup.append([geo_lat, geo_long, val_crc])
+            geo_lat = format_decimal_degree(gbv['geoLat'])
+            geo_long = format_decimal_degree(gbv['geoLong'])
+            self._border_lookup.append([geo_lat, geo_long, gbv['valCrc']])
 
     def _get_crc_around_border_point(self, latitude, longitude):
         '''Define the CRC of the 2 border points that are the closest from a POI (lat, long).
@@ -781,45 +977,10 @@ class AixmSource(object):
         else:
             return list(reversed(self._border_lookup[stop:start]))
 
-    def _create_circle(self, center_point, radius):
-        '''Create a circle on Earth 
-
-        Circle drawn in normal Cartesian geometry by shapely becomes Ellipsoid on Earth
-
-        It is necessary to introduce a concept of projection   
-        
-        Args:
-            center_point ([type]): [description]
-            radius ([type]): [description]
-        '''
-
-
-        logger.debug('Circle Creation')
-        logger.debug('Center Lat: %s Long: %s', center_point[0], center_point[1])
-
-        lat, lon = center_point
-
-        AEQD = pyproj.Proj(proj='aeqd', lat_0=lat, lon_0=lon, x_0=lon, y_0=lat)
-        WGS84 = pyproj.Proj(init='epsg:4326')
-
-        # transform the given lat-long onto the flat AEQD plane
-        tx_lon, tx_lat = pyproj.transform(WGS84, AEQD, lon, lat)
-        circle = Point(tx_lat, tx_lon).buffer(radius)
-
-        def inverse_tx(x, y, z=None):
-            x, y = pyproj.transform(AEQD, WGS84, x, y)
-            return (x, y)
-
-        # inverse projection from AEQD to EPSG4326-WGS84
-        projected_circle = transform(inverse_tx, circle)
-
-        projected_circle_points = projected_circle.exterior.coords
-        #for i, projected_circle_point in enumerate(projected_circle_points):
-        #    print('{} {}'.format(i, projected_circle_point))
-        return projected_circle_points
-
 if __name__ == '__main__':
 
+    import simplekml
+
     # We run our demo in DEBUG mode
     logging.basicConfig(level=logging.DEBUG)
 
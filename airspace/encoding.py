@@ -0,0 +1,247 @@
+'''Airspace airspace.encoding Module
+
+Compact wire format for the Airspace geometries.
+
+The coordinates are quantized to integer micro-degrees (fits in an int32) and
+delta-encoded. Two encodings are provided:
+
+    - an encoded polyline string (Google algorithm with a 1e6 precision), JSON friendly
+    - a binary stream of zigzag varints
+
+Only the (lat, long) of the points are encoded: the CRC/index values present in the
+Airspace gis_data are not part of the wire format.
+
+This module only depends on the standard library so that a consumer of a precompiled
+export does not need the heavy GIS dependencies to decode it.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Micro-degrees: ~11cm at the equator
+PRECISION = 1000000
+
+
+def quantize(value):
+    '''Quantize a decimal degree into an integer number of micro-degrees
+
+    Args:
+        value ([float]): the decimal degree
+
+    Returns:
+        [int]: the micro-degrees
+    '''
+
+    return int(round(value * PRECISION))
+
+
+def _deltas(coordinates):
+    '''Quantized deltas between consecutive points
+
+    Args:
+        coordinates ([list]): list of [lat, long, ...]
+
+    Returns:
+        [list]: flat list of int (delta_lat, delta_long, delta_lat, ...)
+    '''
+
+    deltas = []
+    prev_lat = prev_long = 0
+    for point in coordinates:
+        lat = quantize(point[0])
+        long = quantize(point[1])
+        deltas.append(lat - prev_lat)
+        deltas.append(long - prev_long)
+        prev_lat = lat
+        prev_long = long
+    return deltas
+
+
+def zigzag(value):
+    '''Zigzag encoding of a signed integer (0, -1, 1, -2, ... => 0, 1, 2, 3, ...)
+
+    Args:
+        value ([int]): the signed integer (64 bits)
+
+    Returns:
+        [int]: the unsigned integer
+    '''
+
+    return (value << 1) ^ (value >> 63)
+
+
+def write_varint(stream, value):
+    '''Append an unsigned integer as a varint (7 bits per byte, little endian)
+
+    Args:
+        stream ([bytearray]): the binary stream
+        value ([int]): the unsigned integer
+    '''
+
+    while value >= 0x80:
+        stream.append((value & 0x7f) | 0x80)
+        value >>= 7
+    stream.append(value)
+
+
+def _points(deltas):
+    '''Rebuild the list of [lat, long] from a flat list of deltas
+
+    Args:
+        deltas ([list]): flat list of int
+
+    Returns:
+        [list]: list of [lat, long] in decimal degree
+    '''
+
+    coordinates = []
+    lat = long = 0
+    for i in range(0, len(deltas) - 1, 2):
+        lat += deltas[i]
+        long += deltas[i + 1]
+        coordinates.append([lat / PRECISION, long / PRECISION])
+    return coordinates
+
+
+def encode_polyline(coordinates):
+    '''Encode a list of points as a polyline string
+
+    Args:
+        coordinates ([list]): list of [lat, long, ...] (an Airspace gis_data for example)
+
+    Returns:
+        [str]: the encoded polyline
+    '''
+
+    chunks = []
+    for delta in _deltas(coordinates):
+        value = ~(delta << 1) if delta < 0 else delta << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def decode_polyline(polyline):
+    '''Decode a polyline string
+
+    Args:
+        polyline ([str]): the encoded polyline
+
+    Returns:
+        [list]: list of [lat, long] in decimal degree
+    '''
+
+    deltas = []
+    value = shift = 0
+    for char in polyline:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return _points(deltas)
+
+
+def pack_coordinates(coordinates):
+    '''Encode a list of points as a binary stream of zigzag varints
+
+    Args:
+        coordinates ([list]): list of [lat, long, ...] (an Airspace gis_data for example)
+
+    Returns:
+        [bytes]: the binary stream
+    '''
+
+    stream = bytearray()
+    for delta in _deltas(coordinates):
+        write_varint(stream, zigzag(delta))
+    return bytes(stream)
+
+
+def unpack_coordinates(stream):
+    '''Decode a binary stream of zigzag varints
+
+    Args:
+        stream ([bytes]): the binary stream
+
+    Returns:
+        [list]: list of [lat, long] in decimal degree
+    '''
+
+    deltas = []
+    value = shift = 0
+    for byte in bytearray(stream):
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            deltas.append((value >> 1) ^ -(value & 1))
+            value = shift = 0
+    return _points(deltas)
+
+
+def encode_airspace(airspace):
+    '''Encode a parsed Airspace
+
+    Args:
+        airspace ([Airspace]): an Airspace on which parse_airspace() was executed
+
+    Returns:
+        [dict]: {'uuid': ..., 'admin_data': {...}, 'geometry': encoded polyline}
+    '''
+
+    return {
+        'uuid': airspace.uuid,
+        'admin_data': airspace.admin_data,
+        'geometry': encode_polyline(airspace.gis_data),
+    }
+
+
+def encode_source(source, uuids=None):
+    '''Encode all the Airspaces of a source (AixmSource, ...)
+
+    Args:
+        source ([object]): a supported Airspace source
+        uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+            The uuid of the Airspaces to export
+
+    Returns:
+        [dict]: {'airspaces': [encoded Airspace, ...]} ready to be dumped in JSON
+    '''
+
+    if uuids is None:
+        uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+    airspaces = []
+    for uuid in uuids:
+        airspaces.append({
+            'uuid': uuid,
+            'admin_data': source.airspace_admin_data(uuid),
+            'geometry': encode_polyline(source.airspace_geometry_data(uuid)),
+        })
+    logger.debug('Encoded %s airspaces', len(airspaces))
+    return {'airspaces': airspaces}
+
+
+def decode_source(export):
+    '''Decode an export produced by encode_source()
+
+    Args:
+        export ([dict]): the encoded export
+
+    Returns:
+        [dict]: uuid => {'admin_data': {...}, 'gis_data': [[lat, long], ...]}
+    '''
+
+    return dict(
+        (airspace['uuid'], {
+            'admin_data': airspace['admin_data'],
+            'gis_data': decode_polyline(airspace['geometry']),
+        })
+        for airspace in export['airspaces']
+    )
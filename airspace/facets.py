@@ -0,0 +1,164 @@
+'''Airspace airspace.facets Module
+
+Inverted indexes on the Airspace admin data.
+
+Each facet (codeType, codeClass, codeActivity) maps its values to the set of Airspace uuids,
+and the vertical limits (in feet) are kept sorted. A filter like "all D and R areas below
+FL95" is then resolved with set unions/intersections & a bisection instead of a scan of
+all the Airspaces::
+
+    facets = FacetIndex.build(source)
+    uuids = facets.select(codeType=('D', 'R'), below='STD-95-FL')
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import bisect
+import logging
+
+from .aixm_parser import vertical_limit_to_feet
+
+logger = logging.getLogger(__name__)
+
+# Admin data keys indexed as facets
+FACETS = ('codeType', 'codeClass', 'codeActivity')
+
+
+def _feet(limit, default):
+    '''Altitude in feet of a normalized vertical limit (or already in feet)
+    '''
+
+    if limit is None:
+        return default
+    if isinstance(limit, (int, float)):
+        return float(limit)
+    feet = vertical_limit_to_feet(limit)
+    return default if feet is None else feet
+
+
+class FacetIndex(object):
+    '''Inverted indexes of a set of Airspaces
+
+    Attributes:
+        uuids ([set]): all the indexed Airspace uuids
+        facets ([dict]): facet => {value: set of uuids}
+    '''
+
+    def __init__(self):
+        '''Create an empty index (see build() & add_airspace())
+        '''
+
+        self.uuids = set()
+        self.facets = dict((facet, {}) for facet in FACETS)
+        # Sorted altitudes (feet) & the matching uuids
+        self._lowers = ([], [])
+        self._uppers = ([], [])
+
+    @classmethod
+    def build(cls, source, uuids=None):
+        '''Index the Airspaces of a source
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+
+        Returns:
+            [FacetIndex]: the index
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        index = cls()
+        for uuid in uuids:
+            index.add_airspace(uuid, source.airspace_admin_data(uuid))
+        logger.debug('Facet index: %s airspaces', len(index.uuids))
+        return index
+
+    def add_airspace(self, uuid, admin_data):
+        '''Index the admin data of an Airspace
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+            admin_data ([dict]): the Airspace admin data (see airspace_admin_data())
+        '''
+
+        self.uuids.add(uuid)
+        for facet in FACETS:
+            value = admin_data.get(facet)
+            if value is not None:
+                self.facets[facet].setdefault(value, set()).add(uuid)
+        for (altitudes, uuids), feet in ((self._lowers, _feet(admin_data.get('lower'), 0.0)),
+                                         (self._uppers, _feet(admin_data.get('upper'), float('inf')))):
+            position = bisect.bisect_right(altitudes, feet)
+            altitudes.insert(position, feet)
+            uuids.insert(position, uuid)
+
+    def values(self, facet):
+        '''Values of a facet & their number of Airspaces
+
+        Args:
+            facet ([str]): 'codeType', 'codeClass' or 'codeActivity'
+
+        Returns:
+            [dict]: value => count
+        '''
+
+        return dict((value, len(uuids)) for value, uuids in self.facets[facet].items())
+
+    def below(self, limit):
+        '''Airspaces starting below an altitude
+
+        Args:
+            limit ([str]): normalized vertical limit (ex. 'STD-95-FL') or feet
+
+        Returns:
+            [set]: the uuids whose lower limit is below the altitude
+        '''
+
+        altitudes, uuids = self._lowers
+        return set(uuids[:bisect.bisect_left(altitudes, _feet(limit, float('inf')))])
+
+    def above(self, limit):
+        '''Airspaces ending above an altitude
+
+        Args:
+            limit ([str]): normalized vertical limit (ex. 'STD-95-FL') or feet
+
+        Returns:
+            [set]: the uuids whose upper limit is above the altitude
+        '''
+
+        altitudes, uuids = self._uppers
+        return set(uuids[bisect.bisect_right(altitudes, _feet(limit, 0.0)):])
+
+    def select(self, below=None, above=None, **facets):
+        '''Airspaces matching all the criteria
+
+        Args:
+            below ([str], optional): Defaults to None. See below()
+            above ([str], optional): Defaults to None. See above()
+            **facets: facet=value or facet=(value, ...) (any of the values)
+
+        Returns:
+            [set]: the uuids
+        '''
+
+        candidates = []
+        for facet, values in facets.items():
+            if facet not in self.facets:
+                raise ValueError('Unknown facet {}'.format(facet))
+            if isinstance(values, str):
+                values = (values,)
+            index = self.facets[facet]
+            candidates.append(set().union(*[index.get(value, ()) for value in values]))
+        if below is not None:
+            candidates.append(self.below(below))
+        if above is not None:
+            candidates.append(self.above(above))
+
+        if not candidates:
+            return set(self.uuids)
+        # Smallest set first keeps the intersections cheap
+        candidates.sort(key=len)
+        return candidates[0].intersection(*candidates[1:])
@@ -0,0 +1,231 @@
+'''Airspace airspace.graph Module
+
+Precomputed overlap & adjacency graph of a set of Airspaces.
+
+The invalid polygons (ex. self-intersecting "bow-tie" boundaries) are repaired with
+shapely.make_valid first (polygonal parts kept, see airspace.validation). The candidate
+pairs are found in bulk with a shapely STRtree, then classified with vectorized
+predicates & vertical band comparisons:
+
+    - OVERLAP: the lateral interiors intersect and the vertical bands overlap
+    - ADJACENT: the Airspaces share a lateral boundary with overlapping vertical bands,
+      or they are stacked (same lateral area, one starting where the other ends)
+
+The graph is stored as a compact CSR structure (NumPy arrays) so that "which Airspaces
+overlap or touch this one" is a lookup. Loading a saved graph does not import shapely.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+
+from .aixm_parser import vertical_limit_to_feet
+
+logger = logging.getLogger(__name__)
+
+OVERLAP = 1
+ADJACENT = 2
+
+
+def airspace_polygon(gis_data):
+    '''Create a shapely Polygon (x=long, y=lat) from the Airspace gis_data
+
+    Args:
+        gis_data ([list]): the Airspace gis_data
+
+    Returns:
+        [Polygon]: the polygon (None if there are less than 3 points)
+    '''
+
+    import shapely
+
+    coordinates = [(point[1], point[0]) for point in gis_data]
+    if len(coordinates) < 3:
+        return None
+    return shapely.Polygon(coordinates)
+
+
+class AirspaceGraph(object):
+    '''Overlap & adjacency graph in CSR format
+
+    Attributes:
+        uuids ([ndarray]): the Airspace uuid of each node
+        indptr ([ndarray]): neighbours of node i are indices[indptr[i]:indptr[i + 1]]
+        indices ([ndarray]): the neighbour nodes
+        relations ([ndarray]): OVERLAP or ADJACENT for each neighbour
+    '''
+
+    def __init__(self, uuids, indptr, indices, relations):
+        '''Create the graph from its CSR arrays (see build() & load())
+        '''
+
+        self.uuids = np.asarray(uuids)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.relations = np.asarray(relations, dtype=np.uint8)
+        self._nodes = dict((uuid, i) for i, uuid in enumerate(self.uuids.tolist()))
+
+    @classmethod
+    def build(cls, source, uuids=None):
+        '''Compute the graph of the Airspaces of a source
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+
+        Returns:
+            [AirspaceGraph]: the graph
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        polygons = []
+        bands = []
+        for uuid in uuids:
+            admin_data = source.airspace_admin_data(uuid)
+            polygons.append(airspace_polygon(source.airspace_geometry_data(uuid)))
+            lower = vertical_limit_to_feet(admin_data.get('lower'))
+            upper = vertical_limit_to_feet(admin_data.get('upper'))
+            bands.append((
+                0.0 if lower is None else lower,
+                float('inf') if upper is None else upper
+            ))
+
+        return cls.from_polygons(uuids, polygons, bands)
+
+    @classmethod
+    def from_polygons(cls, uuids, polygons, bands):
+        '''Compute the graph from the polygons & vertical bands
+
+        Args:
+            uuids ([list]): the Airspace uuids
+            polygons ([list]): the shapely Polygon of each Airspace (None if unknown)
+            bands ([list]): the (lower, upper) altitude of each Airspace in feet
+
+        Returns:
+            [AirspaceGraph]: the graph
+        '''
+
+        import shapely
+        from shapely.strtree import STRtree
+
+        from .validation import _polygonal
+
+        count = len(uuids)
+        geometries = np.array(
+            [polygon if polygon is not None else shapely.Polygon() for polygon in polygons],
+            dtype=object
+        )
+        # The GEOS predicates raise or are wrong on invalid geometries
+        invalid = np.flatnonzero(~shapely.is_valid(geometries))
+        for index, geometry in zip(invalid.tolist(), shapely.make_valid(geometries[invalid])):
+            repaired = _polygonal(geometry)
+            geometries[index] = repaired if repaired is not None else shapely.Polygon()
+        if len(invalid):
+            logger.debug('Airspace graph: %s invalid polygons repaired', len(invalid))
+        bands = np.asarray(bands, dtype=np.float64).reshape(-1, 2)
+
+        # All the candidate pairs in one bulk query (each pair once)
+        tree = STRtree(geometries)
+        left, right = tree.query(geometries, predicate='intersects')
+        keep = left < right
+        left, right = left[keep], right[keep]
+
+        lateral_touch = shapely.touches(geometries[left], geometries[right])
+        lower_left, upper_left = bands[left, 0], bands[left, 1]
+        lower_right, upper_right = bands[right, 0], bands[right, 1]
+        vertical_overlap = (lower_left < upper_right) & (lower_right < upper_left)
+        vertical_touch = (lower_left == upper_right) | (lower_right == upper_left)
+
+        relations = np.zeros(len(left), dtype=np.uint8)
+        relations[~lateral_touch & vertical_overlap] = OVERLAP
+        relations[(lateral_touch & vertical_overlap) | (~lateral_touch & vertical_touch)] = ADJACENT
+        related = relations > 0
+        left, right, relations = left[related], right[related], relations[related]
+        logger.debug('Airspace graph: %s nodes, %s edges', count, len(left))
+
+        # Symmetric CSR
+        sources = np.concatenate((left, right))
+        targets = np.concatenate((right, left))
+        relations = np.concatenate((relations, relations))
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=count), out=indptr[1:])
+
+        return cls(uuids, indptr, targets[order], relations[order])
+
+    def _neighbours(self, uuid, relation=None):
+        '''Neighbour uuids of an Airspace, optionally filtered on the relation
+        '''
+
+        i = self._nodes[uuid]
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        indices = self.indices[start:stop]
+        if relation is not None:
+            indices = indices[self.relations[start:stop] == relation]
+        return self.uuids[indices].tolist()
+
+    def neighbours(self, uuid):
+        '''All the Airspaces overlapping or adjacent to an Airspace
+
+        Args:
+            uuid ([string]): the Airspace uuid
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        return self._neighbours(uuid)
+
+    def overlapping(self, uuid):
+        '''The Airspaces overlapping an Airspace (laterally & vertically)
+
+        Args:
+            uuid ([string]): the Airspace uuid
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        return self._neighbours(uuid, OVERLAP)
+
+    def adjacent(self, uuid):
+        '''The Airspaces touching an Airspace (shared boundary or stacked)
+
+        Args:
+            uuid ([string]): the Airspace uuid
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        return self._neighbours(uuid, ADJACENT)
+
+    def save(self, filename):
+        '''Save the graph in a compressed NumPy file
+
+        Args:
+            filename ([str]): the .npz file
+        '''
+
+        np.savez_compressed(
+            filename, uuids=self.uuids.astype(str), indptr=self.indptr,
+            indices=self.indices, relations=self.relations
+        )
+
+    @classmethod
+    def load(cls, filename):
+        '''Load a graph saved with save()
+
+        Args:
+            filename ([str]): the .npz file
+
+        Returns:
+            [AirspaceGraph]: the graph
+        '''
+
+        with np.load(filename) as data:
+            return cls(data['uuids'], data['indptr'], data['indices'], data['relations'])
@@ -0,0 +1,328 @@
+'''Airspace airspace.openair_parser Module
+
+Airspace source for the OpenAir format (the usual format of the paragliding airspace files).
+
+Supported records::
+
+    AC <class>                  Airspace class or type (starts a new Airspace)
+    AY <type>                   Airspace type (when AC holds the class)
+    AN <name>                   Airspace name
+    AL <lower limit>            Lower limit (GND, SFC, 1500ft AMSL, 1000ft AGL, FL65, ...)
+    AH <upper limit>            Upper limit
+    V X=<coordinate>            Center of the next arcs/circles
+    V D=+|-                     Direction of the next arcs (+ clockwise, default)
+    DP <coordinate>             Polygon point
+    DA <radius>, <angle start>, <angle end>
+                                Arc defined by a radius (NM) & 2 bearings
+    DB <coordinate>, <coordinate>
+                                Arc defined by its 2 end points
+    DC <radius>                 Circle (radius in NM)
+
+Coordinates are in the 50:30:00 N 005:10:00 E form (minutes or seconds may carry decimals).
+Other records (AT, SP, SB, ...) and comments (*) are ignored.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import io
+import logging
+import re
+
+from .aixm_parser import AirspaceSource, dms2dd, format_geo_size, \
+    format_vertical_limit, get_geod
+
+logger = logging.getLogger(__name__)
+
+COORDINATE = re.compile(
+    r'(\d+):(\d+(?:\.\d+)?)(?::(\d+(?:\.\d+)?))?\s*([NS])\s*'
+    r'(\d+):(\d+(?:\.\d+)?)(?::(\d+(?:\.\d+)?))?\s*([EW])',
+    re.IGNORECASE
+)
+
+# OpenAir AC/AY values => AIXM Airspace codeType
+OPENAIR_TYPES = {
+    'R': 'R',
+    'Q': 'D',
+    'P': 'P',
+    'GP': 'P',
+    'CTR': 'CTR',
+    'TMA': 'TMA',
+    'CTA': 'CTA',
+    'TSA': 'TSA',
+    'TRA': 'TRA',
+    'TMZ': 'TMZ',
+    'RMZ': 'RMZ',
+    'W': 'W',
+}
+
+# ICAO Airspace classes
+OPENAIR_CLASSES = ('A', 'B', 'C', 'D', 'E', 'F', 'G')
+
+
+class OpenAirSourceError(Exception):
+    '''Exception raised when an OpenAir record cannot be decoded
+
+    Args:
+        Exception (object): Exception as superclass
+    '''
+
+    def __init__(self, openair_source, msg=None):
+        '''Init the superclass "Exception" string
+
+        Args:
+            openair_source ([OpenAirSource]): the OpenAirSource object where the exception was triggered
+            msg ([str], optional): Defaults to None (replaced by a generic message).
+                The contextual message of the Exception
+        '''
+
+        if msg is None:
+            msg = 'unexpected OpenAir record'
+        exc_msg = 'OpenAir {}: {}'.format(openair_source.filename, msg)
+
+        super(OpenAirSourceError, self).__init__(exc_msg)
+        self.openair_source = openair_source
+
+
+def parse_coordinate(coordinate_string):
+    '''Convert an OpenAir coordinate into decimal degree
+
+    Args:
+        coordinate_string ([str]): ex. "50:30:00 N 005:10:00 E" or "50:30.5N 5:10.2E"
+
+    Returns:
+        [tuple]: (lat, long) in decimal degree or None if the format is not supported
+    '''
+
+    match = COORDINATE.search(coordinate_string)
+    if match is None:
+        return None
+
+    lat = dms2dd(match.group(1), match.group(2), match.group(3) or 0)
+    if match.group(4).upper() == 'S':
+        lat = -lat
+    long = dms2dd(match.group(5), match.group(6), match.group(7) or 0)
+    if match.group(8).upper() == 'W':
+        long = -long
+    return (lat, long)
+
+
+def parse_vertical_limit(limit_string):
+    '''Normalize an OpenAir vertical limit like the AIXM ones
+
+    Args:
+        limit_string ([str]): ex. "GND", "FL95", "4500ft AMSL", "1000 ft AGL", "UNL"
+
+    Returns:
+        [str]: the normalized limit (see format_vertical_limit)
+    '''
+
+    limit = limit_string.strip().upper()
+    if limit in ('GND', 'SFC', '0'):
+        return format_vertical_limit('HEI', '0', 'FT')
+    if limit.startswith('UNL'):
+        return format_vertical_limit('STD', '999', 'FL')
+
+    match = re.match(r'FL\s*(\d+)', limit)
+    if match:
+        return format_vertical_limit('STD', str(int(match.group(1))), 'FL')
+
+    match = re.match(r'(\d+(?:\.\d+)?)\s*(FT|F|M)?\s*(.*)', limit)
+    if match:
+        unit = 'M' if match.group(2) == 'M' else 'FT'
+        code = 'HEI' if re.search(r'AGL|GND|SFC', match.group(3)) else 'ALT'
+        value = match.group(1)
+        if value.endswith('.0'):
+            value = value[:-2]
+        return format_vertical_limit(code, value, unit)
+
+    return limit
+
+
+class OpenAirSource(AirspaceSource):
+    '''Class to process Airspace information contained in an OpenAir source file
+
+    The file is streamed once to build an index (byte offset of each Airspace and its
+    admin records). The geometry records of an Airspace are only read and expanded when
+    requested, which keeps files with tens of thousands of records cheap to open.
+
+    The Airspace uuid is its position in the file (as a string).
+    '''
+
+    def __init__(self, filename, encoding='utf-8'):
+        '''Initialize & index the OpenAir source
+
+        Args:
+            filename ([str]): the file system file containing the OpenAir Airspace Informations
+            encoding ([str], optional): Defaults to 'utf-8'. The encoding of the file
+        '''
+
+        self.filename = filename
+        self.encoding = encoding
+        self._arc_lookup = []
+        self._index = []
+
+        airspace = None
+        with io.open(filename, 'rb') as openair_file:
+            offset = 0
+            for raw_line in openair_file:
+                line = raw_line.decode(encoding, 'replace').strip()
+                record = line[:2].upper()
+                if record == 'AC':
+                    airspace = {'offset': offset, 'AC': line[2:].strip()}
+                    self._index.append(airspace)
+                elif airspace is not None and record in ('AN', 'AY', 'AL', 'AH'):
+                    airspace[record] = line[2:].strip()
+                offset += len(raw_line)
+
+        logger.debug('OpenAir %s: %s airspaces indexed', filename, len(self._index))
+
+    def list_airspace_uuid(self):
+        '''List all Airspace contained in the specific source file
+
+        Returns:
+            list: list of dictionary {'uuid': file_specific_uuid , 'name': airspace_name }
+        '''
+
+        return [
+            {'uuid': str(i), 'name': airspace.get('AN', '')}
+            for i, airspace in enumerate(self._index)
+        ]
+
+    def _airspace(self, uuid):
+        '''Lookup the index entry of an Airspace
+        '''
+
+        try:
+            return self._index[int(uuid)]
+        except (ValueError, IndexError):
+            raise OpenAirSourceError(self, 'unknown airspace {}'.format(uuid))
+
+    def _records(self, uuid):
+        '''Read the records of an Airspace
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [list]: list of (record, value) for all the lines following the AC record
+        '''
+
+        records = []
+        with io.open(self.filename, 'rb') as openair_file:
+            openair_file.seek(self._airspace(uuid)['offset'])
+            # Skip the AC record
+            openair_file.readline()
+            for raw_line in openair_file:
+                line = raw_line.decode(self.encoding, 'replace').strip()
+                if not line or line.startswith('*'):
+                    continue
+                record = line.split(None, 1)[0].upper()
+                if record == 'AC':
+                    break
+                records.append((record, line[len(record):].strip()))
+        return records
+
+    def airspace_admin_data(self, uuid):
+        '''Extract & normalize the Airspace Admin data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [dict]: the Airspace Admin data as a dictionary
+        '''
+
+        airspace = self._airspace(uuid)
+        code_class = airspace['AC'].upper()
+        code_type = airspace.get('AY', '').upper()
+        if code_class not in OPENAIR_CLASSES:
+            # "AC R", "AC CTR", ... : AC holds the type
+            code_type, code_class = code_class, None
+
+        admin_data = {}
+        admin_data['codeId'] = airspace.get('AN', '')
+        admin_data['codeType'] = OPENAIR_TYPES.get(code_type, code_type or None)
+        admin_data['txtName'] = airspace.get('AN', '')
+        admin_data['codeClass'] = code_class
+        admin_data['codeActivity'] = None
+        admin_data['upper'] = parse_vertical_limit(airspace.get('AH', 'UNL'))
+        admin_data['lower'] = parse_vertical_limit(airspace.get('AL', 'GND'))
+        return admin_data
+
+    def airspace_geometry_data(self, uuid):
+        '''Extract & normalize the Airspace GIS data
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Raises:
+            OpenAirSourceError: Exception raised when a geometry record cannot be decoded
+
+        Returns:
+            [list]: the Airspace GIS data as a list of coordinates that can be used to create a "Polygon"
+        '''
+
+        gis_data = []
+        center = None
+        direction = 1
+
+        for record, value in self._records(uuid):
+            if record == 'V':
+                variable, _, variable_value = value.partition('=')
+                variable = variable.strip().upper()
+                if variable == 'X':
+                    center = self._coordinate(variable_value)
+                elif variable == 'D':
+                    direction = -1 if variable_value.strip() == '-' else 1
+
+            elif record == 'DP':
+                point = self._coordinate(value)
+                gis_data.append([point[0], point[1], None])
+
+            elif record == 'DC':
+                self._check_center(center, record)
+                radius = format_geo_size(value.strip(), 'NM')
+                self._prepare_arc_lookup(center, radius)
+                gis_data.extend(list(self._arc_lookup))
+
+            elif record == 'DB':
+                self._check_center(center, record)
+                start, stop = [self._coordinate(part) for part in value.split(',', 1)]
+                radius = get_geod().inv(center[1], center[0], start[1], start[0])[2]
+                gis_data.extend(self._arc(direction, center, radius, start, stop))
+
+            elif record == 'DA':
+                self._check_center(center, record)
+                radius, angle_start, angle_stop = [float(part) for part in value.split(',')]
+                radius = format_geo_size(radius, 'NM')
+                start_long, start_lat, _ = get_geod().fwd(center[1], center[0], angle_start, radius)
+                stop_long, stop_lat, _ = get_geod().fwd(center[1], center[0], angle_stop, radius)
+                gis_data.extend(self._arc(direction, center, radius,
+                                          (start_lat, start_long), (stop_lat, stop_long)))
+
+        return gis_data
+
+    def _arc(self, direction, center, radius, start, stop):
+        '''Arc points including the start & stop points
+        '''
+
+        points = [[start[0], start[1], None]]
+        points.extend(self.extract_arc_points(direction, center, radius, start, stop))
+        points.append([stop[0], stop[1], None])
+        return points
+
+    def _coordinate(self, coordinate_string):
+        '''Decode a coordinate or raise an OpenAirSourceError
+        '''
+
+        coordinate = parse_coordinate(coordinate_string)
+        if coordinate is None:
+            raise OpenAirSourceError(self, 'unsupported coordinate "{}"'.format(coordinate_string))
+        return coordinate
+
+    def _check_center(self, center, record):
+        '''Raise an OpenAirSourceError if an arc/circle is used without center
+        '''
+
+        if center is None:
+            raise OpenAirSourceError(self, '{} record without "V X=" center'.format(record))
@@ -0,0 +1,166 @@
+'''Airspace airspace.parquet_export Module
+
+Columnar (Parquet) export of the Airspaces for analytics.
+
+One row per Airspace with the admin fields, the vertical limits in feet, the bounding box
+and the polygon as a WKB column (GeoParquet 1.0 metadata, readable by geopandas). The rows
+are written in row groups as the source is walked, so the memory stays bounded whatever
+the number of Airspaces. Reading a subset of columns (ex. without the geometry) does not
+read nor decode the geometry column.
+
+pyarrow is an optional dependency: it is only imported when the export is used.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import logging
+
+import shapely
+
+from .aixm_parser import vertical_limit_to_feet
+from .graph import airspace_polygon
+
+logger = logging.getLogger(__name__)
+
+ROW_GROUP_SIZE = 1024
+
+# (column, admin data key) of the admin fields
+ADMIN_COLUMNS = (
+    ('code_id', 'codeId'),
+    ('code_type', 'codeType'),
+    ('code_class', 'codeClass'),
+    ('code_activity', 'codeActivity'),
+    ('name', 'txtName'),
+    ('lower', 'lower'),
+    ('upper', 'upper'),
+)
+
+NUMERIC_COLUMNS = ('lower_ft', 'upper_ft', 'min_lat', 'min_long', 'max_lat', 'max_long')
+
+
+def _pyarrow():
+    '''Import pyarrow on demand
+
+    Raises:
+        ImportError: pyarrow is not installed
+
+    Returns:
+        [tuple]: (pyarrow, pyarrow.parquet) modules
+    '''
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('The Parquet export requires pyarrow (pip install pyarrow)')
+    return pyarrow, pyarrow.parquet
+
+
+def parquet_schema():
+    '''The Arrow schema of the export (with the GeoParquet metadata)
+
+    Returns:
+        [Schema]: the pyarrow schema
+    '''
+
+    pa, _ = _pyarrow()
+    fields = [pa.field('uuid', pa.string(), nullable=False)]
+    fields.extend(pa.field(column, pa.string()) for column, _ in ADMIN_COLUMNS)
+    fields.extend(pa.field(column, pa.float64()) for column in NUMERIC_COLUMNS)
+    fields.append(pa.field('geometry', pa.binary()))
+    geo = {
+        'version': '1.0.0',
+        'primary_column': 'geometry',
+        'columns': {'geometry': {
+            'encoding': 'WKB',
+            'geometry_types': ['Polygon'],
+        }},
+    }
+    return pa.schema(fields, metadata={'geo': json.dumps(geo)})
+
+
+def _row(uuid, admin_data, gis_data):
+    '''Columns of an Airspace
+    '''
+
+    row = {'uuid': uuid}
+    for column, key in ADMIN_COLUMNS:
+        row[column] = admin_data.get(key)
+    row['lower_ft'] = vertical_limit_to_feet(admin_data.get('lower'))
+    row['upper_ft'] = vertical_limit_to_feet(admin_data.get('upper'))
+
+    polygon = airspace_polygon(gis_data)
+    if polygon is None:
+        row.update(min_lat=None, min_long=None, max_lat=None, max_long=None, geometry=None)
+    else:
+        min_long, min_lat, max_long, max_lat = polygon.bounds
+        row.update(min_lat=min_lat, min_long=min_long, max_lat=max_lat, max_long=max_long,
+                   geometry=shapely.to_wkb(polygon))
+    return row
+
+
+def export_parquet(source, filename, uuids=None, row_group_size=ROW_GROUP_SIZE):
+    '''Stream the Airspaces of a source into a Parquet file
+
+    Args:
+        source ([object]): a supported Airspace source (AixmSource, ...)
+        filename ([str]): the Parquet file
+        uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+        row_group_size ([int], optional): Defaults to ROW_GROUP_SIZE. Airspaces per row group
+
+    Returns:
+        [int]: the number of Airspaces exported
+    '''
+
+    pa, pq = _pyarrow()
+    schema = parquet_schema()
+    if uuids is None:
+        uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+    count = 0
+    batch = dict((name, []) for name in schema.names)
+    with pq.ParquetWriter(filename, schema) as writer:
+        for uuid in uuids:
+            row = _row(uuid, source.airspace_admin_data(uuid), source.airspace_geometry_data(uuid))
+            for name in schema.names:
+                batch[name].append(row[name])
+            count += 1
+            if len(batch['uuid']) == row_group_size:
+                writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+                batch = dict((name, []) for name in schema.names)
+        if batch['uuid']:
+            writer.write_table(pa.Table.from_pydict(batch, schema=schema))
+
+    logger.debug('Parquet %s: %s airspaces exported', filename, count)
+    return count
+
+
+def read_parquet(filename, columns=None, filters=None):
+    '''Read an export produced by export_parquet()
+
+    Args:
+        filename ([str]): the Parquet file
+        columns ([list], optional): Defaults to None (all the columns). Only these columns are
+            read (leave out 'geometry' to skip the geometry entirely)
+        filters ([list], optional): Defaults to None. pyarrow filters (ex. [('code_type', 'in', ['D', 'R'])])
+
+    Returns:
+        [Table]: the pyarrow Table (.to_pandas() for a DataFrame)
+    '''
+
+    _, pq = _pyarrow()
+    return pq.read_table(filename, columns=columns, filters=filters)
+
+
+def geometries(table):
+    '''Decode the WKB geometry column of a Table
+
+    Args:
+        table ([Table]): a Table read with read_parquet() including the 'geometry' column
+
+    Returns:
+        [ndarray]: the shapely Polygons
+    '''
+
+    return shapely.from_wkb(table.column('geometry').to_pylist())
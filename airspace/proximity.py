@@ -0,0 +1,198 @@
+'''Airspace airspace.proximity Module
+
+Batched distance-to-boundary queries for proximity warnings.
+
+The distance between N track fixes and the boundary of M candidate Airspaces is computed
+with NumPy in one call:
+
+    - the Airspaces whose bounding box (expanded by max_distance) does not contain a fix
+      are skipped for this fix
+    - the remaining distances are point-to-segment distances computed in a local
+      equirectangular projection centered on each fix. Compared to the geodesic distance
+      the error stays below 0.5% up to ~100 km, which is enough for a warning.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Meters per degree of latitude on the mean Earth sphere (R = 6371008.8 m)
+METERS_PER_DEGREE = 6371008.8 * np.pi / 180
+
+# Maximum number of point x segment combinations computed at once (memory bound)
+BLOCK_SIZE = 1 << 21
+
+
+def points_in_ring(points, ring):
+    '''Vectorized point in polygon test (crossing number)
+
+    Args:
+        points ([ndarray]): (n, 2) array of [lat, long]
+        ring ([ndarray]): (k, 2) array of [lat, long], closed or not
+
+    Returns:
+        [ndarray]: (n,) boolean array
+    '''
+
+    lat = points[:, 0:1]
+    long = points[:, 1:2]
+    lat_a, long_a = ring[:, 0], ring[:, 1]
+    lat_b, long_b = np.roll(lat_a, -1), np.roll(long_a, -1)
+
+    crossing = (lat_a > lat) != (lat_b > lat)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        long_cross = long_a + (lat - lat_a) * (long_b - long_a) / (lat_b - lat_a)
+    return np.count_nonzero(crossing & (long < long_cross), axis=1) % 2 == 1
+
+
+def distance_to_ring(points, ring):
+    '''Distance in meter between points & the boundary of a ring
+
+    Args:
+        points ([ndarray]): (n, 2) array of [lat, long]
+        ring ([ndarray]): (k, 2) array of [lat, long], closed or not
+
+    Returns:
+        [ndarray]: (n,) distances in meter
+    '''
+
+    start = ring
+    stop = np.roll(ring, -1, axis=0)
+    distances = np.empty(len(points))
+    block = max(BLOCK_SIZE // max(len(ring), 1), 1)
+
+    for first in range(0, len(points), block):
+        chunk = points[first:first + block]
+        scale = np.cos(np.radians(chunk[:, 0:1])) * METERS_PER_DEGREE
+
+        # Local projection centered on each point (the point is the origin)
+        y_a = (start[:, 0] - chunk[:, 0:1]) * METERS_PER_DEGREE
+        x_a = (start[:, 1] - chunk[:, 1:2]) * scale
+        y_b = (stop[:, 0] - chunk[:, 0:1]) * METERS_PER_DEGREE
+        x_b = (stop[:, 1] - chunk[:, 1:2]) * scale
+
+        delta_x = x_b - x_a
+        delta_y = y_b - y_a
+        length = delta_x**2 + delta_y**2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.where(length > 0, -(x_a * delta_x + y_a * delta_y) / length, 0)
+        ratio = np.clip(ratio, 0, 1)
+        distances[first:first + block] = np.hypot(
+            x_a + ratio * delta_x, y_a + ratio * delta_y).min(axis=1)
+
+    return distances
+
+
+class BoundaryIndex(object):
+    '''Precomputed boundaries of a set of candidate Airspaces
+
+    Attributes:
+        uuids ([list]): the Airspace uuid of each column of the results
+        rings ([list]): the (k, 2) [lat, long] array of each Airspace
+        bboxes ([ndarray]): (m, 4) array of [lat_min, long_min, lat_max, long_max]
+    '''
+
+    def __init__(self, uuids, gis_data):
+        '''Create the index
+
+        Args:
+            uuids ([list]): the Airspace uuids
+            gis_data ([list]): the gis_data (or [lat, long] array) of each Airspace
+        '''
+
+        self.uuids = list(uuids)
+        self.rings = [np.asarray([point[:2] for point in data], dtype=np.float64).reshape(-1, 2)
+                      for data in gis_data]
+        self.bboxes = np.array([
+            [ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()]
+            if len(ring) else [np.inf, np.inf, -np.inf, -np.inf]
+            for ring in self.rings
+        ]).reshape(-1, 4)
+
+    @classmethod
+    def from_source(cls, source, uuids=None):
+        '''Create the index of the Airspaces of a source
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+
+        Returns:
+            [BoundaryIndex]: the index
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+        return cls(uuids, [source.airspace_geometry_data(uuid) for uuid in uuids])
+
+    def distances(self, points, max_distance=None, signed=False):
+        '''Distance between each point & the boundary of each Airspace
+
+        Args:
+            points ([list]): N [lat, long] (track fixes)
+            max_distance ([float], optional): Defaults to None (no limit). Distance in meter
+                above which the boundaries are reported as inf (-inf inside when signed). The Airspaces whose bounding
+                box is further away from a point are not computed at all
+            signed ([bool], optional): Defaults to False. Report the points inside an Airspace
+                with a negative distance
+
+        Returns:
+            [ndarray]: (N, M) distances in meter
+        '''
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        results = np.full((len(points), len(self.rings)), np.inf)
+
+        if max_distance is not None:
+            margin_lat = max_distance / METERS_PER_DEGREE
+            # Longitude margin computed at the latitude closest to the pole
+            max_lat = np.minimum(np.abs(points[:, 0]) + margin_lat, 89.9)
+            margin_long = max_distance / (METERS_PER_DEGREE * np.cos(np.radians(max_lat)))
+
+        for j, ring in enumerate(self.rings):
+            if not len(ring):
+                continue
+            if max_distance is None:
+                selected = np.arange(len(points))
+            else:
+                lat_min, long_min, lat_max, long_max = self.bboxes[j]
+                selected = np.flatnonzero(
+                    (points[:, 0] >= lat_min - margin_lat) & (points[:, 0] <= lat_max + margin_lat) &
+                    (points[:, 1] >= long_min - margin_long) & (points[:, 1] <= long_max + margin_long)
+                )
+                if not len(selected):
+                    continue
+
+            candidates = points[selected]
+            distances = distance_to_ring(candidates, ring)
+            if max_distance is not None:
+                distances[distances > max_distance] = np.inf
+            if signed:
+                distances[points_in_ring(candidates, ring)] *= -1
+            results[selected, j] = distances
+
+        return results
+
+    def nearest(self, points, max_distance=None):
+        '''Nearest Airspace boundary of each point
+
+        Args:
+            points ([list]): N [lat, long] (track fixes)
+            max_distance ([float], optional): Defaults to None (no limit). See distances()
+
+        Returns:
+            [list]: N (uuid, distance) tuples ((None, inf) if no boundary within max_distance)
+        '''
+
+        distances = self.distances(points, max_distance)
+        if not self.uuids:
+            return [(None, np.inf)] * len(distances)
+        columns = distances.argmin(axis=1)
+        return [
+            (self.uuids[column] if np.isfinite(distance) else None, distance)
+            for column, distance in zip(columns, distances[np.arange(len(distances)), columns])
+        ]
@@ -0,0 +1,221 @@
+'''Airspace airspace.raster Module
+
+Precomputed "airspace complexity" raster for map overlays.
+
+All the Airspace polygons are rasterized on a regular lat/long grid with a NumPy scanline
+algorithm (a cell is covered when its center is inside the polygon). The result is a
+(type, vertical band, row, column) array of Airspace counts saved in a compressed NumPy
+file: serving a heatmap tile is a slice of this array.
+
+Row 0 is the south edge of the grid and column 0 its west edge.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+
+from .aixm_parser import vertical_limit_to_feet
+
+logger = logging.getLogger(__name__)
+
+# Airspace types counted separately (the other types are counted in a last "OTHER" layer)
+TYPES = ('CTR', 'TMA', 'CTA', 'D', 'R', 'P', 'TSA')
+
+# Vertical band boundaries in feet
+BANDS = (0, 5000, 10000, 20000, 66000)
+
+
+def rasterize_ring(ring, lat_min, long_min, cell_size, shape):
+    '''Scanline rasterization of a polygon ring
+
+    Args:
+        ring ([ndarray]): (k, 2) array of [lat, long], closed or not
+        lat_min ([float]): latitude of the south edge of the grid
+        long_min ([float]): longitude of the west edge of the grid
+        cell_size ([float]): cell size in degree
+        shape ([tuple]): (rows, columns) of the grid
+
+    Returns:
+        [tuple]: (row_slice, mask) the rows covered by the ring & their boolean mask
+    '''
+
+    rows, columns = shape
+    lat_a, long_a = ring[:, 0], ring[:, 1]
+    lat_b, long_b = np.roll(lat_a, -1), np.roll(long_a, -1)
+
+    # Rows whose center may be inside the ring
+    first = max(int(np.floor((lat_a.min() - lat_min) / cell_size - 0.5)), 0)
+    last = min(int(np.ceil((lat_a.max() - lat_min) / cell_size - 0.5)) + 1, rows)
+    if first >= last:
+        return slice(0, 0), np.zeros((0, columns), dtype=bool)
+
+    # Crossings of every scanline (row center) with every edge
+    centers = lat_min + (np.arange(first, last) + 0.5) * cell_size
+    scanlines = centers[:, np.newaxis]
+    crossing = (lat_a > scanlines) != (lat_b > scanlines)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        long_cross = long_a + (scanlines - lat_a) * (long_b - long_a) / (lat_b - lat_a)
+    long_cross = np.where(crossing, long_cross, np.inf)
+    long_cross.sort(axis=1)
+
+    # Crossings are paired (enter/exit): +1 at the first covered column, -1 after the last one
+    entries = long_cross[:, 0::2]
+    exits = long_cross[:, 1::2][:, :entries.shape[1]]
+    entries = entries[:, :exits.shape[1]]
+    valid = np.isfinite(entries) & np.isfinite(exits)
+    start = np.clip(np.ceil((entries - long_min) / cell_size - 0.5), 0, columns).astype(np.int64)
+    stop = np.clip(np.ceil((exits - long_min) / cell_size - 0.5), 0, columns).astype(np.int64)
+
+    row_index = np.broadcast_to(np.arange(last - first)[:, np.newaxis], start.shape)
+    edges = np.zeros((last - first, columns + 1), dtype=np.int32)
+    np.add.at(edges, (row_index[valid], start[valid]), 1)
+    np.add.at(edges, (row_index[valid], stop[valid]), -1)
+    mask = np.cumsum(edges[:, :columns], axis=1) > 0
+    return slice(first, last), mask
+
+
+class DensityRaster(object):
+    '''Airspace counts per grid cell, Airspace type & vertical band
+
+    Attributes:
+        bounds ([tuple]): (lat_min, long_min, lat_max, long_max) of the grid
+        cell_size ([float]): cell size in degree
+        types ([tuple]): the Airspace types of the first axis (+ 'OTHER')
+        bands ([tuple]): the vertical band boundaries in feet (second axis)
+        counts ([ndarray]): (types, bands, rows, columns) uint16 array
+    '''
+
+    def __init__(self, bounds, cell_size, types=TYPES, bands=BANDS, counts=None):
+        '''Create an empty raster (see build() & load())
+
+        Args:
+            bounds ([tuple]): (lat_min, long_min, lat_max, long_max) of the grid
+            cell_size ([float]): cell size in degree
+            types ([tuple], optional): Defaults to TYPES.
+            bands ([tuple], optional): Defaults to BANDS.
+            counts ([ndarray], optional): Defaults to None (zeros).
+        '''
+
+        self.bounds = tuple(float(bound) for bound in bounds)
+        self.cell_size = float(cell_size)
+        self.types = tuple(types) if 'OTHER' in types else tuple(types) + ('OTHER',)
+        self.bands = tuple(bands)
+        rows = int(np.ceil((self.bounds[2] - self.bounds[0]) / self.cell_size))
+        columns = int(np.ceil((self.bounds[3] - self.bounds[1]) / self.cell_size))
+        if counts is None:
+            counts = np.zeros((len(self.types), len(self.bands) - 1, rows, columns), dtype=np.uint16)
+        self.counts = counts
+
+    @classmethod
+    def build(cls, source, bounds, cell_size, uuids=None, types=TYPES, bands=BANDS):
+        '''Rasterize the Airspaces of a source
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            bounds ([tuple]): (lat_min, long_min, lat_max, long_max) of the grid
+            cell_size ([float]): cell size in degree
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+            types ([tuple], optional): Defaults to TYPES.
+            bands ([tuple], optional): Defaults to BANDS.
+
+        Returns:
+            [DensityRaster]: the raster
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        raster = cls(bounds, cell_size, types, bands)
+        for uuid in uuids:
+            raster.add_airspace(source.airspace_admin_data(uuid), source.airspace_geometry_data(uuid))
+        logger.debug('Density raster %s: %s airspaces', raster.counts.shape, len(uuids))
+        return raster
+
+    def _band_indices(self, admin_data):
+        '''Indices of the vertical bands intersecting the Airspace
+        '''
+
+        lower = vertical_limit_to_feet(admin_data.get('lower'))
+        upper = vertical_limit_to_feet(admin_data.get('upper'))
+        lower = 0.0 if lower is None else lower
+        upper = float('inf') if upper is None else upper
+        return [
+            i for i, (bottom, top) in enumerate(zip(self.bands[:-1], self.bands[1:]))
+            if lower < top and upper > bottom
+        ]
+
+    def add_airspace(self, admin_data, gis_data):
+        '''Rasterize an Airspace
+
+        Args:
+            admin_data ([dict]): the Airspace admin data
+            gis_data ([list]): the Airspace gis data
+        '''
+
+        ring = np.asarray([point[:2] for point in gis_data], dtype=np.float64).reshape(-1, 2)
+        if len(ring) < 3:
+            return
+        code_type = admin_data.get('codeType')
+        layer = self.types.index(code_type) if code_type in self.types else len(self.types) - 1
+        rows, mask = rasterize_ring(ring, self.bounds[0], self.bounds[1], self.cell_size,
+                                    self.counts.shape[2:])
+        for band in self._band_indices(admin_data):
+            self.counts[layer, band, rows] += mask
+
+    def window(self, lat_min, long_min, lat_max, long_max, types=None, bands=None):
+        '''Counts of a geographic window, summed over the requested types & bands
+
+        Args:
+            lat_min ([float]): south limit
+            long_min ([float]): west limit
+            lat_max ([float]): north limit
+            long_max ([float]): east limit
+            types ([list], optional): Defaults to None (all the types).
+            bands ([list], optional): Defaults to None (all the bands). Indices of the bands
+
+        Returns:
+            [ndarray]: (rows, columns) counts
+        '''
+
+        rows, columns = self.counts.shape[2:]
+        row_slice = slice(
+            max(int(np.floor((lat_min - self.bounds[0]) / self.cell_size)), 0),
+            min(int(np.ceil((lat_max - self.bounds[0]) / self.cell_size)), rows)
+        )
+        column_slice = slice(
+            max(int(np.floor((long_min - self.bounds[1]) / self.cell_size)), 0),
+            min(int(np.ceil((long_max - self.bounds[1]) / self.cell_size)), columns)
+        )
+        layers = slice(None) if types is None else [self.types.index(code_type) for code_type in types]
+        band_layers = slice(None) if bands is None else list(bands)
+        counts = self.counts[layers][:, band_layers, row_slice, column_slice]
+        return counts.sum(axis=(0, 1), dtype=np.uint32)
+
+    def save(self, filename):
+        '''Save the raster in a compressed NumPy file
+
+        Args:
+            filename ([str]): the .npz file
+        '''
+
+        np.savez_compressed(
+            filename, bounds=np.array(self.bounds), cell_size=self.cell_size,
+            types=np.array(self.types).astype(str), bands=np.array(self.bands), counts=self.counts
+        )
+
+    @classmethod
+    def load(cls, filename):
+        '''Load a raster saved with save()
+
+        Args:
+            filename ([str]): the .npz file
+
+        Returns:
+            [DensityRaster]: the raster
+        '''
+
+        with np.load(filename) as data:
+            return cls(data['bounds'].tolist(), float(data['cell_size']), data['types'].tolist(),
+                       data['bands'].tolist(), data['counts'])
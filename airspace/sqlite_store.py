@@ -0,0 +1,260 @@
+'''Airspace airspace.sqlite_store Module
+
+Single-file SQLite store of Airspaces (stdlib sqlite3, no Spatialite needed).
+
+The store contains one row per Airspace (admin data, vertical limits in feet & the WKB of
+its polygon) and an R*Tree virtual table of the bounding boxes. Readers only load the rows
+matching a query: the R*Tree gives the candidates and the exact test is done on their
+polygon only. Several processes can read the same file concurrently. shapely is only
+imported by the geometric queries.
+
+    store = AirspaceStore('airspaces.sqlite')
+    store.write(AixmSource('aixm.xml'))
+    store.query_point(50.5, 4.5, altitude=3000)
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import logging
+import sqlite3
+
+from .aixm_parser import vertical_limit_to_feet
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS airspace (
+    id INTEGER PRIMARY KEY,
+    uuid TEXT NOT NULL UNIQUE,
+    code_id TEXT,
+    code_type TEXT,
+    code_class TEXT,
+    code_activity TEXT,
+    name TEXT,
+    lower TEXT,
+    upper TEXT,
+    lower_ft REAL NOT NULL,
+    upper_ft REAL NOT NULL,
+    admin_data TEXT NOT NULL,
+    geometry BLOB
+);
+CREATE INDEX IF NOT EXISTS airspace_band ON airspace (lower_ft, upper_ft);
+CREATE INDEX IF NOT EXISTS airspace_type ON airspace (code_type);
+CREATE VIRTUAL TABLE IF NOT EXISTS airspace_rtree USING rtree (
+    id, min_long, max_long, min_lat, max_lat
+);
+'''
+
+# Altitudes stored for the unknown/unlimited vertical limits
+UNLIMITED_FT = 1e9
+
+
+def _band_feet(admin_data):
+    '''Lower & upper limits of an Airspace in feet
+    '''
+
+    lower = vertical_limit_to_feet(admin_data.get('lower'))
+    upper = vertical_limit_to_feet(admin_data.get('upper'))
+    return (
+        0.0 if lower is None else lower,
+        UNLIMITED_FT if upper is None or upper == float('inf') else upper
+    )
+
+
+class AirspaceStore(object):
+    '''SQLite store of Airspaces
+
+    Attributes:
+        filename ([str]): the SQLite database file
+        connection ([Connection]): the sqlite3 connection
+    '''
+
+    def __init__(self, filename):
+        '''Open (or create) the store
+
+        Args:
+            filename ([str]): the SQLite database file
+        '''
+
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        '''Close the database connection
+        '''
+
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, source, uuids=None):
+        '''Store the Airspaces of a source (existing Airspaces with the same uuid are replaced)
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+
+        Returns:
+            [int]: the number of Airspaces written
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        count = 0
+        with self.connection:
+            for uuid in uuids:
+                self.write_airspace(
+                    uuid, source.airspace_admin_data(uuid), source.airspace_geometry_data(uuid))
+                count += 1
+        logger.debug('SQLite %s: %s airspaces written', self.filename, count)
+        return count
+
+    def write_airspace(self, uuid, admin_data, gis_data):
+        '''Store a single Airspace (the caller handles the transaction)
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+            admin_data ([dict]): the Airspace admin data
+            gis_data ([list]): the Airspace gis data
+        '''
+
+        import shapely
+        from .graph import airspace_polygon
+
+        cursor = self.connection.cursor()
+        row = cursor.execute('SELECT id FROM airspace WHERE uuid = ?', (uuid,)).fetchone()
+        if row is not None:
+            cursor.execute('DELETE FROM airspace_rtree WHERE id = ?', row)
+            cursor.execute('DELETE FROM airspace WHERE id = ?', row)
+
+        polygon = airspace_polygon(gis_data)
+        lower_ft, upper_ft = _band_feet(admin_data)
+        cursor.execute(
+            'INSERT INTO airspace (uuid, code_id, code_type, code_class, code_activity, name, '
+            'lower, upper, lower_ft, upper_ft, admin_data, geometry) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (uuid, admin_data.get('codeId'), admin_data.get('codeType'), admin_data.get('codeClass'),
+             admin_data.get('codeActivity'), admin_data.get('txtName'),
+             admin_data.get('lower'), admin_data.get('upper'), lower_ft, upper_ft,
+             json.dumps(admin_data, sort_keys=True),
+             None if polygon is None else sqlite3.Binary(shapely.to_wkb(polygon)))
+        )
+        if polygon is not None:
+            min_long, min_lat, max_long, max_lat = polygon.bounds
+            cursor.execute(
+                'INSERT INTO airspace_rtree VALUES (?, ?, ?, ?, ?)',
+                (cursor.lastrowid, min_long, max_long, min_lat, max_lat)
+            )
+
+    def airspace(self, uuid):
+        '''Read an Airspace
+
+        Args:
+            uuid ([string]): The UUID ot the Airspace
+
+        Returns:
+            [dict]: {'uuid', 'admin_data', 'lower_ft', 'upper_ft', 'geometry' (shapely Polygon)}
+                or None if the Airspace is unknown
+        '''
+
+        row = self.connection.execute(
+            'SELECT uuid, admin_data, lower_ft, upper_ft, geometry FROM airspace WHERE uuid = ?',
+            (uuid,)
+        ).fetchone()
+        if row is None:
+            return None
+        geometry = row[4]
+        if geometry is not None:
+            import shapely
+            geometry = shapely.from_wkb(bytes(geometry))
+        return {
+            'uuid': row[0],
+            'admin_data': json.loads(row[1]),
+            'lower_ft': row[2],
+            'upper_ft': row[3],
+            'geometry': geometry,
+        }
+
+    def _candidates(self, min_lat, min_long, max_lat, max_long, lower=None, upper=None):
+        '''Airspaces whose bounding box intersects the box & whose vertical band intersects the band
+        '''
+
+        query = ('SELECT airspace.uuid, airspace.geometry FROM airspace_rtree '
+                 'JOIN airspace ON airspace.id = airspace_rtree.id '
+                 'WHERE airspace_rtree.max_long >= ? AND airspace_rtree.min_long <= ? '
+                 'AND airspace_rtree.max_lat >= ? AND airspace_rtree.min_lat <= ?')
+        parameters = [min_long, max_long, min_lat, max_lat]
+        if upper is not None:
+            query += ' AND airspace.lower_ft <= ?'
+            parameters.append(upper)
+        if lower is not None:
+            query += ' AND airspace.upper_ft >= ?'
+            parameters.append(lower)
+        return self.connection.execute(query, parameters).fetchall()
+
+    def query_point(self, lat, long, altitude=None):
+        '''Airspaces containing a point
+
+        Args:
+            lat ([float]): latitude
+            long ([float]): longitude
+            altitude ([float], optional): Defaults to None (any altitude). Altitude in feet
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        import shapely
+
+        rows = self._candidates(lat, long, lat, long, altitude, altitude)
+        if not rows:
+            return []
+        geometries = shapely.from_wkb([bytes(geometry) for _, geometry in rows])
+        inside = shapely.intersects_xy(geometries, long, lat)
+        return [uuid for (uuid, _), match in zip(rows, inside) if match]
+
+    def query_bbox(self, min_lat, min_long, max_lat, max_long, lower=None, upper=None):
+        '''Airspaces intersecting a bounding box & an altitude band
+
+        Args:
+            min_lat ([float]): south limit
+            min_long ([float]): west limit
+            max_lat ([float]): north limit
+            max_long ([float]): east limit
+            lower ([float], optional): Defaults to None. Bottom of the altitude band in feet
+            upper ([float], optional): Defaults to None. Top of the altitude band in feet
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        import shapely
+
+        rows = self._candidates(min_lat, min_long, max_lat, max_long, lower, upper)
+        if not rows:
+            return []
+        geometries = shapely.from_wkb([bytes(geometry) for _, geometry in rows])
+        inside = shapely.intersects(geometries, shapely.box(min_long, min_lat, max_long, max_lat))
+        return [uuid for (uuid, _), match in zip(rows, inside) if match]
+
+    def query_band(self, lower=None, upper=None):
+        '''Airspaces intersecting an altitude band
+
+        Args:
+            lower ([float], optional): Defaults to None. Bottom of the altitude band in feet
+            upper ([float], optional): Defaults to None. Top of the altitude band in feet
+
+        Returns:
+            [list]: the uuids
+        '''
+
+        query = 'SELECT uuid FROM airspace WHERE lower_ft <= ? AND upper_ft >= ?'
+        parameters = (UNLIMITED_FT if upper is None else upper, 0.0 if lower is None else lower)
+        return [row[0] for row in self.connection.execute(query, parameters)]
@@ -2,10 +2,40 @@
 '''
 from __future__ import absolute_import, division, print_function
 
+import os
+import shutil
+import sqlite3
+import tempfile
 import unittest
 import logging
 
+import numpy as np
+import shapely
+
 from .aixm_parser import format_decimal_degree, Airspace, AixmSource
+from .topology import Topology
+from .aixm_parser import compute_distance, geod
+from .openair_parser import OpenAirSource, parse_coordinate, parse_vertical_limit
+from .aixm51_parser import Aixm51Source, parse_pos_list
+from .graph import AirspaceGraph, airspace_polygon
+from .proximity import BoundaryIndex
+from .facets import FacetIndex
+from .sqlite_store import AirspaceStore
+from .raster import DensityRaster
+from .tiles import TileGenerator, DirectoryTileWriter, MBTilesWriter, encode_geometry, \
+    mercator, tile_rings, feature_id, _init_worker, _simplified, _DATASET
+from . import tiles
+from .validation import validate_airspaces, validate_source, CLOCKWISE, UNCLOSED, TOO_FEW_POINTS, \
+    GEOMETRY_ERROR
+from .parquet_export import export_parquet, read_parquet, geometries
+from .aixm_chunked import ChunkedAixmSource, split_aixm, ELEMENT_CACHE_SIZE
+from .encoding import encode_polyline, decode_polyline, pack_coordinates, unpack_coordinates, \
+    encode_source, decode_source
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
 
 logger = logging.getLogger(__name__)
 
@@ -83,6 +113,527 @@ class TestAixmParser(unittest.TestCase):
             airspace.parse_airspace()
             self.assertEqual(airspace.gis_data, airspace_test['gis_data'])
 
+class TestTopology(unittest.TestCase):
+
+    def test_shared_edge(self):
+
+        # Two squares sharing the edge (50, 5) - (51, 5) with an extra vertex on the seam
+        west = [[50, 4], [50, 5], [50.5, 5.001], [51, 5], [51, 4]]
+        east = [[51, 5], [50.5, 5.001], [50, 5], [50, 6], [51, 6]]
+
+        topology = Topology()
+        topology.add_airspace('west', west)
+        topology.add_airspace('east', east)
+        topology.build()
+
+        # 3 arcs: the seam (stored once) & the 2 outer parts
+        self.assertEqual(len(topology.arcs), 3)
+        shared = set(ref if ref >= 0 else ~ref for ref in topology.airspaces['west']) & \
+            set(ref if ref >= 0 else ~ref for ref in topology.airspaces['east'])
+        self.assertEqual(len(shared), 1)
+
+        # Rings are rebuilt with the same vertices
+        for name, ring in (('west', west), ('east', east)):
+            coordinates = topology.airspace_coordinates(name)
+            self.assertEqual(coordinates[0], coordinates[-1])
+            self.assertEqual(
+                sorted(tuple(point) for point in coordinates[:-1]),
+                sorted(tuple(float(value) for value in point) for point in ring)
+            )
+
+        # Simplification removes the seam vertex for both neighbours
+        arcs = topology.simplify(0.01)
+        for name in ('west', 'east'):
+            self.assertNotIn([50.5, 5.001], topology.airspace_coordinates(name, arcs))
+
+    def test_topology_from_source(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        topology = Topology.from_source(aixm_source)
+
+        for airspace_test in AIRSPACE_TESTS:
+            coordinates = topology.airspace_coordinates(airspace_test['ase_uid'])
+            gis_data = aixm_source.airspace_geometry_data(airspace_test['ase_uid'])
+            self.assertEqual(
+                set((round(point[0], 7), round(point[1], 7)) for point in coordinates),
+                set((round(point[0], 7), round(point[1], 7)) for point in gis_data)
+            )
+
+class TestEncoding(unittest.TestCase):
+
+    def test_round_trip(self):
+
+        coordinates = AIRSPACE_TESTS[0]['gis_data']
+        for decoded in (decode_polyline(encode_polyline(coordinates)),
+                        unpack_coordinates(pack_coordinates(coordinates))):
+            self.assertEqual(len(decoded), len(coordinates))
+            for point, expected in zip(decoded, coordinates):
+                self.assertAlmostEqual(point[0], expected[0], places=6)
+                self.assertAlmostEqual(point[1], expected[1], places=6)
+
+        # Reference value of the polyline algorithm (precision 1e6)
+        self.assertEqual(encode_polyline([[38.5, -120.2], [40.7, -120.95]]), '_izlhA~rlgdF_{geC~ywl@')
+
+    def test_encode_source(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        decoded = decode_source(encode_source(aixm_source))
+        self.assertEqual(sorted(decoded), sorted(test['ase_uid'] for test in AIRSPACE_TESTS))
+        self.assertEqual(decoded['100760256']['admin_data']['codeId'], 'EBD26')
+
+class TestChunkedAixmSource(unittest.TestCase):
+
+    def test_chunked_source(self):
+
+        filename = './airspace/tests/aixm_4.5_extract.xml'
+        self.assertEqual(len(split_aixm(filename, 3)), 3)
+
+        aixm_source = AixmSource(filename)
+        chunked_source = ChunkedAixmSource(filename, processes=2, chunks=3)
+
+        self.assertEqual(chunked_source.list_airspace_uuid(), aixm_source.list_airspace_uuid())
+        for airspace_test in AIRSPACE_TESTS:
+            self.assertEqual(
+                chunked_source.airspace_admin_data(airspace_test['ase_uid']),
+                aixm_source.airspace_admin_data(airspace_test['ase_uid'])
+            )
+            self.assertEqual(
+                chunked_source.airspace_geometry_data(airspace_test['ase_uid']),
+                aixm_source.airspace_geometry_data(airspace_test['ase_uid'])
+            )
+
+        # Only the byte ranges are indexed, the parsed elements are cached (LRU)
+        uuids = [airspace['uuid'] for airspace in chunked_source.list_airspace_uuid()]
+        elem = chunked_source._ase_elem(uuids[0])
+        self.assertEqual(elem.find('AseUid').get('mid'), uuids[0])
+        self.assertIs(chunked_source._ase_elem(uuids[0]), elem)
+        for uuid in uuids[1:]:
+            chunked_source._abd_elem(uuid)
+        self.assertEqual(list(chunked_source._elements)[-1], ('Abd', uuids[-1]))
+        self.assertLessEqual(len(chunked_source._elements), ELEMENT_CACHE_SIZE)
+
+    def test_comments_and_namespaces(self):
+
+        with open('./airspace/tests/aixm_4.5_extract.xml', 'rb') as aixm_file:
+            data = aixm_file.read()
+        # Tags in a comment & a CDATA section, an extra namespace prefix used by an element
+        data = data.replace(b'<AIXM-Snapshot', b'<AIXM-Snapshot xmlns:ead="urn:ead"', 1)
+        data = data.replace(b'</Gbr>', b'</Gbr>\n    <!-- <Ase> removed </Gbr> -->', 1)
+        data = data.replace(b'<Ase>', b'<Ase ead:origin="test">', 1)
+        data = data.replace(b'</AIXM-Snapshot>', b'    <!-- </Ase> -->\n</AIXM-Snapshot>', 1)
+        data = data.replace(b'<txtRmk>', b'<txtRmk><![CDATA[<Gbr> </Ase>]]>', 1)
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'aixm.xml')
+            with open(filename, 'wb') as aixm_file:
+                aixm_file.write(data)
+
+            ranges = split_aixm(filename, 50)
+            for start, stop in ranges:
+                self.assertTrue(data[start:start + 5] in (b'<Ase ', b'<Ase>', b'<Abd>', b'<Gbr>'))
+            self.assertTrue(data[:ranges[-1][1]].endswith((b'</Ase>', b'</Abd>', b'</Gbr>')))
+
+            aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+            chunked_source = ChunkedAixmSource(filename, processes=1, chunks=50)
+            self.assertEqual(chunked_source.list_airspace_uuid(), aixm_source.list_airspace_uuid())
+            for airspace_test in AIRSPACE_TESTS:
+                self.assertEqual(
+                    chunked_source.airspace_geometry_data(airspace_test['ase_uid']),
+                    aixm_source.airspace_geometry_data(airspace_test['ase_uid'])
+                )
+        finally:
+            shutil.rmtree(directory)
+
+class TestOpenAirSource(unittest.TestCase):
+
+    def test_parse_records(self):
+
+        self.assertEqual(parse_coordinate('50:30:00 N 005:15:00 W'), (50.5, -5.25))
+        self.assertEqual(parse_coordinate('50:30.5S 5:15.5E'), (-50.50833333333333, 5.258333333333334))
+        self.assertEqual(parse_vertical_limit('FL95'), 'STD-95-FL')
+        self.assertEqual(parse_vertical_limit('4500ft AMSL'), 'ALT-4500-FT')
+        self.assertEqual(parse_vertical_limit('1000 ft AGL'), 'HEI-1000-FT')
+        self.assertEqual(parse_vertical_limit('SFC'), 'HEI-0-FT')
+
+    def test_openair_source(self):
+
+        openair_source = OpenAirSource('./airspace/tests/openair_extract.txt')
+        airspaces = openair_source.list_airspace_uuid()
+        self.assertEqual([airspace['name'] for airspace in airspaces],
+                         ['EBD26 ARDENNES 05', 'EBR28 LESSIVE', 'TMA ARC'])
+
+        airspace = Airspace(openair_source, airspaces[1]['uuid'])
+        airspace.parse_airspace()
+        self.assertEqual(airspace.admin_data['upper'], 'HEI-5000-FT')
+
+        # Circle of 0.81 NM
+        center = parse_coordinate('50:07:49 N 005:08:48 E')
+        for point in airspace.gis_data:
+            distance = geod.inv(center[1], center[0], point[1], point[0])[2]
+            self.assertAlmostEqual(distance, 0.81 * 1852, delta=0.81 * 1852 * 0.05)
+
+        # Polygon & arc: the points of the arc are on the circle
+        gis_data = openair_source.airspace_geometry_data(airspaces[0]['uuid'])
+        self.assertEqual(gis_data[0][:2], list(parse_coordinate('50:25:36 N 005:05:43 E')))
+        center = parse_coordinate('50:15:21 N 004:54:17 E')
+        radius = geod.inv(center[1], center[0], gis_data[4][1], gis_data[4][0])[2]
+        for point in gis_data[5:-1]:
+            distance = geod.inv(center[1], center[0], point[1], point[0])[2]
+            self.assertAlmostEqual(distance, radius, delta=radius * 0.05)
+
+class TestAixm51Source(unittest.TestCase):
+
+    def test_parse_pos_list(self):
+
+        self.assertEqual(parse_pos_list('50.5 5.25 51 6').tolist(), [[50.5, 5.25], [51, 6]])
+        self.assertEqual(parse_pos_list('5.25 50.5', axis_lon_first=True).tolist(), [[50.5, 5.25]])
+
+    def test_aixm51_source(self):
+
+        aixm51_source = Aixm51Source('./airspace/tests/aixm_5.1_extract.xml')
+        airspaces = aixm51_source.list_airspace_uuid()
+        self.assertEqual([airspace['name'] for airspace in airspaces], ['EBD26', 'EBR28'])
+
+        admin_data = aixm51_source.airspace_admin_data(airspaces[0]['uuid'])
+        self.assertEqual(admin_data['txtName'], 'ARDENNES 05')
+        self.assertEqual(admin_data['upper'], 'ALT-4500-FT')
+        self.assertEqual(aixm51_source.airspace_admin_data(airspaces[1]['uuid'])['upper'], 'STD-95-FL')
+
+        # Polygon points are kept, the arc is drawn counter-clockwise (east of its center)
+        gis_data = aixm51_source.airspace_geometry_data(airspaces[0]['uuid'])
+        self.assertEqual(gis_data[0], [50.426667, 5.095278, None])
+        self.assertEqual(gis_data[-1], [50.426667, 5.095278, None])
+        arc = gis_data[4:-2]
+        self.assertTrue(all(point[1] > 4.904722 for point in arc))
+        for point in arc:
+            distance = geod.inv(4.904722, 50.255833, point[1], point[0])[2]
+            self.assertAlmostEqual(distance, 8 * 1852, places=3)
+
+        # Circle
+        for point in aixm51_source.airspace_geometry_data(airspaces[1]['uuid']):
+            distance = geod.inv(5.146667, 50.130278, point[1], point[0])[2]
+            self.assertAlmostEqual(distance, 1500, places=3)
+
+class TestAirspaceGraph(unittest.TestCase):
+
+    def test_graph(self):
+
+        square = lambda lat, long: airspace_polygon(
+            [[lat, long], [lat, long + 1], [lat + 1, long + 1], [lat + 1, long]])
+        uuids = ['ctr', 'tma', 'east', 'high', 'far']
+        polygons = [square(50, 4), square(50, 4), square(50, 5), square(50.5, 4.5), square(60, 4)]
+        bands = [(0, 2500), (2500, 9500), (0, 4500), (10000, 20000), (0, 9500)]
+
+        graph = AirspaceGraph.from_polygons(uuids, polygons, bands)
+        self.assertEqual(graph.overlapping('ctr'), [])
+        self.assertEqual(sorted(graph.adjacent('ctr')), ['east', 'tma'])
+        self.assertEqual(graph.overlapping('tma'), [])
+        self.assertEqual(sorted(graph.neighbours('east')), ['ctr', 'tma'])
+        self.assertEqual(graph.neighbours('high'), [])
+        self.assertEqual(graph.neighbours('far'), [])
+
+    def test_invalid_polygon(self):
+
+        # Self-intersecting "bow-tie" ring: repaired in 2 triangles touching 'east' on long=5
+        bow_tie = airspace_polygon([[50, 4], [51, 5], [50, 5], [51, 4]])
+        self.assertFalse(bow_tie.is_valid)
+        east = airspace_polygon([[50, 5], [50, 6], [51, 6], [51, 5]])
+        inside = airspace_polygon([[50.4, 4.4], [50.4, 4.6], [50.6, 4.6], [50.6, 4.4]])
+        graph = AirspaceGraph.from_polygons(['bow-tie', 'east', 'inside'], [bow_tie, east, inside],
+                                            [(0, 4500), (0, 4500), (0, 4500)])
+        self.assertEqual(graph.adjacent('bow-tie'), ['east'])
+        self.assertEqual(graph.overlapping('bow-tie'), ['inside'])
+        self.assertEqual(graph.neighbours('east'), ['bow-tie'])
+
+    def test_graph_from_source(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        graph = AirspaceGraph.build(aixm_source)
+        # EBR28 is inside EBD26 with overlapping vertical limits
+        self.assertEqual(graph.overlapping('400001601922575'), ['100760256'])
+        self.assertEqual(graph.overlapping('100760256'), ['400001601922575'])
+
+class TestProximity(unittest.TestCase):
+
+    def test_distances(self):
+
+        square = [[50, 4], [50, 5], [51, 5], [51, 4]]
+        far = [[60, 4], [60, 5], [61, 5], [61, 4]]
+        boundary_index = BoundaryIndex(['square', 'far'], [square, far])
+        fixes = [[50.5, 4.5], [49.9, 4.5], [50.5, 5.2], [40, 4]]
+
+        distances = boundary_index.distances(fixes, signed=True)
+        self.assertEqual(distances.shape, (4, 2))
+        for (lat, long), distance, expected in zip(
+                fixes[:3], distances[:3, 0], ([50.5, 5], [50, 4.5], [50.5, 5])):
+            geodesic = compute_distance([lat, long], expected)
+            self.assertLess(abs(abs(distance) - geodesic) / geodesic, 0.005)
+        self.assertLess(distances[0, 0], 0)
+        self.assertGreater(distances[1, 0], 0)
+
+        # The bbox prefilter skips the far away boundaries
+        distances = boundary_index.distances(fixes, max_distance=20000)
+        self.assertTrue(all(distances[1:3, 0] < 20000))
+        self.assertEqual(distances[0, 0], float('inf'))
+        self.assertEqual(distances[3, 0], float('inf'))
+        self.assertTrue((distances[:, 1] == float('inf')).all())
+
+        nearest = boundary_index.nearest(fixes, max_distance=20000)
+        self.assertEqual([uuid for uuid, _ in nearest], [None, 'square', 'square', None])
+
+    def test_distances_from_source(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        boundary_index = BoundaryIndex.from_source(aixm_source, ['400001601922575'])
+        # Center of the EBR28 circle (radius 1500m)
+        distance = boundary_index.distances([[50.130278, 5.146667]], signed=True)[0, 0]
+        self.assertLess(abs(distance + 1500), 1500 * 0.05)
+
+class TestFacetIndex(unittest.TestCase):
+
+    def test_admin_data(self):
+
+        admin_data = AixmSource('./airspace/tests/aixm_4.5_extract.xml').airspace_admin_data('100760256')
+        self.assertEqual(admin_data['codeId'], 'EBD26')
+        self.assertEqual(admin_data['txtName'], 'ARDENNES 05')
+        self.assertEqual(admin_data['codeType'], 'D')
+        self.assertEqual(admin_data['codeActivity'], 'MILOPS')
+        self.assertEqual(admin_data['codeWorkHr'], 'NOTAM')
+
+        openair_source = OpenAirSource('./airspace/tests/openair_extract.txt')
+        # EBD26 is a danger area ("AC Q") on both sides
+        openair_data = openair_source.airspace_admin_data('0')
+        self.assertEqual((openair_data['codeType'], openair_data['codeClass']), (admin_data['codeType'], None))
+        self.assertEqual(openair_source.airspace_admin_data('1')['codeType'], 'R')
+        self.assertEqual(openair_source.airspace_admin_data('2')['codeClass'], 'C')
+
+    def test_select(self):
+
+        facets = FacetIndex()
+        facets.add_airspace('d_low', {'codeType': 'D', 'lower': 'HEI-0-FT', 'upper': 'ALT-4500-FT'})
+        facets.add_airspace('r_high', {'codeType': 'R', 'lower': 'STD-100-FL', 'upper': 'STD-195-FL'})
+        facets.add_airspace('r_low', {'codeType': 'R', 'codeActivity': 'MILOPS',
+                                      'lower': 'ALT-2000-FT', 'upper': 'STD-95-FL'})
+        facets.add_airspace('ctr', {'codeType': 'CTR', 'codeClass': 'D', 'lower': 'HEI-0-FT',
+                                    'upper': 'ALT-2500-FT'})
+
+        self.assertEqual(facets.select(codeType=('D', 'R'), below='STD-95-FL'), set(['d_low', 'r_low']))
+        self.assertEqual(facets.select(codeType='R', above=9500), set(['r_high']))
+        self.assertEqual(facets.select(codeClass='D'), set(['ctr']))
+        self.assertEqual(facets.select(codeActivity='MILOPS', codeType='D'), set())
+        self.assertEqual(facets.values('codeType'), {'D': 1, 'R': 2, 'CTR': 1})
+        self.assertEqual(len(facets.select()), 4)
+
+class TestAirspaceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_store(self):
+
+        filename = os.path.join(self.directory, 'airspaces.sqlite')
+        with AirspaceStore(filename) as store:
+            self.assertEqual(store.write(AixmSource('./airspace/tests/aixm_4.5_extract.xml')), 2)
+
+        with AirspaceStore(filename) as store:
+            airspace = store.airspace('100760256')
+            self.assertEqual(airspace['admin_data']['txtName'], 'ARDENNES 05')
+            self.assertEqual(airspace['upper_ft'], 4500)
+            self.assertTrue(airspace['geometry'].is_valid)
+
+            # Center of EBR28, inside EBD26 (1000ft - 4500ft)
+            self.assertEqual(sorted(store.query_point(50.130278, 5.146667)), ['100760256', '400001601922575'])
+            self.assertEqual(store.query_point(50.130278, 5.146667, altitude=500), ['400001601922575'])
+            self.assertEqual(store.query_point(50.5, 4.0), [])
+            self.assertEqual(store.query_bbox(50.1, 5.1, 50.2, 5.2, lower=4600), ['400001601922575'])
+            self.assertEqual(store.query_bbox(51, 3, 52, 4), [])
+            self.assertEqual(store.query_band(4600, 4800), ['400001601922575'])
+
+class TestDensityRaster(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rasterize(self):
+
+        raster = DensityRaster((49, 3, 52, 6), 0.1)
+        square = [[50, 4], [50, 5], [51, 5], [51, 4]]
+        raster.add_airspace({'codeType': 'D', 'lower': 'HEI-0-FT', 'upper': 'STD-95-FL'}, square)
+        raster.add_airspace({'codeType': 'GLIDER', 'lower': 'STD-195-FL', 'upper': 'STD-245-FL'}, square)
+
+        self.assertEqual(raster.counts.shape, (8, 4, 30, 30))
+        self.assertEqual(raster.counts[raster.types.index('D'), :2].sum(), 200)
+        self.assertEqual(raster.counts[raster.types.index('D'), 2:].sum(), 0)
+        self.assertEqual(raster.counts[-1, 3].sum(), 100)
+        self.assertEqual(raster.window(50, 4, 51, 5).tolist(), [[4] * 10] * 10)
+        self.assertEqual(raster.window(50, 4, 51, 5, types=['D'], bands=[0]).sum(), 100)
+
+        filename = os.path.join(self.directory, 'raster.npz')
+        raster.save(filename)
+        loaded = DensityRaster.load(filename)
+        self.assertEqual(loaded.types, raster.types)
+        self.assertTrue((loaded.counts == raster.counts).all())
+
+    def test_rasterize_source(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        raster = DensityRaster.build(aixm_source, (49.5, 4.5, 50.5, 6), 0.01)
+        # EBD26 cells match the cell centers inside the polygon
+        polygon = airspace_polygon(aixm_source.airspace_geometry_data('100760256'))
+        lats = 49.5 + (np.arange(100) + 0.5) * 0.01
+        longs = 4.5 + (np.arange(150) + 0.5) * 0.01
+        inside = shapely.contains_xy(polygon, *np.meshgrid(longs, lats))
+        self.assertTrue((raster.counts[raster.types.index('D'), 0] == inside).all())
+
+class TestVectorTiles(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tile_geometry(self):
+
+        # Square covering the north-west quarter of the single z0 tile
+        square = mercator(np.array([[0, -180], [0, 0], [85.0511287798, 0], [85.0511287798, -180]]))
+        rings = tile_rings(shapely.Polygon(square), 0, 0, 0)
+        self.assertEqual(len(rings), 1)
+        self.assertEqual(sorted(rings[0].tolist()), [[0, 0], [0, 2048], [2048, 0], [2048, 2048]])
+        # MoveTo(1) + 2 params, LineTo(3) + 6 params, ClosePath(1), exterior clockwise on screen
+        commands = encode_geometry(rings)
+        self.assertEqual(len(commands), 11)
+        self.assertEqual((commands[0], commands[3], commands[10]), (9, 26, 15))
+
+    def test_incremental_build(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        manifest = os.path.join(self.directory, 'manifest.json')
+        path = os.path.join(self.directory, 'tiles')
+
+        generator = TileGenerator(aixm_source, min_zoom=5, max_zoom=8)
+        stats = generator.build(DirectoryTileWriter(path), manifest, processes=1)
+        self.assertGreater(stats['written'], 4)
+        tile = os.path.join(path, '8', '131', '87.pbf')
+        with open(tile, 'rb') as tile_file:
+            self.assertEqual(tile_file.read(1), b'\x1a')
+
+        # Nothing changed: nothing to render
+        stats = TileGenerator(aixm_source, min_zoom=5, max_zoom=8).build(
+            DirectoryTileWriter(path), manifest, processes=1)
+        self.assertEqual(stats, {'written': 0, 'deleted': 0})
+
+        # EBR28 removed: only its tiles are rendered again
+        generator = TileGenerator(aixm_source, uuids=['100760256'], min_zoom=5, max_zoom=8)
+        stats = generator.build(DirectoryTileWriter(path), manifest, processes=1)
+        self.assertEqual(stats, {'written': 4, 'deleted': 0})
+        # The feature id of EBD26 does not depend on its position
+        self.assertEqual(generator.ids, [feature_id('100760256')])
+        self.assertEqual(TileGenerator(aixm_source, min_zoom=5, max_zoom=8).ids[0], feature_id('100760256'))
+
+        # Zoom levels changed: full build, the z5 & z8 tiles & the EBD26 only tiles are deleted
+        stats = TileGenerator(aixm_source, uuids=['400001601922575'], min_zoom=6, max_zoom=7).build(
+            DirectoryTileWriter(path), manifest, processes=1)
+        self.assertEqual(stats, {'written': 2, 'deleted': 7})
+        self.assertEqual(sorted(os.listdir(path)), ['6', '7', 'metadata.json'])
+
+        writer = MBTilesWriter(os.path.join(self.directory, 'airspaces.mbtiles'))
+        stats = generator.build(writer, processes=2)
+        count = writer.connection.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+        writer.close()
+        self.assertEqual(count, stats['written'])
+
+    def test_streamed_build(self):
+
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        generator = TileGenerator(aixm_source, min_zoom=5, max_zoom=8)
+
+        # The worker only keeps the simplified polygons of the current zoom level
+        _init_worker(generator.rings, generator.properties, generator.ids)
+        _simplified(0, 5)
+        _simplified(1, 6)
+        self.assertEqual(list(_DATASET['simplified']), [1])
+
+        # The MBTiles tiles are committed in batches while they are written
+        filename = os.path.join(self.directory, 'airspaces.mbtiles')
+        writer = MBTilesWriter(filename)
+        batch, tiles.COMMIT_BATCH = tiles.COMMIT_BATCH, 2
+        try:
+            stats = generator.build(writer, processes=1)
+        finally:
+            tiles.COMMIT_BATCH = batch
+        connection = sqlite3.connect(filename)
+        committed = connection.execute('SELECT COUNT(*) FROM tiles').fetchone()[0]
+        connection.close()
+        writer.close()
+        self.assertEqual(committed, stats['written'] - stats['written'] % 2)
+
+@unittest.skipUnless(pyarrow, 'pyarrow is not installed')
+class TestParquetExport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_export(self):
+
+        filename = os.path.join(self.directory, 'airspaces.parquet')
+        aixm_source = AixmSource('./airspace/tests/aixm_4.5_extract.xml')
+        self.assertEqual(export_parquet(aixm_source, filename, row_group_size=1), 2)
+
+        table = read_parquet(filename, columns=['uuid', 'code_type', 'upper_ft'])
+        self.assertEqual(table.column_names, ['uuid', 'code_type', 'upper_ft'])
+        self.assertEqual(table.to_pydict(), {
+            'uuid': ['100760256', '400001601922575'], 'code_type': ['D', 'R'], 'upper_ft': [4500.0, 5000.0]})
+
+        table = read_parquet(filename, filters=[('code_type', '=', 'R')])
+        polygon = geometries(table)[0]
+        self.assertTrue(polygon.contains(shapely.Point(5.146667, 50.130278)))
+
+class TestValidation(unittest.TestCase):
+
+    def test_validate_airspaces(self):
+
+        results = validate_airspaces(
+            ['square', 'bowtie', 'line'],
+            [[[50, 4], [51, 4], [51, 5], [50, 5]],
+             [[50, 4], [51, 5], [51, 4], [50, 5], [50, 4]],
+             [[50, 4], [51, 4], [50, 4]]]
+        )
+        square, bowtie, line = results
+        self.assertEqual(square.issues, [UNCLOSED, CLOCKWISE])
+        self.assertTrue(shapely.is_ccw(square.geometry.exterior))
+        self.assertEqual(square.geometry.area, 1)
+        self.assertTrue(bowtie.issues[0].startswith('invalid: Self-intersection'))
+        self.assertTrue(bowtie.geometry.is_valid)
+        self.assertEqual(bowtie.geometry.geom_type, 'MultiPolygon')
+        self.assertEqual(line.issues, [TOO_FEW_POINTS])
+        self.assertIsNone(line.geometry)
+
+    def test_validate_source(self):
+
+        results = validate_source(AixmSource('./airspace/tests/aixm_4.5_extract.xml'))
+        self.assertEqual(sorted(results), ['100760256', '400001601922575'])
+        for result in results.values():
+            self.assertTrue(result.geometry.is_valid)
+
+        # An unknown Airspace is reported, the others are still validated
+        results = validate_source(AixmSource('./airspace/tests/aixm_4.5_extract.xml'),
+                                  uuids=['100760256', '12345'])
+        self.assertTrue(results['100760256'].geometry.is_valid)
+        self.assertFalse(results['12345'].valid)
+        self.assertTrue(results['12345'].issues[0].startswith(GEOMETRY_ERROR))
+        self.assertIsNone(results['12345'].geometry)
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     unittest.main()
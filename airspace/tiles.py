@@ -0,0 +1,693 @@
+'''Airspace airspace.tiles Module
+
+Offline generator of a vector tile pyramid of the Airspaces.
+
+The Airspace polygons are projected once in Web Mercator (NumPy) and, for every zoom level
+(z5 to z12 by default), simplified once then clipped, quantized to the tile extent (4096)
+and encoded in the Mapbox Vector Tile protobuf format (hand-written encoder sharing the
+varint code of airspace.encoding). The tiles are rendered in a pool of worker processes
+and written as they are rendered in a directory (z/x/y.pbf) or in an MBTiles SQLite file
+(committed every COMMIT_BATCH tiles). A worker only keeps the simplified polygons of the
+zoom level it is rendering.
+
+A manifest (JSON) keeps a hash & the bounding box of every Airspace: the next build only
+renders the tiles touched by the added, changed or removed Airspaces. A change of the zoom
+levels renders all the tiles again & deletes the tiles of the zoom levels no longer built.
+
+The feature id is derived from the Airspace uuid (see feature_id): it does not change when
+other Airspaces are added or removed, so the tiles not rendered again keep consistent ids.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import gzip
+import hashlib
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import shapely
+
+from .encoding import pack_coordinates, write_varint, zigzag
+
+logger = logging.getLogger(__name__)
+
+MIN_ZOOM = 5
+MAX_ZOOM = 12
+
+# Tile coordinates extent & clipping buffer (tile units)
+EXTENT = 4096
+BUFFER = 64
+
+LAYER = 'airspaces'
+
+# Tiles written or deleted in an MBTiles transaction
+COMMIT_BATCH = 1000
+
+# Admin data exported as feature properties
+PROPERTIES = ('codeId', 'codeType', 'codeClass', 'codeActivity', 'txtName', 'lower', 'upper')
+
+# Web Mercator (EPSG:3857)
+EARTH_RADIUS = 6378137.0
+ORIGIN = math.pi * EARTH_RADIUS
+MAX_LATITUDE = 85.0511287798
+
+# MVT geometry commands & types
+MOVE_TO = 1
+LINE_TO = 2
+CLOSE_PATH = 7
+POLYGON = 3
+
+
+def mercator(coordinates):
+    '''Project [lat, long] coordinates in Web Mercator
+
+    Args:
+        coordinates ([ndarray]): (n, 2) array of [lat, long]
+
+    Returns:
+        [ndarray]: (n, 2) array of [x, y] in meter
+    '''
+
+    lat = np.radians(np.clip(coordinates[:, 0], -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.radians(coordinates[:, 1]) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + lat / 2)) * EARTH_RADIUS
+    return np.column_stack((x, y))
+
+
+def tile_size(zoom):
+    '''Size of a tile in Web Mercator meter
+    '''
+
+    return 2 * ORIGIN / (1 << zoom)
+
+
+def tile_bounds(zoom, x, y):
+    '''Web Mercator bounds of a tile (XYZ scheme, y = 0 is the north edge)
+
+    Returns:
+        [tuple]: (min_x, min_y, max_x, max_y) in meter
+    '''
+
+    size = tile_size(zoom)
+    return (-ORIGIN + x * size, ORIGIN - (y + 1) * size, -ORIGIN + (x + 1) * size, ORIGIN - y * size)
+
+
+def tile_range(bounds, zoom):
+    '''Tiles covering Web Mercator bounds (including the clipping buffer)
+
+    Args:
+        bounds ([tuple]): (min_x, min_y, max_x, max_y) in meter
+        zoom ([int]): the zoom level
+
+    Returns:
+        [list]: list of (x, y)
+    '''
+
+    size = tile_size(zoom)
+    margin = size * BUFFER / EXTENT
+    last = (1 << zoom) - 1
+    first_x = min(max(int((bounds[0] - margin + ORIGIN) // size), 0), last)
+    last_x = min(max(int((bounds[2] + margin + ORIGIN) // size), 0), last)
+    first_y = min(max(int((ORIGIN - bounds[3] - margin) // size), 0), last)
+    last_y = min(max(int((ORIGIN - bounds[1] + margin) // size), 0), last)
+    return [(x, y) for x in range(first_x, last_x + 1) for y in range(first_y, last_y + 1)]
+
+
+def feature_id(uuid):
+    '''Stable MVT feature id of an Airspace (64 bits of the SHA-1 of its uuid)
+
+    Args:
+        uuid ([str]): the Airspace uuid
+
+    Returns:
+        [int]: the feature id (unsigned 64 bits)
+    '''
+
+    return int(hashlib.sha1(str(uuid).encode('utf-8')).hexdigest()[:16], 16)
+
+
+def _key(stream, number, wire_type):
+    write_varint(stream, (number << 3) | wire_type)
+
+
+def _varint_field(stream, number, value):
+    _key(stream, number, 0)
+    write_varint(stream, value)
+
+
+def _bytes_field(stream, number, data):
+    _key(stream, number, 2)
+    write_varint(stream, len(data))
+    stream.extend(data)
+
+
+def _packed_field(stream, number, values):
+    payload = bytearray()
+    for value in values:
+        write_varint(payload, value)
+    _bytes_field(stream, number, payload)
+
+
+def encode_geometry(rings):
+    '''Encode polygon rings as MVT geometry commands
+
+    Args:
+        rings ([list]): (n, 2) integer arrays in tile coordinates (open rings, exterior rings
+            with a positive area followed by their interior rings)
+
+    Returns:
+        [list]: the command integers
+    '''
+
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for ring in rings:
+        deltas = np.diff(np.vstack((cursor, ring)), axis=0).tolist()
+        commands.append((1 << 3) | MOVE_TO)
+        commands.extend((zigzag(deltas[0][0]), zigzag(deltas[0][1])))
+        commands.append(((len(ring) - 1) << 3) | LINE_TO)
+        for delta_x, delta_y in deltas[1:]:
+            commands.append(zigzag(delta_x))
+            commands.append(zigzag(delta_y))
+        commands.append((1 << 3) | CLOSE_PATH)
+        cursor = ring[-1]
+    return commands
+
+
+def encode_tile(features, layer=LAYER):
+    '''Encode a single layer vector tile
+
+    Args:
+        features ([list]): list of (id, properties, rings), see encode_geometry() for the rings
+        layer ([str], optional): Defaults to LAYER. The layer name
+
+    Returns:
+        [bytes]: the MVT protobuf
+    '''
+
+    keys = {}
+    values = {}
+    layer_stream = bytearray()
+    _varint_field(layer_stream, 15, 2)
+    _bytes_field(layer_stream, 1, layer.encode('utf-8'))
+
+    for feature_id, properties, rings in features:
+        tags = []
+        for key in sorted(properties):
+            value = properties[key]
+            if value is None:
+                continue
+            tags.append(keys.setdefault(key, len(keys)))
+            tags.append(values.setdefault(str(value), len(values)))
+        feature = bytearray()
+        _varint_field(feature, 1, feature_id)
+        _packed_field(feature, 2, tags)
+        _varint_field(feature, 3, POLYGON)
+        _packed_field(feature, 4, encode_geometry(rings))
+        _bytes_field(layer_stream, 2, feature)
+
+    for key in sorted(keys, key=keys.get):
+        _bytes_field(layer_stream, 3, key.encode('utf-8'))
+    for value in sorted(values, key=values.get):
+        value_stream = bytearray()
+        _bytes_field(value_stream, 1, value.encode('utf-8'))
+        _bytes_field(layer_stream, 4, value_stream)
+    _varint_field(layer_stream, 5, EXTENT)
+
+    tile = bytearray()
+    _bytes_field(tile, 3, layer_stream)
+    return bytes(tile)
+
+
+def _quantize_ring(coordinates, bounds, exterior):
+    '''Quantize a ring in tile coordinates with the MVT winding order
+
+    Returns:
+        [ndarray]: (n, 2) int array (open ring) or None if the ring collapsed
+    '''
+
+    min_x, _, max_x, max_y = bounds
+    scale = EXTENT / (max_x - min_x)
+    points = np.empty(coordinates.shape, dtype=np.int64)
+    points[:, 0] = np.round((coordinates[:, 0] - min_x) * scale)
+    points[:, 1] = np.round((max_y - coordinates[:, 1]) * scale)
+
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = (np.diff(points, axis=0) != 0).any(axis=1)
+    points = points[keep]
+    if len(points) > 1 and (points[0] == points[-1]).all():
+        points = points[:-1]
+    if len(points) < 3:
+        return None
+
+    x, y = points[:, 0], points[:, 1]
+    area = int((x * np.roll(y, -1) - np.roll(x, -1) * y).sum())
+    if area == 0:
+        return None
+    # Exterior rings have a positive area in tile coordinates (y down), interior ones a negative one
+    if (area > 0) != exterior:
+        points = points[::-1]
+    return points
+
+
+def tile_rings(geometry, zoom, x, y):
+    '''Clip & quantize a (simplified) Web Mercator geometry for a tile
+
+    Args:
+        geometry ([Geometry]): the shapely geometry in Web Mercator
+        zoom ([int]): the zoom level
+        x ([int]): the tile column
+        y ([int]): the tile row
+
+    Returns:
+        [list]: the rings (see encode_geometry), empty if nothing is left in the tile
+    '''
+
+    bounds = tile_bounds(zoom, x, y)
+    margin = tile_size(zoom) * BUFFER / EXTENT
+    clipped = shapely.clip_by_rect(
+        geometry, bounds[0] - margin, bounds[1] - margin, bounds[2] + margin, bounds[3] + margin)
+
+    rings = []
+    for polygon in shapely.get_parts(shapely.get_parts(clipped)):
+        if polygon.geom_type != 'Polygon' or polygon.is_empty:
+            continue
+        exterior = _quantize_ring(shapely.get_coordinates(polygon.exterior), bounds, True)
+        if exterior is None:
+            continue
+        rings.append(exterior)
+        for interior in polygon.interiors:
+            ring = _quantize_ring(shapely.get_coordinates(interior), bounds, False)
+            if ring is not None:
+                rings.append(ring)
+    return rings
+
+
+# Per worker process dataset (see _init_worker)
+_DATASET = {}
+
+
+def _init_worker(rings, properties, ids):
+    '''Worker process initializer: keep the projected Airspaces
+    '''
+
+    _DATASET.clear()
+    _DATASET['rings'] = rings
+    _DATASET['properties'] = properties
+    _DATASET['ids'] = ids
+    _DATASET['zoom'] = None
+    _DATASET['simplified'] = {}
+
+
+def _simplified(index, zoom):
+    '''Web Mercator polygon of an Airspace simplified for a zoom level (cached per worker)
+
+    The tasks are handed out in the zoom order: the cache is emptied when a worker
+    starts rendering another zoom level.
+    '''
+
+    if _DATASET['zoom'] != zoom:
+        _DATASET['simplified'].clear()
+        _DATASET['zoom'] = zoom
+    geometry = _DATASET['simplified'].get(index)
+    if geometry is None:
+        geometry = shapely.Polygon(_DATASET['rings'][index])
+        if not geometry.is_valid:
+            geometry = shapely.make_valid(geometry)
+        geometry = shapely.simplify(geometry, tile_size(zoom) / EXTENT, preserve_topology=True)
+        _DATASET['simplified'][index] = geometry
+    return geometry
+
+
+def _render_tile(task):
+    '''Render a tile (executed in a worker process)
+
+    Args:
+        task ((zoom, x, y, indices)): the tile & the Airspaces whose bounding box touches it
+
+    Returns:
+        [tuple]: (zoom, x, y, data) where data is None if the tile is empty
+    '''
+
+    zoom, x, y, indices = task
+    features = []
+    for index in indices:
+        rings = tile_rings(_simplified(index, zoom), zoom, x, y)
+        if rings:
+            features.append((_DATASET['ids'][index], _DATASET['properties'][index], rings))
+    return zoom, x, y, encode_tile(features) if features else None
+
+
+class DirectoryTileWriter(object):
+    '''Write the tiles in a {path}/{z}/{x}/{y}.pbf directory tree
+    '''
+
+    def __init__(self, path):
+        '''Create the writer
+
+        Args:
+            path ([str]): the root directory of the tiles
+        '''
+
+        self.path = path
+
+    def _filename(self, zoom, x, y):
+        return os.path.join(self.path, str(zoom), str(x), '{}.pbf'.format(y))
+
+    def write(self, zoom, x, y, data):
+        '''Write (or replace) a tile
+        '''
+
+        filename = self._filename(zoom, x, y)
+        directory = os.path.dirname(filename)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'wb') as tile_file:
+            tile_file.write(data)
+
+    def delete(self, zoom, x, y):
+        '''Remove a tile that became empty
+
+        Returns:
+            [bool]: True if the tile existed
+        '''
+
+        filename = self._filename(zoom, x, y)
+        if os.path.exists(filename):
+            os.remove(filename)
+            return True
+        return False
+
+    def delete_zoom(self, zoom):
+        '''Remove all the tiles of a zoom level
+
+        Returns:
+            [int]: the number of tiles removed
+        '''
+
+        directory = os.path.join(self.path, str(zoom))
+        if not os.path.isdir(directory):
+            return 0
+        count = sum(len([name for name in names if name.endswith('.pbf')])
+                    for _, _, names in os.walk(directory))
+        shutil.rmtree(directory)
+        return count
+
+    def set_metadata(self, metadata):
+        '''Write the TileJSON like metadata in metadata.json
+        '''
+
+        with open(os.path.join(self.path, 'metadata.json'), 'w') as metadata_file:
+            json.dump(metadata, metadata_file, indent=2, sort_keys=True)
+
+    def close(self):
+        pass
+
+
+class MBTilesWriter(object):
+    '''Write the tiles (gzip compressed) in an MBTiles SQLite file
+
+    The changes are committed every COMMIT_BATCH tiles (written or deleted) & on close.
+    '''
+
+    def __init__(self, filename):
+        '''Open (or create) the MBTiles file
+
+        Args:
+            filename ([str]): the MBTiles file
+        '''
+
+        self.filename = filename
+        self.changes = 0
+        self.connection = sqlite3.connect(filename)
+        self.connection.executescript(
+            'CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);'
+            'CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, '
+            'tile_row INTEGER, tile_data BLOB);'
+            'CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);'
+        )
+
+    def write(self, zoom, x, y, data):
+        '''Write (or replace) a tile
+        '''
+
+        stream = io.BytesIO()
+        with gzip.GzipFile(fileobj=stream, mode='wb', mtime=0) as gzip_file:
+            gzip_file.write(data)
+        # MBTiles rows follow the TMS scheme (y = 0 is the south edge)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)',
+            (zoom, x, (1 << zoom) - 1 - y, sqlite3.Binary(stream.getvalue()))
+        )
+        self._changed()
+
+    def delete(self, zoom, x, y):
+        '''Remove a tile that became empty
+
+        Returns:
+            [bool]: True if the tile existed
+        '''
+
+        cursor = self.connection.execute(
+            'DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+            (zoom, x, (1 << zoom) - 1 - y)
+        )
+        if cursor.rowcount > 0:
+            self._changed()
+            return True
+        return False
+
+    def _changed(self):
+        '''Count a tile change & commit the batch when full
+        '''
+
+        self.changes += 1
+        if self.changes % COMMIT_BATCH == 0:
+            self.connection.commit()
+
+    def delete_zoom(self, zoom):
+        '''Remove all the tiles of a zoom level
+
+        Returns:
+            [int]: the number of tiles removed
+        '''
+
+        return self.connection.execute('DELETE FROM tiles WHERE zoom_level = ?', (zoom,)).rowcount
+
+    def set_metadata(self, metadata):
+        '''Write the MBTiles metadata table
+        '''
+
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO metadata VALUES (?, ?)',
+            [(name, value if isinstance(value, str) else json.dumps(value))
+             for name, value in metadata.items()]
+        )
+
+    def close(self):
+        '''Commit & close the MBTiles file
+        '''
+
+        self.connection.commit()
+        self.connection.close()
+
+
+class TileGenerator(object):
+    '''Vector tile pyramid of the Airspaces of a source
+
+    Attributes:
+        uuids ([list]): the Airspace uuids
+        ids ([list]): the feature id of each Airspace (see feature_id)
+        rings ([list]): the Web Mercator (n, 2) array of each Airspace
+        properties ([list]): the feature properties of each Airspace
+        hashes ([list]): a hash of the geometry & properties of each Airspace
+        bboxes ([ndarray]): (m, 4) Web Mercator bounds of each Airspace
+    '''
+
+    def __init__(self, source, uuids=None, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        '''Load & project the Airspaces
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+            min_zoom ([int], optional): Defaults to MIN_ZOOM.
+            max_zoom ([int], optional): Defaults to MAX_ZOOM.
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.uuids = []
+        self.ids = []
+        self.rings = []
+        self.properties = []
+        self.hashes = []
+        for uuid in uuids:
+            gis_data = source.airspace_geometry_data(uuid)
+            if len(gis_data) < 3:
+                continue
+            admin_data = source.airspace_admin_data(uuid)
+            properties = dict((key, admin_data.get(key)) for key in PROPERTIES)
+            properties['uuid'] = uuid
+            digest = hashlib.sha1(pack_coordinates(gis_data))
+            digest.update(json.dumps(properties, sort_keys=True).encode('utf-8'))
+
+            self.uuids.append(uuid)
+            self.ids.append(feature_id(uuid))
+            self.rings.append(mercator(np.asarray([point[:2] for point in gis_data], dtype=np.float64)))
+            self.properties.append(properties)
+            self.hashes.append(digest.hexdigest())
+
+        self.bboxes = np.array([
+            [ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()]
+            for ring in self.rings
+        ]).reshape(-1, 4)
+
+    @property
+    def zooms(self):
+        '''The zoom levels of the pyramid
+        '''
+
+        return range(self.min_zoom, self.max_zoom + 1)
+
+    def tile_index(self, zoom):
+        '''Airspaces whose bounding box touches each tile of a zoom level
+
+        Returns:
+            [dict]: (x, y) => list of Airspace positions
+        '''
+
+        index = {}
+        for position, bounds in enumerate(self.bboxes.tolist()):
+            for tile in tile_range(bounds, zoom):
+                index.setdefault(tile, []).append(position)
+        return index
+
+    def _touched_tiles(self, manifest):
+        '''Tiles to render according to the manifest of the previous build
+
+        Returns:
+            [set]: (zoom, x, y) or None when all the tiles must be rendered
+        '''
+
+        if manifest is None or manifest.get('zooms') != [self.min_zoom, self.max_zoom]:
+            return None
+
+        previous = manifest['airspaces']
+        changed_bounds = []
+        current = set()
+        for uuid, digest, bounds in zip(self.uuids, self.hashes, self.bboxes.tolist()):
+            current.add(uuid)
+            entry = previous.get(uuid)
+            if entry is None or entry['hash'] != digest:
+                changed_bounds.append(bounds)
+                if entry is not None:
+                    changed_bounds.append(entry['bbox'])
+        for uuid, entry in previous.items():
+            if uuid not in current:
+                changed_bounds.append(entry['bbox'])
+
+        return set(
+            (zoom, x, y)
+            for bounds in changed_bounds
+            for zoom in self.zooms
+            for x, y in tile_range(bounds, zoom)
+        )
+
+    def build(self, writer, manifest=None, processes=None):
+        '''Render the tiles
+
+        Args:
+            writer ([object]): DirectoryTileWriter or MBTilesWriter
+            manifest ([str], optional): Defaults to None (full build). The manifest file of the
+                incremental builds (created if missing)
+            processes ([int], optional): Defaults to None (number of CPU). Number of worker processes
+                (1 renders the tiles in the current process)
+
+        Returns:
+            [dict]: {'written': int, 'deleted': int} (deleted: existing tiles removed)
+        '''
+
+        previous = None
+        if manifest is not None and os.path.exists(manifest):
+            with open(manifest) as manifest_file:
+                previous = json.load(manifest_file)
+        touched = self._touched_tiles(previous)
+
+        stats = {'written': 0, 'deleted': 0}
+        previous_bounds = []
+        if previous is not None and touched is None:
+            # Full build after a change of the zoom levels: the tiles of the previous build
+            # are deleted (removed zoom levels) or rendered again (they may have become empty)
+            first, last = previous.get('zooms', [self.min_zoom, self.max_zoom])
+            for zoom in range(first, last + 1):
+                if zoom not in self.zooms:
+                    stats['deleted'] += writer.delete_zoom(zoom)
+            previous_bounds = [entry['bbox'] for entry in previous['airspaces'].values()]
+
+        tasks = []
+        for zoom in self.zooms:
+            index = self.tile_index(zoom)
+            if touched is None:
+                tiles = set(index)
+                tiles.update(tile for bounds in previous_bounds for tile in tile_range(bounds, zoom))
+            else:
+                tiles = [(x, y) for tile_zoom, x, y in touched if tile_zoom == zoom]
+            tasks.extend((zoom, x, y, index.get((x, y), [])) for x, y in sorted(tiles))
+        logger.debug('Vector tiles: %s tiles to render', len(tasks))
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        pool = None
+        if processes > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(processes, _init_worker, (self.rings, self.properties, self.ids))
+            results = pool.imap_unordered(_render_tile, tasks, chunksize=16)
+        else:
+            _init_worker(self.rings, self.properties, self.ids)
+            results = (_render_tile(task) for task in tasks)
+
+        # The tiles are written as they are rendered (not kept in memory)
+        try:
+            for zoom, x, y, data in results:
+                if data is None:
+                    if writer.delete(zoom, x, y):
+                        stats['deleted'] += 1
+                else:
+                    writer.write(zoom, x, y, data)
+                    stats['written'] += 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        writer.set_metadata({
+            'name': LAYER,
+            'format': 'pbf',
+            'minzoom': str(self.min_zoom),
+            'maxzoom': str(self.max_zoom),
+            'json': json.dumps({'vector_layers': [{
+                'id': LAYER, 'minzoom': self.min_zoom, 'maxzoom': self.max_zoom,
+                'fields': dict((key, 'String') for key in PROPERTIES + ('uuid',)),
+            }]}),
+        })
+
+        if manifest is not None:
+            with open(manifest, 'w') as manifest_file:
+                json.dump({
+                    'zooms': [self.min_zoom, self.max_zoom],
+                    'airspaces': dict(
+                        (uuid, {'hash': digest, 'bbox': bounds})
+                        for uuid, digest, bounds in zip(self.uuids, self.hashes, self.bboxes.tolist())
+                    ),
+                }, manifest_file)
+
+        return stats
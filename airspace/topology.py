@@ -0,0 +1,295 @@
+'''Airspace airspace.topology Module
+
+Optional topological representation of a set of Airspaces.
+
+Airspaces following the same <Gbr> border, or sharing a boundary with a neighbour, all
+carry their own copy of the common vertices. The Topology class splits every Airspace
+ring at its junctions (vertices where two rings meet or separate) so that each shared
+edge "arc" is stored only once. An Airspace is then described as a list of references
+to these arcs (TopoJSON convention: ``~index`` means the arc is walked in reverse).
+
+Simplifying the arcs rather than the rings keeps the seams between neighbours consistent.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Coordinates are compared on this number of decimals (~1cm) to detect shared vertices
+VERTEX_PRECISION = 7
+
+
+def _vertex_key(point):
+    '''Hashable key identifying a vertex
+
+    Args:
+        point ([lat, long, ...]): a point as produced in the Airspace gis_data
+
+    Returns:
+        [tuple]: the rounded (lat, long) of the point
+    '''
+
+    return (round(point[0], VERTEX_PRECISION), round(point[1], VERTEX_PRECISION))
+
+
+def _ring_keys(gis_data):
+    '''Normalize the gis_data of an Airspace into a ring of vertex keys
+
+    Consecutive duplicated points are dropped and the closing point (if any) is removed
+
+    Args:
+        gis_data ([list]): the Airspace gis_data
+
+    Returns:
+        [list]: the list of vertex keys of the (implicitly closed) ring
+    '''
+
+    ring = []
+    for point in gis_data:
+        key = _vertex_key(point)
+        if not ring or ring[-1] != key:
+            ring.append(key)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    return ring
+
+
+def _segment_distance(point, start, stop):
+    '''Planar distance (in degree) between a point and a segment
+
+    Args:
+        point ((lat, long)): the point
+        start ((lat, long)): the first point of the segment
+        stop ((lat, long)): the last point of the segment
+
+    Returns:
+        [float]: the distance
+    '''
+
+    delta_lat = stop[0] - start[0]
+    delta_long = stop[1] - start[1]
+    length = delta_lat**2 + delta_long**2
+    if length == 0:
+        ratio = 0
+    else:
+        ratio = ((point[0] - start[0]) * delta_lat + (point[1] - start[1]) * delta_long) / length
+        ratio = max(0, min(1, ratio))
+    return ((point[0] - start[0] - ratio * delta_lat)**2 +
+            (point[1] - start[1] - ratio * delta_long)**2) ** 0.5
+
+
+def simplify_arc(points, tolerance):
+    '''Douglas-Peucker simplification of an arc keeping both ends untouched
+
+    Args:
+        points ([list]): list of (lat, long)
+        tolerance ([float]): the tolerance in decimal degree
+
+    Returns:
+        [list]: the simplified list of (lat, long)
+    '''
+
+    if len(points) < 3:
+        return list(points)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0
+        max_index = None
+        for i in range(first + 1, last):
+            distance = _segment_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                max_index = i
+        if max_index is not None and max_distance > tolerance:
+            keep[max_index] = True
+            stack.append((first, max_index))
+            stack.append((max_index, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class Topology(object):
+    '''Shared-edge storage of a set of Airspaces
+
+    Usage: add all the Airspaces with add_airspace() (or use from_source()), then call build().
+
+    Attributes:
+        arcs ([list]): list of arcs, each arc being a list of (lat, long)
+        airspaces ([dict]): Airspace uuid => list of arc references (``~index`` = reversed arc)
+    '''
+
+    def __init__(self):
+        '''Create an empty Topology
+        '''
+
+        self.arcs = []
+        self.airspaces = {}
+        self._rings = {}
+
+    @classmethod
+    def from_source(cls, source, uuids=None):
+        '''Build the Topology of the Airspaces present in a source
+
+        Args:
+            source ([object]): a supported Airspace source (AixmSource, ...)
+            uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+                The uuid of the Airspaces to add
+
+        Returns:
+            [Topology]: the built Topology
+        '''
+
+        if uuids is None:
+            uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+        topology = cls()
+        for uuid in uuids:
+            topology.add_airspace(uuid, source.airspace_geometry_data(uuid))
+        topology.build()
+        return topology
+
+    def add_airspace(self, uuid, gis_data):
+        '''Register the geometry of an Airspace
+
+        Args:
+            uuid ([string]): the Airspace uuid
+            gis_data ([list]): the Airspace gis_data
+        '''
+
+        self._rings[uuid] = _ring_keys(gis_data)
+
+    def build(self):
+        '''Split the registered rings at their junctions & deduplicate the arcs
+        '''
+
+        # A vertex is a junction as soon as it has more than 2 distinct neighbours
+        neighbours = {}
+        for ring in self._rings.values():
+            for i, key in enumerate(ring):
+                linked = neighbours.setdefault(key, set())
+                linked.add(ring[i - 1])
+                linked.add(ring[(i + 1) % len(ring)])
+        junctions = set(key for key, linked in neighbours.items() if len(linked) > 2)
+        logger.debug('Topology: %s vertices, %s junctions', len(neighbours), len(junctions))
+
+        self.arcs = []
+        self.airspaces = {}
+        arc_index = {}
+
+        for uuid, ring in self._rings.items():
+            refs = []
+            for arc in self._split_ring(ring, junctions):
+                key = tuple(arc)
+                if key in arc_index:
+                    refs.append(arc_index[key])
+                    continue
+                reverse_key = tuple(reversed(arc))
+                if reverse_key in arc_index:
+                    refs.append(~arc_index[reverse_key])
+                    continue
+                arc_index[key] = len(self.arcs)
+                refs.append(len(self.arcs))
+                self.arcs.append(arc)
+            self.airspaces[uuid] = refs
+
+    @staticmethod
+    def _split_ring(ring, junctions):
+        '''Cut a ring into arcs starting & ending on junctions
+
+        Args:
+            ring ([list]): the vertex keys of the ring
+            junctions ([set]): the junction vertex keys
+
+        Returns:
+            [list]: list of arcs (closed ring if there is no junction)
+        '''
+
+        if not ring:
+            return []
+
+        cuts = [i for i, key in enumerate(ring) if key in junctions]
+        if not cuts:
+            # Isolated ring: rotate to a canonical start to detect identical rings
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [rotated + [rotated[0]]]
+
+        rotated = ring[cuts[0]:] + ring[:cuts[0]] + [ring[cuts[0]]]
+        arcs = []
+        arc = [rotated[0]]
+        for key in rotated[1:]:
+            arc.append(key)
+            if key in junctions:
+                arcs.append(arc)
+                arc = [key]
+        return arcs
+
+    def _arc_points(self, ref, arcs):
+        '''Points of an arc reference in the walking direction
+        '''
+
+        if ref < 0:
+            return list(reversed(arcs[~ref]))
+        return list(arcs[ref])
+
+    def airspace_coordinates(self, uuid, arcs=None):
+        '''Rebuild the closed ring of an Airspace from its arcs
+
+        Args:
+            uuid ([string]): the Airspace uuid
+            arcs ([list], optional): Defaults to None (self.arcs). Alternative arcs
+                (for example simplified arcs) sharing the same indexes
+
+        Returns:
+            [list]: list of [lat, long] (first point repeated at the end)
+        '''
+
+        if arcs is None:
+            arcs = self.arcs
+
+        coordinates = []
+        for ref in self.airspaces[uuid]:
+            points = self._arc_points(ref, arcs)
+            if coordinates:
+                # The first point of an arc is the last point of the previous one
+                points = points[1:]
+            coordinates.extend([list(point) for point in points])
+        return coordinates
+
+    def simplify(self, tolerance):
+        '''Simplify every arc once
+
+        Because a shared arc is simplified only once, neighbouring Airspaces keep
+        identical seams.
+
+        Args:
+            tolerance ([float]): the Douglas-Peucker tolerance in decimal degree
+
+        Returns:
+            [list]: the simplified arcs (same indexes as self.arcs)
+        '''
+
+        return [simplify_arc(arc, tolerance) for arc in self.arcs]
+
+    def to_dict(self, arcs=None):
+        '''Compact serializable representation of the Topology
+
+        Args:
+            arcs ([list], optional): Defaults to None (self.arcs). Alternative arcs to export
+
+        Returns:
+            [dict]: {'arcs': [[[lat, long], ...], ...], 'airspaces': {uuid: [refs]}}
+        '''
+
+        if arcs is None:
+            arcs = self.arcs
+        return {
+            'arcs': [[list(point) for point in arc] for arc in arcs],
+            'airspaces': dict(self.airspaces),
+        }
@@ -0,0 +1,188 @@
+'''Airspace airspace.validation Module
+
+Batch validation & repair of the Airspace polygons.
+
+The polygons built from the source files are not always clean (rings not closed, self
+intersections around the border/arc joins, clockwise exterior rings, repeated points).
+This post-build pass checks all the Airspaces of a source in one call:
+
+    - the rings are closed & the consecutive duplicate points removed (NumPy)
+    - the validity is computed in bulk with the vectorized shapely predicates
+    - the invalid polygons are repaired with make_valid (polygonal parts only)
+    - the exterior rings are oriented counter-clockwise (holes clockwise)
+
+Each Airspace gets the list of the issues found & its repaired polygon (x=long, y=lat).
+An Airspace whose geometry cannot be read from the source (unknown geometry, decoding error)
+gets a GEOMETRY_ERROR issue: the other Airspaces of the source are still validated.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+import shapely
+
+from shapely.geometry.polygon import orient
+
+logger = logging.getLogger(__name__)
+
+UNCLOSED = 'unclosed ring'
+DUPLICATE_POINTS = 'duplicate points'
+TOO_FEW_POINTS = 'too few points'
+CLOCKWISE = 'clockwise exterior ring'
+INVALID = 'invalid'
+GEOMETRY_ERROR = 'geometry error'
+
+
+class AirspaceValidation(object):
+    '''Validation result of an Airspace
+
+    Attributes:
+        uuid ([string]): The UUID ot the Airspace
+        issues ([list]): the issues found (empty if the polygon was valid as built)
+        geometry ([Geometry]): the repaired Polygon/MultiPolygon (None if no polygon could be built)
+    '''
+
+    def __init__(self, uuid):
+        self.uuid = uuid
+        self.issues = []
+        self.geometry = None
+
+    @property
+    def valid(self):
+        '''True when the polygon had no issue
+        '''
+
+        return not self.issues
+
+    def __repr__(self):
+        return 'AirspaceValidation({!r}, {!r})'.format(self.uuid, self.issues)
+
+
+def _clean_ring(gis_data, result):
+    '''Closed ring without consecutive duplicates, recording the issues
+
+    Returns:
+        [ndarray]: (n, 2) array of [long, lat] or None if less than 3 distinct points
+    '''
+
+    points = np.asarray([point[:2] for point in gis_data], dtype=np.float64).reshape(-1, 2)[:, ::-1]
+    if len(points) and (points[0] != points[-1]).any():
+        result.issues.append(UNCLOSED)
+        points = np.vstack((points, points[:1]))
+
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = (np.diff(points, axis=0) != 0).any(axis=1)
+    if not keep.all():
+        result.issues.append(DUPLICATE_POINTS)
+        points = points[keep]
+
+    if len(points) < 4:
+        result.issues.append(TOO_FEW_POINTS)
+        return None
+    return points
+
+
+def _polygonal(geometry):
+    '''Polygonal part of a make_valid result (points & lines dropped)
+    '''
+
+    parts = [part for part in shapely.get_parts(shapely.get_parts(geometry))
+             if part.geom_type == 'Polygon' and not part.is_empty]
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    return shapely.MultiPolygon(parts)
+
+
+def _orient(geometry):
+    '''Counter-clockwise exterior rings, clockwise holes
+    '''
+
+    if geometry.geom_type == 'MultiPolygon':
+        return shapely.MultiPolygon([orient(polygon, 1.0) for polygon in geometry.geoms])
+    return orient(geometry, 1.0)
+
+
+def validate_airspaces(uuids, gis_data, repair=True):
+    '''Validate (and repair) a batch of Airspaces
+
+    Args:
+        uuids ([list]): the Airspace uuids
+        gis_data ([list]): the gis_data of each Airspace
+        repair ([bool], optional): Defaults to True. Repair the invalid polygons
+
+    Returns:
+        [list]: the AirspaceValidation of each Airspace (same order)
+    '''
+
+    results = [AirspaceValidation(uuid) for uuid in uuids]
+    rings = [_clean_ring(data, result) for data, result in zip(gis_data, results)]
+    built = [i for i, ring in enumerate(rings) if ring is not None]
+    if not built:
+        return results
+
+    # One flat coordinate array: the rings & polygons are created in one call each
+    coordinates = np.concatenate([rings[i] for i in built])
+    indices = np.repeat(np.arange(len(built)), [len(rings[i]) for i in built])
+    polygons = shapely.polygons(shapely.linearrings(coordinates, indices=indices))
+
+    clockwise = ~shapely.is_ccw(shapely.get_exterior_ring(polygons))
+    valid = shapely.is_valid(polygons)
+    invalid = np.flatnonzero(~valid)
+    reasons = shapely.is_valid_reason(polygons[invalid])
+    if repair and len(invalid):
+        polygons[invalid] = shapely.make_valid(polygons[invalid])
+
+    for position, reason in zip(invalid, reasons):
+        results[built[position]].issues.append('{}: {}'.format(INVALID, reason))
+
+    for position, i in enumerate(built):
+        result = results[i]
+        geometry = polygons[position]
+        if clockwise[position]:
+            result.issues.append(CLOCKWISE)
+        if repair:
+            geometry = _polygonal(geometry)
+            if geometry is not None and (clockwise[position] or not valid[position]):
+                geometry = _orient(geometry)
+        result.geometry = geometry
+
+    logger.debug('Validated %s airspaces, %s invalid', len(results), len(invalid))
+    return results
+
+
+def validate_source(source, uuids=None, repair=True):
+    '''Validate (and repair) all the Airspaces of a source
+
+    Args:
+        source ([object]): a supported Airspace source (AixmSource, ...)
+        uuids ([list], optional): Defaults to None (all the Airspaces of the source).
+        repair ([bool], optional): Defaults to True. Repair the invalid polygons
+
+    Returns:
+        [dict]: uuid => AirspaceValidation
+    '''
+
+    if uuids is None:
+        uuids = [airspace['uuid'] for airspace in source.list_airspace_uuid()]
+
+    results = {}
+    decoded, gis_data = [], []
+    for uuid in uuids:
+        try:
+            gis_data.append(source.airspace_geometry_data(uuid))
+        except Exception as exc:
+            # One broken Airspace must not abort the validation of the whole source
+            logger.warning('Airspace %s: geometry error (%s)', uuid, exc)
+            result = AirspaceValidation(uuid)
+            result.issues.append('{}: {}: {}'.format(GEOMETRY_ERROR, type(exc).__name__, exc))
+            results[uuid] = result
+        else:
+            decoded.append(uuid)
+
+    for result in validate_airspaces(decoded, gis_data, repair):
+        results[result.uuid] = result
+    return results
@@ -0,0 +1,6 @@
+'''XCTools benchmarks
+
+Each module can be executed directly, for example::
+
+    python -m benchmarks.airspace_encoding your_aixm_4.5_source_file.xml
+'''
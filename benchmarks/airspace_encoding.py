@@ -0,0 +1,55 @@
+'''Benchmark of the compact Airspace wire format against plain JSON
+
+Usage:
+    python -m benchmarks.airspace_encoding [aixm_4.5_file]
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import sys
+import timeit
+import zlib
+
+from airspace.aixm_parser import AixmSource
+from airspace.encoding import encode_polyline, decode_polyline, pack_coordinates, unpack_coordinates
+
+DEFAULT_SOURCE = './airspace/tests/aixm_4.5_extract.xml'
+
+
+def main(filename=DEFAULT_SOURCE, repeat=200):
+    '''Run the benchmark
+
+    Args:
+        filename ([str]): the AIXM 4.5 source file
+        repeat ([int]): number of decoding runs
+    '''
+
+    aixm_source = AixmSource(filename)
+    geometries = [
+        aixm_source.airspace_geometry_data(airspace['uuid'])
+        for airspace in aixm_source.list_airspace_uuid()
+    ]
+    coordinates = [[point[:2] for point in geometry] for geometry in geometries]
+
+    plain_json = json.dumps(coordinates)
+    polyline_json = json.dumps([encode_polyline(geometry) for geometry in geometries])
+    packed = [pack_coordinates(geometry) for geometry in geometries]
+
+    print('{} airspaces, {} points'.format(len(geometries), sum(len(g) for g in geometries)))
+    print('{:<16}{:>12}{:>12}{:>16}'.format('format', 'bytes', 'zlib', 'decode (ms)'))
+    results = [
+        ('json', len(plain_json), len(zlib.compress(plain_json.encode())),
+         lambda: json.loads(plain_json)),
+        ('polyline/json', len(polyline_json), len(zlib.compress(polyline_json.encode())),
+         lambda: [decode_polyline(p) for p in json.loads(polyline_json)]),
+        ('varint', sum(len(p) for p in packed), len(zlib.compress(b''.join(packed))),
+         lambda: [unpack_coordinates(p) for p in packed]),
+    ]
+    for name, size, compressed, decode in results:
+        duration = timeit.timeit(decode, number=repeat) / repeat * 1000
+        print('{:<16}{:>12}{:>12}{:>16.3f}'.format(name, size, compressed, duration))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,56 @@
+'''Benchmark of the single-pass AIXM element decoding against per-field XPath
+
+Usage:
+    python -m benchmarks.aixm_decoding [aixm_4.5_file]
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import sys
+import timeit
+
+from airspace.aixm_parser import AixmSource, decode_element
+
+DEFAULT_SOURCE = './airspace/tests/aixm_4.5_extract.xml'
+
+FIELDS = ('codeType', 'geoLat', 'geoLong', 'valCrc', 'geoLatArc', 'geoLongArc',
+          'valRadiusArc', 'uomRadiusArc')
+
+
+def xpath_decode(elem):
+    '''Reference decoding: one XPath evaluation per field (previous implementation)
+    '''
+
+    record = {}
+    for field in FIELDS:
+        value = elem.xpath(field + '/text()')
+        if value:
+            record[field] = value[0]
+    return record
+
+
+def main(filename=DEFAULT_SOURCE, repeat=20):
+    '''Run the benchmark
+
+    Args:
+        filename ([str]): the AIXM 4.5 source file
+        repeat ([int]): number of runs
+    '''
+
+    aixm_source = AixmSource(filename)
+    elems = aixm_source.tree.xpath('//Avx|//Gbv')
+    uuids = [airspace['uuid'] for airspace in aixm_source.list_airspace_uuid()]
+    print('{} <Avx>/<Gbv> elements, {} airspaces'.format(len(elems), len(uuids)))
+
+    for name, decode in (('xpath', xpath_decode), ('single pass', decode_element)):
+        duration = timeit.timeit(lambda: [decode(elem) for elem in elems], number=repeat) / repeat
+        print('{:<12} {:>10.3f} ms  {:>8.2f} us/element'.format(
+            name, duration * 1000, duration / max(len(elems), 1) * 1000000))
+
+    duration = timeit.timeit(
+        lambda: [aixm_source.airspace_geometry_data(uuid) for uuid in uuids], number=repeat) / repeat
+    print('{:<12} {:>10.3f} ms'.format('geometries', duration * 1000))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
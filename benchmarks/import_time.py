@@ -0,0 +1,70 @@
+'''Benchmark of the import time of the airspace modules
+
+Every module is imported in a fresh interpreter. The heavy dependencies loaded by the
+import are listed: the modules used by the consumers of a precompiled export should
+not load any of them.
+
+Usage:
+    python -m benchmarks.import_time [repeat]
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import subprocess
+import sys
+
+MODULES = (
+    'airspace.encoding',
+    'airspace.aixm_parser',
+    'airspace.graph',
+    'airspace.facets',
+    'airspace.sqlite_store',
+    'airspace.openair_parser',
+    'airspace.aixm51_parser',
+    'airspace.tiles',
+)
+
+HEAVY_DEPENDENCIES = ('pyproj', 'shapely', 'lxml', 'simplekml', 'numpy')
+
+SCRIPT = '''
+import sys, time
+start = time.perf_counter()
+import {module}
+duration = time.perf_counter() - start
+print(duration, ','.join(name for name in {heavy!r} if name in sys.modules))
+'''
+
+
+def import_time(module):
+    '''Import a module in a fresh interpreter
+
+    Args:
+        module ([str]): the module name
+
+    Returns:
+        [tuple]: (duration in second, list of the heavy dependencies loaded)
+    '''
+
+    output = subprocess.check_output(
+        [sys.executable, '-c', SCRIPT.format(module=module, heavy=HEAVY_DEPENDENCIES)]
+    ).decode().split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+def main(repeat=5):
+    '''Run the benchmark
+
+    Args:
+        repeat ([int]): number of imports per module (the best one is reported)
+    '''
+
+    repeat = int(repeat)
+    print('{:<28}{:>12}  {}'.format('module', 'best (ms)', 'heavy dependencies'))
+    for module in MODULES:
+        results = [import_time(module) for _ in range(repeat)]
+        best = min(duration for duration, _ in results)
+        print('{:<28}{:>12.1f}  {}'.format(module, best * 1000, ', '.join(results[0][1]) or '-'))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2])
@@ -0,0 +1,137 @@
+'''Benchmark & fuzzing of the NOTAM schedule parser
+
+A corpus of valid & near-valid schedules is generated from the parser grammar (see
+notam.sched_fuzz). For each schedule shape, the report gives the throughput of the parser
+(with & without the regex fast path), the peak memory allocated by a parse (tracemalloc) and
+the rate of the parsing errors (reported by p_error) & of the exceptions.
+
+Usage:
+    python -m benchmarks.schedule_parser [size] [seed]
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import logging
+import sys
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, defaultdict
+
+from notam.sched_fuzz import generate_corpus
+from notam.sched_parser import ScheduleParser
+
+NOTAM_BEGIN = datetime.datetime(2018, 3, 10)
+NOTAM_END = datetime.datetime(2018, 6, 30)
+
+
+class ParsingErrorCounter(logging.Handler):
+    '''Count the parsing errors logged by ScheduleParser.p_error
+    '''
+
+    def __init__(self):
+        super(ParsingErrorCounter, self).__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        if record.getMessage() == 'Parsing error':
+            self.count += 1
+
+
+def run_case(parser, schedule, errors):
+    '''Parse a schedule
+
+    Args:
+        parser ([ScheduleParser]): the parser
+        schedule ([str]): the schedule string
+        errors ([ParsingErrorCounter]): the handler of the parser logger
+
+    Returns:
+        [tuple]: (duration in second, parsing error, exception name or None)
+    '''
+
+    before = errors.count
+    exception = None
+    start = time.perf_counter()
+    try:
+        parser.parse(NOTAM_BEGIN, NOTAM_END, schedule)
+    except Exception as exc:
+        exception = type(exc).__name__
+    return time.perf_counter() - start, errors.count > before, exception
+
+
+def peak_allocation(parser, schedule):
+    '''Peak memory allocated while parsing a schedule (in bytes)
+    '''
+
+    tracemalloc.start()
+    try:
+        parser.parse(NOTAM_BEGIN, NOTAM_END, schedule)
+    except Exception:
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(size=2000, seed=0):
+    '''Run the benchmark
+
+    Args:
+        size ([int]): number of generated schedules
+        seed ([int]): seed of the generator
+    '''
+
+    corpus = list(generate_corpus(int(size), int(seed)))
+    parsers = OrderedDict((('fast path', ScheduleParser()), ('PLY', ScheduleParser(fast_path=False))))
+
+    # The parsing errors are counted instead of logged
+    parser_logger = logging.getLogger('notam.sched_parser')
+    errors = ParsingErrorCounter()
+    parser_logger.addHandler(errors)
+    propagate, parser_logger.propagate = parser_logger.propagate, False
+    try:
+        stats = defaultdict(lambda: {'count': 0, 'duration': Counter(), 'errors': 0,
+                                     'exceptions': Counter(), 'peak': 0})
+        kinds = ['valid' if case.kind == 'valid' else 'near-valid' for case in corpus]
+        keys = [((case.shape, kind), ('all', kind)) for case, kind in zip(corpus, kinds)]
+        for case_keys in keys:
+            for key in case_keys:
+                stats[key]['count'] += 1
+
+        # One pass per parser (the first parse after another parser or tracemalloc is slower)
+        for name, parser in parsers.items():
+            for case, case_keys in zip(corpus, keys):
+                duration, error, exception = run_case(parser, case.schedule, errors)
+                for key in case_keys:
+                    stats[key]['duration'][name] += duration
+                    if name == 'PLY':
+                        stats[key]['errors'] += error
+                        if exception:
+                            stats[key]['exceptions'][exception] += 1
+
+        for case, case_keys in zip(corpus, keys):
+            peak = peak_allocation(parsers['fast path'], case.schedule)
+            for key in case_keys:
+                stats[key]['peak'] += peak
+    finally:
+        parser_logger.removeHandler(errors)
+        parser_logger.propagate = propagate
+
+    print('{} schedules (seed {})'.format(len(corpus), seed))
+    print('{:<44}{:<11}{:>6}{:>13}{:>10}{:>10}{:>8}{:>8}  {}'.format(
+        'shape', 'kind', 'count', 'fast (/s)', 'PLY (/s)', 'peak KiB', 'error', 'exc', 'exceptions'))
+    for (shape, kind), stat in sorted(stats.items(), key=lambda item: (item[0][0] == 'all', item[0])):
+        count = stat['count']
+        print('{:<44}{:<11}{:>6}{:>13.0f}{:>10.0f}{:>10.1f}{:>7.1f}%{:>7.1f}%  {}'.format(
+            shape, kind, count,
+            count / max(stat['duration']['fast path'], 1e-9),
+            count / max(stat['duration']['PLY'], 1e-9),
+            stat['peak'] / count / 1024,
+            100 * stat['errors'] / count,
+            100 * sum(stat['exceptions'].values()) / count,
+            ', '.join('{} {}'.format(name, number) for name, number in stat['exceptions'].most_common()) or '-'))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:3])
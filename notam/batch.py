@@ -0,0 +1,93 @@
+'''NOTAM notam.batch Module
+
+Batch expansion of the schedules of a whole briefing.
+
+The (schedule, notam_begin, notam_end) triples are deduplicated (same normalized schedule
+string & window) and the distinct ones are expanded by a process pool. Each worker builds its
+ScheduleParser once in the pool initializer (the lexer & LALR tables are then warm for all
+its tasks). The results are returned in the order of the input triples.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+import multiprocessing
+
+from .sched_parser import ScheduleCache, ScheduleParser
+
+logger = logging.getLogger(__name__)
+
+# Per worker process parser (see _init_worker)
+_WORKER = {}
+
+
+def _init_worker():
+    '''Worker process initializer: build the parser (& its tables) once
+    '''
+
+    _WORKER['parser'] = ScheduleParser()
+
+
+def _expand(task):
+    '''Expand a schedule (executed in a worker process)
+
+    Args:
+        task ([tuple]): (schedule, notam_begin, notam_end, location)
+
+    Returns:
+        [tuple]: (tuple of datetime tupple, error message) one of them is None
+    '''
+
+    schedule, notam_begin, notam_end, location = task
+    try:
+        return tuple(_WORKER['parser'].parse(notam_begin, notam_end, schedule, location)), None
+    except Exception as exc:
+        # Exceptions with custom constructors cannot always be pickled back
+        return None, '{}: {}'.format(type(exc).__name__, exc)
+
+
+def expand_schedules(triples, processes=None, chunksize=8):
+    '''Expand many schedules at once
+
+    Args:
+        triples ([iterable]): (schedule, notam_begin, notam_end) of each NOTAM, optionally
+            followed by the NOTAM location for the SR/SS schedules (see Notam.location)
+        processes ([int], optional): Defaults to None (number of CPUs). 1 expands in this process
+        chunksize ([int], optional): Defaults to 8. Distinct schedules sent per worker task
+
+    Returns:
+        [list]: the tuple of datetime tupple of each triple (same order), None when the
+            schedule could not be parsed (the error is logged)
+    '''
+
+    keys = []
+    tasks = {}
+    for triple in triples:
+        schedule, notam_begin, notam_end = triple[:3]
+        location = triple[3] if len(triple) > 3 else None
+        schedule = ScheduleCache.normalize(schedule or '')
+        key = (schedule, notam_begin, notam_end, ScheduleCache.location_key(schedule, location))
+        keys.append(key)
+        # The first location of a rounded location is used for all its schedules
+        tasks.setdefault(key, (len(tasks), location))
+    unique = sorted(tasks, key=lambda key: tasks[key][0])
+    task_list = [key[:3] + (tasks[key][1],) for key in unique]
+    logger.debug('Batch expansion: %s schedules, %s distinct', len(keys), len(unique))
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes > 1 and len(unique) > chunksize:
+        pool = multiprocessing.Pool(min(processes, len(unique) // chunksize), _init_worker)
+        try:
+            results = pool.map(_expand, task_list, chunksize=chunksize)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        _init_worker()
+        results = [_expand(task) for task in task_list]
+
+    for task, (_, error) in zip(task_list, results):
+        if error is not None:
+            logger.error('Batch expansion: schedule "%s" failed (%s)', task[0], error)
+    return [results[tasks[key][0]][0] for key in keys]
@@ -197,6 +197,41 @@ class Notam(object):
             self.coord_radius = q_match.group('coord_radius')
         else:
             raise DecodingError(self, 'Unsupported q_line format "{}"'.format(self.full_q_line))
+        self._parse_coord_radius()
+
+    def _parse_coord_radius(self):
+        ''' Decode the Q line coordinate & radius (ex. 4837N00240E003)
+
+            latitude/longitude (decimal degree, north & east positive) & radius (NM) are None
+            when the coordinate is missing or not supported
+        '''
+
+        self.latitude = self.longitude = self.radius = None
+        coord_match = re.match(
+            r'(?P<lat_deg>[0-9]{2})(?P<lat_min>[0-9]{2})(?P<lat_hem>[NS])'
+            r'(?P<long_deg>[0-9]{3})(?P<long_min>[0-9]{2})(?P<long_hem>[EW])(?P<radius>[0-9]{3})?',
+            self.coord_radius.strip()
+            )
+        if coord_match:
+            latitude = int(coord_match.group('lat_deg')) + int(coord_match.group('lat_min')) / 60
+            longitude = int(coord_match.group('long_deg')) + int(coord_match.group('long_min')) / 60
+            self.latitude = -latitude if coord_match.group('lat_hem') == 'S' else latitude
+            self.longitude = -longitude if coord_match.group('long_hem') == 'W' else longitude
+            if coord_match.group('radius'):
+                self.radius = int(coord_match.group('radius'))
+        else:
+            logger.debug('%s - Unsupported coordinate "%s"', self.reference, self.coord_radius)
+
+    @property
+    def location(self):
+        '''(latitude, longitude) of the Q line coordinate (None if not available)
+
+        Used by the ScheduleParser for the SR/SS schedules
+        '''
+
+        if self.latitude is None:
+            return None
+        return self.latitude, self.longitude
 
     def _strdatetime_to_datetime(self, strdatetime):
         ''' Converts a NOTAM datetime string into a python datetime
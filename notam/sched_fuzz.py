@@ -0,0 +1,239 @@
+'''NOTAM notam.sched_fuzz Module
+
+Grammar based generator of schedule strings for the fuzzing & the benchmarks of the
+ScheduleParser.
+
+The grammar is read from the productions of the LALR tables of the parser & the tokens of
+ScheduleLexer.tokens: the generated corpora follow the grammar as it is implemented. A random
+derivation is made for each "shape" (the right side of a complexdate production, ex.
+'DAILY timeslots exclusion'), its tokens are rendered with plausible values (dates 01-28,
+ranges in increasing order except some MONTH DATE RANGE MONTH DATE ranges crossing the year
+end, ex. 'NOV 20-FEB 03') and the near-valid cases apply a single mutation to a valid one
+(token dropped, duplicated, swapped, replaced, out of range value or illegal character). The
+drop & swap mutations are only applied to schedules of 2 tokens or more.
+
+The generation only depends on the seed: the same corpus can be replayed.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+import random
+from collections import namedtuple
+
+from .sched_parser import MONTH, WEEK, ScheduleLexer, _master_parser
+
+logger = logging.getLogger(__name__)
+
+# A generated schedule
+# - shape: right side of the complexdate production of its timeslices
+# - kind: 'valid' or the mutation of the near-valid cases
+# - schedule: the schedule string
+# - tokens: token types of the string before the mutation
+FuzzCase = namedtuple('FuzzCase', ['shape', 'kind', 'schedule', 'tokens'])
+
+MUTATIONS = ('drop', 'duplicate', 'swap', 'replace', 'out_of_range', 'illegal')
+
+# Lexer values outside of the grammar semantic (still matching the token regexp)
+OUT_OF_RANGE = {
+    'DATE': ('00', '32', '39'),
+    'HOUR': ('2400', '2959'),
+}
+ILLEGAL_CHARACTERS = ('/', '.', ':', 'X', '(')
+
+# Ratio of the MONTH DATE RANGE MONTH DATE ranges crossing the year end
+YEAR_END_RATE = 0.25
+
+_MONTHS = sorted(MONTH, key=MONTH.get)
+_DAYS = sorted((day for day in WEEK if WEEK[day] < 7), key=WEEK.get)
+_ORDER = dict([(month, index) for index, month in enumerate(_MONTHS)] +
+              [(day, index) for index, day in enumerate(_DAYS)])
+
+
+def _render(token, rng):
+    '''Random value of a token type
+    '''
+
+    if token == 'MONTH':
+        return rng.choice(_MONTHS)
+    if token == 'DAY':
+        return rng.choice(_DAYS)
+    if token == 'DATE':
+        return '{:02d}'.format(rng.randint(1, 28))
+    if token == 'HOUR':
+        return '{:02d}{:02d}'.format(rng.randint(0, 23), rng.randrange(0, 60, 5))
+    if token == 'GROUP':
+        return rng.choice((',', '\n'))
+    return {
+        'H24': 'H24', 'DAILY': 'DAILY', 'EVERY': 'EVERY', 'HOL': 'HOL', 'EXC': 'EXC',
+        'SUNRISE': 'SR', 'SUNSET': 'SS', 'RANGE': '-', 'PLUS': 'PLUS', 'MINUS': 'MINUS', 'AND': 'AND',
+    }[token]
+
+
+def _sort_key(token, value):
+    return _ORDER[value] if token in ('MONTH', 'DAY') else int(value)
+
+
+def _order_ranges(tokens, rng):
+    '''Put the bounds of the ranges in increasing order (in place)
+
+    A YEAR_END_RATE of the month ranges are put in decreasing order: they cross the year end.
+
+    Args:
+        tokens ([list]): [token type, value] of the schedule
+        rng ([Random]): the random generator
+    '''
+
+    for index, (token, _) in enumerate(tokens):
+        if token != 'RANGE' or index < 1 or index + 1 >= len(tokens):
+            continue
+        before, after = tokens[index - 1], tokens[index + 1]
+        if before[0] == after[0] and before[0] in ('MONTH', 'DAY', 'DATE', 'HOUR'):
+            if _sort_key(*before) > _sort_key(*after):
+                before[1], after[1] = after[1], before[1]
+        elif (before[0], after[0]) == ('DATE', 'MONTH') and index >= 2 and index + 2 < len(tokens):
+            # MONTH DATE RANGE MONTH DATE
+            first, last = tokens[index - 2:index], tokens[index + 1:index + 3]
+            first_key = (_sort_key(*first[0]), _sort_key(*first[1]))
+            last_key = (_sort_key(*last[0]), _sort_key(*last[1]))
+            if first_key != last_key and (first_key > last_key) != (rng.random() < YEAR_END_RATE):
+                for start, stop in zip(first, last):
+                    start[1], stop[1] = stop[1], start[1]
+
+
+class ScheduleGrammar(object):
+    '''Grammar of the ScheduleParser & random derivations
+
+    Attributes:
+        tokens ([tuple]): the terminals (ScheduleLexer.tokens)
+        productions ([dict]): right sides (tuples of symbols) of each nonterminal
+        shapes ([list]): right sides of the complexdate productions (as strings)
+    '''
+
+    def __init__(self):
+        self.tokens = ScheduleLexer.tokens
+        self.productions = {}
+        for production in _master_parser().productions[1:]:
+            name, right = production.str.split('->')
+            self.productions.setdefault(name.strip(), []).append(tuple(right.split()))
+        self.shapes = [' '.join(right) for right in self.productions['complexdate']]
+
+    def derive(self, symbol, rng, depth=3):
+        '''Random sequence of tokens derived from a symbol
+
+        Args:
+            symbol ([str]): a nonterminal or a token
+            rng ([Random]): the random generator
+            depth ([int], optional): Defaults to 3. Recursive productions allowed on a path
+
+        Returns:
+            [list]: token types
+        '''
+
+        if symbol in self.tokens:
+            return [symbol]
+        rights = self.productions[symbol]
+        if depth <= 0:
+            # Only the productions ending the recursion
+            rights = [right for right in rights if symbol not in right] or rights
+        right = rng.choice(rights)
+        if symbol in right:
+            depth -= 1
+        return [token for child in right for token in self.derive(child, rng, depth)]
+
+    def schedule_tokens(self, shape, rng, timeslices=1):
+        '''Token types of a schedule made of timeslices of a shape
+
+        Args:
+            shape ([str]): one of the shapes
+            rng ([Random]): the random generator
+            timeslices ([int], optional): Defaults to 1.
+
+        Returns:
+            [list]: token types
+        '''
+
+        tokens = []
+        for index in range(timeslices):
+            for child in shape.split():
+                tokens.extend(self.derive(child, rng))
+            if index + 1 < timeslices:
+                tokens.append(rng.choice(('GROUP', 'AND')))
+        return tokens
+
+
+def _mutations(tokens):
+    '''The mutations applicable to a schedule (drop & swap need 2 tokens)
+    '''
+
+    if len(tokens) > 1:
+        return MUTATIONS
+    return tuple(mutation for mutation in MUTATIONS if mutation not in ('drop', 'swap'))
+
+
+def _mutate(tokens, mutation, rng):
+    '''Apply a mutation to the [token type, value] of a schedule
+
+    Args:
+        tokens ([list]): [token type, value] of the schedule
+        mutation ([str]): one of the _mutations() of the schedule
+        rng ([Random]): the random generator
+
+    Returns:
+        [list]: the values of the mutated schedule
+    '''
+
+    values = [value for _, value in tokens]
+    index = rng.randrange(len(values))
+    if mutation == 'drop':
+        del values[index]
+    elif mutation == 'duplicate':
+        values.insert(index, values[index])
+    elif mutation == 'swap':
+        index = min(index, len(values) - 2)
+        values[index], values[index + 1] = values[index + 1], values[index]
+    elif mutation == 'replace':
+        values[index] = _render(rng.choice(ScheduleLexer.tokens), rng)
+    elif mutation == 'out_of_range':
+        candidates = [position for position, (token, _) in enumerate(tokens) if token in OUT_OF_RANGE]
+        if candidates:
+            index = rng.choice(candidates)
+            values[index] = rng.choice(OUT_OF_RANGE[tokens[index][0]])
+        else:
+            values[index] = rng.choice(OUT_OF_RANGE['DATE'])
+    elif mutation == 'illegal':
+        values.insert(index, rng.choice(ILLEGAL_CHARACTERS))
+    else:
+        raise ValueError('Unknown mutation "{}"'.format(mutation))
+    return values
+
+
+def generate_corpus(size, seed=0, near_valid=0.5, shapes=None, max_timeslices=3):
+    '''Generate schedule strings (round robin on the shapes)
+
+    Args:
+        size ([int]): number of cases
+        seed ([int], optional): Defaults to 0. Seed of the random generator
+        near_valid ([float], optional): Defaults to 0.5. Ratio of mutated cases
+        shapes ([list], optional): Defaults to None (all the shapes of the grammar)
+        max_timeslices ([int], optional): Defaults to 3. Maximum timeslices per schedule
+
+    Returns:
+        [generator]: generator of FuzzCase
+    '''
+
+    rng = random.Random(seed)
+    grammar = ScheduleGrammar()
+    shapes = shapes or grammar.shapes
+    for count in range(size):
+        shape = shapes[count % len(shapes)]
+        types = grammar.schedule_tokens(shape, rng, rng.randint(1, max_timeslices))
+        tokens = [[token, _render(token, rng)] for token in types]
+        _order_ranges(tokens, rng)
+        if rng.random() < near_valid:
+            kind = rng.choice(_mutations(tokens))
+            values = _mutate(tokens, kind, rng)
+        else:
+            kind = 'valid'
+            values = [value for _, value in tokens]
+        yield FuzzCase(shape, kind, ' '.join(values).replace(' \n ', '\n'), tuple(types))
@@ -1,14 +1,31 @@
 '''NOTAM notam.sched_parser Module
 
+The lexer & LALR tables are built once per process and shared by all the ScheduleParser
+objects (each object gets a lexer clone & a parser bound to its own methods). Optimized
+tables can be generated at build time with build_tables(): they are then loaded from disk
+instead of being regenerated from the grammar docstrings.
+
+The loaded tables are checked against the current rules: yacc compares the grammar signature
+of sched_parsetab.py, and sched_lextab.py (which PLY loads without any check) is compared
+with the token names, the token regexes & the ignored characters (see _lextab_is_current).
+A stale table is ignored & the tables are built from the rules (run build_tables() again).
+
 Raises:
     LexerWarning: Exception raised when a Lexer tokenization error is detected
 '''
 
 from __future__ import absolute_import, division, print_function
 
+import copy
 import datetime
 import calendar
+import importlib
 import logging
+import os
+import re
+import threading
+
+from collections import namedtuple, OrderedDict
 
 import ply.lex as lex
 import ply.yacc as yacc
@@ -120,6 +137,412 @@ class LexerWarning(PlyError):
         super(LexerWarning, self).__init__(lexer.lexdata, exc_msg)
 
 
+# Generated tables (see build_tables())
+LEXTAB = 'sched_lextab'
+PARSETAB = 'sched_parsetab'
+TABLES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Process wide lexer & parser prototypes
+_TABLES = {}
+
+
+def _table_module(name):
+    '''Full module name of a generated table
+    '''
+
+    return '{}.{}'.format(__package__ or 'notam', name)
+
+
+def _lextab_is_current(lextab):
+    '''Check that a generated lexer table matches the ScheduleLexer rules
+
+    Args:
+        lextab ([dict]): the globals of the sched_lextab module
+
+    Returns:
+        [bool]: True if the token names, regexes & ignored characters are the same
+    '''
+
+    if set(lextab.get('_lextokens', ())) != set(ScheduleLexer.tokens):
+        return False
+    if lextab.get('_lexstateignore', {}).get('INITIAL') != ScheduleLexer.t_ignore:
+        return False
+
+    # The master regexes are the '|' join of a (?P<rule>regex) group per rule
+    groups = []
+    for name, rule in vars(ScheduleLexer).items():
+        if not name.startswith('t_') or name in ('t_ignore', 't_error'):
+            continue
+        regex = getattr(rule, 'regex', rule.__doc__) if callable(rule) else rule
+        groups.append('(?P<{}>{})'.format(name, regex))
+    masters = [master for master, _ in lextab.get('_lexstatere', {}).get('INITIAL', [])]
+    if sum(len(master) for master in masters) != sum(len(group) + 1 for group in groups) - len(masters):
+        return False
+    return all(any(group in master for master in masters) for group in groups)
+
+
+def _load_lextab():
+    '''The globals of the generated lexer table (None if missing or stale)
+    '''
+
+    if not os.path.exists(os.path.join(TABLES_DIR, LEXTAB + '.py')):
+        return None
+    try:
+        lextab = vars(importlib.import_module(_table_module(LEXTAB)))
+    except ImportError:
+        return None
+    if not _lextab_is_current(lextab):
+        logger.warning('ScheduleLexer: %s does not match the token rules, ignored '
+                       '(run build_tables() again)', LEXTAB)
+        return None
+    return lextab
+
+
+def _master_lexer():
+    '''The lexer shared by all the ScheduleLexer objects (built on first use)
+
+    Returns:
+        [Lexer]: the PLY lexer (to be cloned)
+    '''
+
+    if 'lexer' not in _TABLES:
+        prototype = ScheduleLexer.__new__(ScheduleLexer)
+        optimize = _load_lextab() is not None
+        _TABLES['lexer'] = lex.lex(module=prototype, optimize=int(optimize), lextab=_table_module(LEXTAB))
+        logger.debug('ScheduleLexer: master lexer ready (optimized tables: %s)', optimize)
+    return _TABLES['lexer']
+
+
+def _master_parser():
+    '''The LALR parser shared by all the ScheduleParser objects (built on first use)
+
+    The tables are read from the generated PARSETAB module when it matches the grammar.
+
+    Returns:
+        [LRParser]: the PLY parser (its productions are bound to a prototype object)
+    '''
+
+    if 'parser' not in _TABLES:
+        prototype = ScheduleParser.__new__(ScheduleParser)
+        _TABLES['parser'] = yacc.yacc(module=prototype, tabmodule=_table_module(PARSETAB), write_tables=False,
+                                      debug=False, errorlog=yacc.NullLogger())
+        logger.debug('ScheduleParser: master parser ready')
+    return _TABLES['parser']
+
+
+class _BoundTables(object):
+    '''LR tables of the master parser with the productions bound to another object
+    '''
+
+    def __init__(self, master, module):
+        self.lr_action = master.action
+        self.lr_goto = master.goto
+        self.lr_productions = []
+        for production in master.productions:
+            production = copy.copy(production)
+            if production.func:
+                production.callable = getattr(module, production.func)
+            self.lr_productions.append(production)
+
+
+ALL_WEEKDAYS = frozenset(range(7))
+
+# Expansion rules of a timeslice:
+# - DayRule: every day of [start, start + days) whose weekday is in weekdays (day & multimonth modes)
+# - DateRule: a list of dates (date mode)
+# The timeranges are (start, stop) timedelta added to each day, or the SUNRISE/SUNSET markers
+# resolved for each day (see resolve_timeranges). A range stopping at or before its start
+# (ex. 2200-0200) ends the next day.
+DayRule = namedtuple('DayRule', ['start', 'days', 'weekdays', 'timeranges'])
+DateRule = namedtuple('DateRule', ['dates', 'timeranges'])
+
+# SR & SS bounds of a timerange
+SUNRISE = 'SR'
+SUNSET = 'SS'
+
+# SR & SS without location (or without sunrise/sunset)
+FALLBACK_SUN_TIMES = (datetime.timedelta(0), datetime.timedelta(hours=23, minutes=59))
+
+# Bounds of the SR/SS offsets from a rule day start: the sunrise/sunset of a UTC day can be
+# on the previous or next UTC day & the rule day may start after midnight (day mode)
+SOLAR_SPAN = (datetime.timedelta(days=-2), datetime.timedelta(days=2))
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def is_solar(timeranges):
+    '''True if some timeranges are bounded by SR or SS
+    '''
+
+    return any(bound in (SUNRISE, SUNSET) for trange in timeranges for bound in trange)
+
+
+def resolve_timeranges(timeranges, sun_times=None):
+    '''Replace the SR/SS markers by the sunrise/sunset of a day
+
+    The overnight ranges (stop at or before the start, ex. 2200-0200) end the next day.
+
+    Args:
+        timeranges ([tuple]): (start, stop) timedelta or SUNRISE/SUNSET markers
+        sun_times ([tuple], optional): Defaults to None (FALLBACK_SUN_TIMES). (sunrise, sunset)
+            timedelta of the day
+
+    Returns:
+        [tuple]: (start, stop) timedelta
+    '''
+
+    sunrise, sunset = sun_times or FALLBACK_SUN_TIMES
+    bounds = {SUNRISE: sunrise, SUNSET: sunset}
+    resolved = []
+    for start, stop in timeranges:
+        start, stop = bounds.get(start, start), bounds.get(stop, stop)
+        if stop <= start:
+            stop += ONE_DAY
+        resolved.append((start, stop))
+    return tuple(resolved)
+
+
+def anchor_sun_times(ts_day, sun_times):
+    '''Sunrise/sunset of a UTC day as offsets from a rule day start
+
+    The hours are offsets from the rule day start, which has the time of day of notam_begin
+    in day mode. SR & SS are absolute UTC times: they are anchored at the day's midnight.
+
+    Args:
+        ts_day ([datetime]): the rule day start
+        sun_times ([tuple]): (sunrise, sunset) timedelta from 00:00 UTC of the day
+
+    Returns:
+        [tuple]: (sunrise, sunset) timedelta from ts_day
+    '''
+
+    time_of_day = ts_day - datetime.datetime.combine(ts_day.date(), datetime.time())
+    return sun_times[0] - time_of_day, sun_times[1] - time_of_day
+
+
+def _day_index_range(rule, window_start, window_end):
+    '''Indices of the days of a DayRule that may have a timeslot in the window
+    '''
+
+    first, last = 0, rule.days
+    if not rule.timeranges:
+        return 0, 0
+    timeranges = resolve_timeranges(rule.timeranges, SOLAR_SPAN)
+    if window_start is not None:
+        # One more day: a SR/SS range may end the next day (ex. 2200-SR)
+        latest_stop = max(max(trange) for trange in timeranges) + ONE_DAY
+        offset = (window_start - rule.start - latest_stop).total_seconds()
+        first = max(first, int(offset // 86400))
+    if window_end is not None:
+        earliest_start = min(trange[0] for trange in timeranges)
+        offset = (window_end - rule.start - earliest_start).total_seconds()
+        last = min(last, int(offset // 86400) + 1)
+    return first, last
+
+
+def _weekdays_between(start, count, weekdays):
+    '''The count days from start whose weekday is in weekdays
+    '''
+
+    one_day = datetime.timedelta(1)
+    weekday = start.weekday()
+    ts_day = start
+    for _ in range(count):
+        if weekday in weekdays:
+            yield ts_day
+        ts_day += one_day
+        weekday = (weekday + 1) % 7
+
+
+def _day_sun_times(days, location):
+    '''(day, sunrise/sunset) of the days at a location (None without location)
+    '''
+
+    if location is None:
+        return ((ts_day, None) for ts_day in days)
+
+    from .solar import SOLAR_TABLE
+
+    days = list(days)
+    return zip(days, SOLAR_TABLE.sun_times(location[0], location[1], [ts_day.date() for ts_day in days]))
+
+
+def expand_rule(rule, window_start=None, window_end=None, location=None):
+    '''Generate the timeslots of an expansion rule
+
+    Args:
+        rule ([DayRule/DateRule]): the rule of a timeslice
+        window_start ([datetime], optional): Defaults to None. Only the timeslots stopping after it
+        window_end ([datetime], optional): Defaults to None. Only the timeslots starting before it
+        location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM used for
+            the SR/SS bounds (0000/2359 without location)
+
+    Returns:
+        [generator]: generator of datetime tupple
+    '''
+
+    if isinstance(rule, DayRule):
+        first, last = _day_index_range(rule, window_start, window_end)
+        days = _weekdays_between(rule.start + datetime.timedelta(first), last - first, rule.weekdays)
+    else:
+        days = rule.dates
+
+    timeranges = resolve_timeranges(rule.timeranges)
+    if location is not None and is_solar(rule.timeranges):
+        days = _day_sun_times(days, location)
+    else:
+        days = _day_sun_times(days, None)
+
+    for ts_day, sun_times in days:
+        if sun_times is not None:
+            timeranges = resolve_timeranges(rule.timeranges, anchor_sun_times(ts_day, sun_times))
+        for trange in timeranges:
+            ts_start = ts_day + trange[0]
+            ts_stop = ts_day + trange[1]
+            if window_start is not None and ts_stop <= window_start:
+                continue
+            if window_end is not None and ts_start >= window_end:
+                continue
+            yield (ts_start, ts_stop)
+
+
+def expand_rules(rules, window_start=None, window_end=None, location=None):
+    '''Generate the timeslots of a list of expansion rules (in the rules order)
+
+    Args:
+        rules ([list]): the DayRule/DateRule of a schedule
+        window_start ([datetime], optional): Defaults to None (no lower bound).
+        window_end ([datetime], optional): Defaults to None (no upper bound).
+        location ([tuple], optional): Defaults to None. (latitude, longitude) for the SR/SS bounds
+
+    Returns:
+        [generator]: generator of datetime tupple
+    '''
+
+    for rule in rules:
+        for timeslot in expand_rule(rule, window_start, window_end, location):
+            yield timeslot
+
+
+# Fast path: the common single timeslice schedules are decoded with regexes (same tokens as
+# the lexer) into the rules the grammar would reduce. Anything else goes through PLY.
+_HOUR = r'[0-2][0-9][0-5][0-9]'
+_DAY = r'MON|TUE|WED|THU|FRI|SAT|SUN'
+_TIMERANGE = r'(?:(?:{hour}|SR)-(?:{hour}|SS)|H24)'.format(hour=_HOUR)
+_TIMESLOTS = r'(?P<timeslots>{tr}(?:[ \t]+{tr})*)'.format(tr=_TIMERANGE)
+_HHMM_TIMEDELTAS = {}
+_TIMERANGE_RE = re.compile(r'({hour}|SR)-({hour}|SS)|H24'.format(hour=_HOUR))
+
+_FAST_PATHS = (
+    # DAILY 0700-1500 / DAILY SR-SS / DAILY 0700-1500 EXC SAT SUN
+    ('daily', re.compile(
+        r'DAILY[ \t]+{}(?:[ \t]+EXC(?P<exc>(?:[ \t]+(?:{}|HOL))+))?\Z'.format(_TIMESLOTS, _DAY)
+    )),
+    # MON-FRI 0630-1600
+    ('dayrange', re.compile(
+        r'(?P<first>{day})-(?P<last>{day})[ \t]+{}\Z'.format(_TIMESLOTS, day=_DAY)
+    )),
+    # MAR 12 0800-1000
+    ('date', re.compile(
+        r'(?P<month>{})[ \t]+(?P<date>[0-3][0-9])[ \t]+{}\Z'.format('|'.join(MONTH), _TIMESLOTS)
+    )),
+    # H24 (timeslots without any date: nothing is expanded)
+    ('timeslots', re.compile(_TIMESLOTS + r'\Z')),
+)
+
+
+def _hhmm_timedelta(hhmm):
+    '''timedelta of a "hhmm" string (memoized: only a few thousand possible values)
+    '''
+
+    try:
+        return _HHMM_TIMEDELTAS[hhmm]
+    except KeyError:
+        delta = _HHMM_TIMEDELTAS[hhmm] = datetime.timedelta(hours=int(hhmm[0:2]), minutes=int(hhmm[2:4]))
+        return delta
+
+
+def _fast_timeranges(timeslots):
+    '''Timeranges of a timeslots string (as reduced by ScheduleParser.p_timerange)
+    '''
+
+    timeranges = []
+    for match in _TIMERANGE_RE.finditer(timeslots):
+        start_time, stop_time = match.groups()
+        if start_time is None:
+            start_time, stop_time = '0000', '2359'
+        timeranges.append((
+            SUNRISE if start_time == 'SR' else _hhmm_timedelta(start_time),
+            SUNSET if stop_time == 'SS' else _hhmm_timedelta(stop_time)
+        ))
+    return tuple(timeranges)
+
+
+def fast_rules(notam_begin, notam_end, data):
+    '''Decode the common schedule shapes without PLY
+
+    Args:
+        notam_begin ([datetime]): the effective start of the NOTAM
+        notam_end ([datetime]): the effective end of the NOTAM
+        data ([string]): the schedule string
+
+    Returns:
+        [list]: the rules ScheduleParser would reduce, None if the shape is not supported
+    '''
+
+    data = data.strip(' \t')
+    for shape, regex in _FAST_PATHS:
+        match = regex.match(data)
+        if match:
+            break
+    else:
+        return None
+
+    timeranges = _fast_timeranges(match.group('timeslots'))
+    span = (notam_end - notam_begin).days + 1
+    if shape == 'daily':
+        excluded = set(WEEK[day] for day in (match.group('exc') or '').split())
+        return [DayRule(notam_begin, span, frozenset(WEEK.values()) - excluded, timeranges)]
+    if shape == 'dayrange':
+        weekdays = frozenset(range(WEEK[match.group('first')], 1 + WEEK[match.group('last')]))
+        return [DayRule(notam_begin, span, weekdays, timeranges)]
+    if shape == 'date':
+        try:
+            date = datetime.datetime(notam_begin.year, MONTH[match.group('month')], int(match.group('date')))
+        except ValueError:
+            # Let the parser raise its usual error
+            return None
+        return [DateRule((date,), timeranges)]
+    return [DateRule((), timeranges)]
+
+
+def build_tables(outputdir=TABLES_DIR):
+    '''Generate the optimized lexer & parser tables (sched_lextab.py & sched_parsetab.py)
+
+    To be run at build/install time, ex.:
+        python -c "from notam.sched_parser import build_tables; build_tables()"
+
+    Args:
+        outputdir ([str], optional): Defaults to TABLES_DIR (the notam package directory).
+
+    Returns:
+        [list]: the generated files
+    '''
+
+    files = [os.path.join(outputdir, name + '.py') for name in (LEXTAB, PARSETAB)]
+    for filename in files:
+        # Stale tables would be loaded instead of being regenerated
+        if os.path.exists(filename):
+            os.remove(filename)
+    _TABLES.clear()
+
+    lex.lex(module=ScheduleLexer.__new__(ScheduleLexer), optimize=1, lextab=LEXTAB, outputdir=outputdir)
+    yacc.yacc(module=ScheduleParser.__new__(ScheduleParser), tabmodule=PARSETAB, outputdir=outputdir,
+              debug=False, errorlog=yacc.NullLogger())
+    logger.info('ScheduleParser: tables generated in %s', outputdir)
+    return files
+
+
 class ScheduleLexer():
     '''PLY Lexer for the Schedule field of the NOTAM
 
@@ -185,7 +608,7 @@ class ScheduleLexer():
 
         # Option 1)
         # Raise and exception and stop the parsing
-        raise LexerWarning(self.lexer, t.value[0])
+        raise LexerWarning(t.lexer, t.value[0])
         # Option 2)
         # Log something and skip the wrong character to continue the parsing
         # logger.debug("Illegal character %s",t.value[0])
@@ -203,7 +626,7 @@ class ScheduleLexer():
         '''Lexer constructor
         '''
 
-        self.lexer = lex.lex(module=self)
+        self.lexer = _master_lexer().clone(self)
 
     # Test it output
     def test(self, data):
@@ -224,6 +647,57 @@ class ScheduleLexer():
             logger.debug(tok)
 
 
+class ParseContext(object):
+    '''State of one parsing (partial timeslice information & parser status flags)
+
+    A new context is attached to the lexer clone of every ScheduleParser parsing: the grammar
+    rules reach it through p.lexer.context, so a ScheduleParser holds no parsing state and
+    can be used by several threads (or re-entered).
+
+    Attributes:
+        notam_begin ([datetime]): the effective start of the NOTAM
+        notam_end ([datetime]): the effective end of the NOTAM
+        rules ([list]): the DayRule/DateRule reduced so far
+    '''
+
+    def __init__(self, notam_begin, notam_end):
+        logger.debug('Setting schedule initial state')
+        self.notam_begin = notam_begin
+        self.notam_end = notam_end
+        self.rules = []
+        self.flag_sched_differed = False
+
+        # Legacy state of the dates spanning 2 months (MONTH datelist1 MONTH datelist2)
+        self.dates1 = []
+        self.dates2 = []
+        self.month1 = self.month2 = self.month = None
+        self.sched_datelist = False
+
+        self.reset_timeslice(ref_month=notam_begin.month)
+
+    def reset_timeslice(self, ref_month=''):
+        '''Setting the timeslice in its initial state
+
+        Args:
+            ref_month ([int], optional): Defaults to ''. The reference month of the next timeslice
+        '''
+
+        logger.debug('Setting timeslice initial state')
+        # Internal temporary "store"
+        self.store_month = '' # The latest month discovered by the parser
+        self.store_dates = []
+        self.store_timerange = []
+        self.store_weekdays = []
+        self.store_exc_weekdays = []
+        self.store_multimonth = None
+
+        self.ref_month = ref_month
+
+        # Internal "state flags"
+        self.day_mode = False
+        self.multimonth = False
+
+
 class ScheduleParser():
     '''PLY Parser for the schedule field of a NOTAM
 
@@ -280,17 +754,18 @@ class ScheduleParser():
                      | complexdate AND
                      | complexdate
         """
+        context = p.lexer.context
         # We need to sum up this timeslice using the _store contents, the states,...
         # and "expand" our schedule
 
         # Common pre-processing
-        ts_year = self._notam_begin.year
+        ts_year = context.notam_begin.year
 
-        if self._store_month:
-            ts_month = self._store_month
+        if context.store_month:
+            ts_month = context.store_month
             logger.debug('timeslice: using numeric month=%s reduced in this timeslice', ts_month)
         else:
-            ts_month = self._ref_month
+            ts_month = context.ref_month
             logger.debug('timeslice: using last numeric reference month=%s', ts_month)
 
         # We have different cases:
@@ -298,56 +773,44 @@ class ScheduleParser():
         #start_month = self._notam_begin.month
         #last_month = None
 
-        # Expanding timeslice
+        # Reducing the timeslice into an expansion rule
         # Day Mode: ex. MON-FRI 1000-1400
-        if self._day_mode:
+        if context.day_mode:
             logger.debug('timeslice: reduction operating in day mode')
-            notam_span = self._notam_end - self._notam_begin
+            notam_span = context.notam_end - context.notam_begin
             # Removing all days that were excluded
-            for day in self._store_exc_weekdays:
+            for day in context.store_exc_weekdays:
                 try:
-                    self._store_weekdays.remove(day)
+                    context.store_weekdays.remove(day)
                 except:
                     logger.warning("Excluded day cannot be removed. It was not added first !")
-            # Expand the timeslice for the complete Notam date "span"
-            for i in range(notam_span.days + 1):
-                ts_day = self._notam_begin + datetime.timedelta(i)
-                # Checking if the weekday is in the list
-                if ts_day.weekday() in self._store_weekdays:
-                    # Adding all reduced timerange
-                    for trange in self._store_timerange:
-                        #logger.debug(delta)
-                        ts_start = ts_day + trange[0]
-                        ts_stop = ts_day + trange[1]
-                        self._store_timeslice.append((ts_start, ts_stop))
-
+            # The timeslice covers the complete Notam date "span"
+            context.rules.append(DayRule(
+                context.notam_begin, notam_span.days + 1, frozenset(context.store_weekdays),
+                tuple(context.store_timerange)
+            ))
             logger.debug('timeslice: reduced !')
-            self._store_schedule.extend(self._store_timeslice)
-            self._set_timeslice_initial_state(ref_month=ts_month)
+            context.reset_timeslice(ref_month=ts_month)
         # Multi-month Mode: ex.
-        elif self._multimonth:
+        elif context.multimonth:
             logger.debug('timeslice: reduction operating in multimonth mode')
-            ts_span = self._store_multimonth[1] - self._store_multimonth[0]
-            # Buidling the list of dates now ...
-            for i in range(ts_span.days + 1):
-                ts_day = self._store_multimonth[0] + datetime.timedelta(days=i)
-                for trange in self._store_timerange:
-                    ts_start = ts_day + trange[0]
-                    ts_stop = ts_day + trange[1]
-                    self._store_timeslice.append((ts_start, ts_stop))
-            self._store_schedule.extend(self._store_timeslice)
+            ts_span = context.store_multimonth[1] - context.store_multimonth[0]
+            context.rules.append(DayRule(
+                context.store_multimonth[0], ts_span.days + 1, ALL_WEEKDAYS, tuple(context.store_timerange)
+            ))
             # Sliding the reference month
-            self._set_timeslice_initial_state(ref_month=self._store_multimonth[1].month)
+            context.reset_timeslice(ref_month=context.store_multimonth[1].month)
             # TODO: add reference year & related sliding if multimonth span 2 years ?
         else:
             logger.debug('timeslice: reduction operating in date mode')
-            for ts_day in self._store_dates:
-                for trange in self._store_timerange:
-                    ts_start = datetime.datetime(ts_year, ts_month, ts_day) + trange[0]
-                    ts_stop = datetime.datetime(ts_year, ts_month, ts_day) + trange[1]
-                    self._store_timeslice.append((ts_start, ts_stop))
-            self._store_schedule.extend(self._store_timeslice)
-            self._set_timeslice_initial_state(ref_month=ts_month)
+            # The dates are only built when there is a timeslot to expand: a timeslice without
+            # timeslots (ex. 'NOV 32 AND') expands to nothing, even with an impossible date
+            if context.store_timerange:
+                dates = tuple(datetime.datetime(ts_year, ts_month, ts_day) for ts_day in context.store_dates)
+            else:
+                dates = ()
+            context.rules.append(DateRule(dates, tuple(context.store_timerange)))
+            context.reset_timeslice(ref_month=ts_month)
 
 #        if self.sched_multimonth and not self.sched_datelist:
 #            yy = datetime.date.today().year
@@ -442,27 +905,29 @@ class ScheduleParser():
     def p_complexdate_partial(self, p):
         """complexdate : MONTH DATE AND
         """
+        context = p.lexer.context
         logger.debug('complexdate_partial: the timeslot is not yet available')
 
         # We store what we should
         #self._store_month = MONTH[p[1]]
-        self._store_month = MONTH[p[1]]
-        self._store_dates.append(int(p[2]))
+        context.store_month = MONTH[p[1]]
+        context.store_dates.append(int(p[2]))
 
         # We flag that our schedule is not yet complete
-        self._flag_sched_differed = True
+        context.flag_sched_differed = True
 
 
     def p_complexdate_with_month(self, p):
         """complexdate : MONTH datelist timeslots
                        | MONTH daterange timeslots
         """
+        context = p.lexer.context
         logger.debug('complexdate_with_month: stored month=%s', p[1])
         #self.sched_type = '1'
-        self._store_month = MONTH[p[1]]
+        context.store_month = MONTH[p[1]]
 
         logger.debug('complexdate_with_month: updating ref_month=%s', p[1])
-        self._ref_month = MONTH[p[1]]
+        context.ref_month = MONTH[p[1]]
 
     def p_complexdate(self, p):
         """complexdate : datelist timeslots
@@ -482,50 +947,54 @@ class ScheduleParser():
     def p_complexdate_with_month_and_exc(self, p):
         """complexdate : MONTH datelist timeslots exclusion
         """
+        context = p.lexer.context
         logger.debug('complexdate_with_month_and_exc: detected')
         #self.sched_type = '2'
         #self.month = p[1]
         logger.debug('complexdate_with_month_and_exc: reducing month %s', p[1])
-        self._store_month = p[1]
+        context.store_month = MONTH[p[1]]
 
     def p_complexdate_with_months(self, p):
         """complexdate : MONTH DATE RANGE MONTH DATE timeslots
         """
+        context = p.lexer.context
 
-        start_year = self._notam_begin.year
+        start_year = context.notam_begin.year
         logger.debug('complexdate_with_months: switching to multimonth')
-        self._multimonth = True
+        context.multimonth = True
         begin_date = datetime.datetime(start_year, MONTH[p[1]], int(p[2]))
         end_date = datetime.datetime(start_year, MONTH[p[4]], int(p[5]))
         if end_date < begin_date:
             # Looks like we are spanning 2 years
             logger.debug('complexdate_with_months: spanning 2 years. Added 1Y to second date')
             end_date = end_date + datetime.timedelta(year=1)
-        self._store_multimonth = (begin_date, end_date)
+        context.store_multimonth = (begin_date, end_date)
 
 
     # MAR 31 AND APR 01-03 0630-1400
     def p_complexdatelist_with_months(self, p):
         """complexdate : MONTH datelist1 MONTH datelist2 timeslots
         """
+        context = p.lexer.context
         logger.debug('NOTAM Date List spanning 2 months : ')
-        self._multimonth = True
-        self.sched_datelist = True
-        self.month1 = p[1]
+        context.multimonth = True
+        context.sched_datelist = True
+        context.month1 = p[1]
         #self.date_start = p[2]
-        self.month2 = p[3]
+        context.month2 = p[3]
         #self.date_end = p[5]
-        logger.debug('NOTAM months 1: %s', self.month1)
-        logger.debug('NOTAM months 2: %s', self.month2)
-        self.month = p[3]
+        logger.debug('NOTAM months 1: %s', context.month1)
+        logger.debug('NOTAM months 2: %s', context.month2)
+        context.month = p[3]
 
 
     def p_complexdate_daily(self, p):
         """complexdate : DAILY timeslots
         """
+        context = p.lexer.context
         logger.debug('complexdate_daily: switching to day mode')
-        self._day_mode = True
-        self._store_weekdays = [0, 1, 2, 3, 4, 5, 6, 7]
+        context.day_mode = True
+        context.store_weekdays = [0, 1, 2, 3, 4, 5, 6, 7]
 
     def p_complexdate_timeslots(self, p):
         """complexdate : timeslots
@@ -536,8 +1005,9 @@ class ScheduleParser():
     def p_complexdate_daylist(self, p):
         """complexdate : daylist timeslots
         """
+        context = p.lexer.context
         logger.debug('complexdate_daylist: switching to day mode')
-        self._day_mode = True
+        context.day_mode = True
         #self.sched_type = '3'
         #self.days = [1,2,3,4,5,6,7,8]
 
@@ -552,103 +1022,110 @@ class ScheduleParser():
     def p_complexdate_daily_with_exc(self, p):
         """complexdate : DAILY timeslots exclusion
         """
+        context = p.lexer.context
         logger.debug('complexdate_daily_with_exc: detected')
-        self._day_mode = True
-        self._store_weekdays = [0, 1, 2, 3, 4, 5, 6, 7]
+        context.day_mode = True
+        context.store_weekdays = [0, 1, 2, 3, 4, 5, 6, 7]
 
     def p_complexdate_weekday_range(self, p):
         """dayrange : DAY RANGE DAY
         """
+        context = p.lexer.context
         logger.debug('complexdate_weekday_range: switching to day mode')
-        self._day_mode = True
-        # Is there anything in self._store_weekdays already ?
-        self._store_weekdays = self._store_weekdays + range(int(WEEK[p[1]]), 1+int(WEEK[p[3]]))
+        context.day_mode = True
+        # Is there anything in context.store_weekdays already ?
+        context.store_weekdays = context.store_weekdays + list(range(int(WEEK[p[1]]), 1+int(WEEK[p[3]])))
 
     def p_datelist(self, p):
         """datelist : DATE datelist
                     | DATE AND DATE
                     | DATE
         """
+        context = p.lexer.context
         if len(p) == 3:
             p[0] = p[2]
             # Reduced Token needs to be added
             logger.debug('datelist: stored date=%s', p[1])
-            self._store_dates.append(int(p[1]))
+            context.store_dates.append(int(p[1]))
         if len(p) == 4:
             logger.debug('datelist: stored date=%s & date=%s', p[1], p[3])
-            self._store_dates.append(int(p[1]))
-            self._store_dates.append(int(p[3]))
+            context.store_dates.append(int(p[1]))
+            context.store_dates.append(int(p[3]))
         # Replacing
         # logger.debug('NOTAM Date : ' + p[1])
         # self.dates.append(int(p[1]))
         # By
         if len(p) == 2:
             logger.debug('datelist: stored date=%s', p[1])
-            self._store_dates.append(int(p[1]))
+            context.store_dates.append(int(p[1]))
 
     def p_datelist1(self, p):
         """datelist1 : DATE datelist1
                      | DATE AND DATE
                      | DATE
         """
+        context = p.lexer.context
         if len(p) == 3:
             p[0] = p[2]
             # Reduced Token needs to be added
             logger.debug('NOTAM Date : %s', p[1])
-            self.dates1.append(int(p[1]))
+            context.dates1.append(int(p[1]))
         if len(p) == 4:
             logger.debug('NOTAM Date : %s', p[1])
-            self.dates1.append(int(p[1]))
+            context.dates1.append(int(p[1]))
             logger.debug('NOTAM Date : %s', p[3])
-            self.dates1.append(int(p[3]))
+            context.dates1.append(int(p[3]))
         if len(p) == 2:
             logger.debug('NOTAM Date : %s', p[1])
             logger.debug('Datelist1: reduction complete')
-            self.dates1.append(int(p[1]))
+            context.dates1.append(int(p[1]))
 
     def p_datelist2(self, p):
         """datelist2 : DATE datelist2
                      | DATE AND DATE
                      | DATE
         """
+        context = p.lexer.context
         if len(p) == 3:
             p[0] = p[2]
             # Reduced Token needs to be added
             logger.debug('NOTAM Date : %s', p[1])
-            self.dates2.append(int(p[1]))
+            context.dates2.append(int(p[1]))
         if len(p) == 4:
             logger.debug('NOTAM Date : %s', p[1])
-            self.dates2.append(int(p[1]))
+            context.dates2.append(int(p[1]))
             logger.debug('NOTAM Date : %s', p[3])
-            self.dates2.append(int(p[3]))
+            context.dates2.append(int(p[3]))
         if len(p) == 2:
             logger.debug('NOTAM Date : %s', p[1])
             logger.debug('Datelist2: reduction complete')
-            self.dates2.append(int(p[1]))
+            context.dates2.append(int(p[1]))
 
     def p_daterange(self, p):
         """daterange : DATE RANGE DATE
         """
+        context = p.lexer.context
         logger.debug('daterange: stored dates=%s to %s.', p[1], p[3])
-        self._store_dates = self._store_dates + range(int(p[1]), 1+int(p[3]))
+        context.store_dates = context.store_dates + list(range(int(p[1]), 1+int(p[3])))
 
     def p_daylist(self, p):
         """daylist : DAY daylist
                    | DAY AND DAY
                    | DAY
         """
+        context = p.lexer.context
         if len(p) == 3:
             p[0] = p[2]
             # Reduced Token needs to be added
             logger.debug('daylist: stored day=%s', p[1])
-            self._store_weekdays.append(int(WEEK[p[1]]))
+            context.store_weekdays.append(int(WEEK[p[1]]))
         if len(p) == 4:
             logger.debug('daylist: stored day=%s & day=%s', p[1], p[3])
-            self._store_weekdays.append(int(WEEK[p[1]]))
-            self._store_weekdays.append(int(WEEK[p[3]]))
+            context.store_weekdays.append(int(WEEK[p[1]]))
+            context.store_weekdays.append(int(WEEK[p[3]]))
         if len(p) == 2:
             logger.debug('daylist: stored day=%s', p[1])
-            self._store_weekdays.append(int(WEEK[p[1]]))
+            context.store_weekdays.append(int(WEEK[p[1]]))
 
     def p_timeslots(self, p):
         """timeslots : timerange timeslots
@@ -667,34 +1144,34 @@ class ScheduleParser():
                      | SUNRISE RANGE SUNSET
                      | H24
         """
+        context = p.lexer.context
 
         if len(p) == 4:
-            if p[1] == 'SR':
-                logger.debug('timerange: SR changed to "0000"')
-                start_time = '0000'
-            else:
-                start_time = str(p[1])
-
-            if p[3] == 'SS':
-                logger.debug('timerange: SS changed to "2359"')
-                stop_time = '2359'
-            else:
-                stop_time = str(p[3])
+            start_time = str(p[1])
+            stop_time = str(p[3])
         else:
             logger.debug('timerange: H24 changed to "0000-2359"')
             start_time = '0000'
             stop_time = '2359'
 
+        # SR & SS are kept as markers: they are resolved for each day (& the NOTAM location)
+        # by the expansion (0000 & 2359 without location)
         logger.debug('timerange: stored timedelta=(%s, %s)', start_time, stop_time)
-        start_timedelta = datetime.timedelta(
-            hours=int(start_time[0:2]),
-            minutes=int(start_time[2:4])
-            )
-        stop_timedelta = datetime.timedelta(
-            hours=int(stop_time[0:2]),
-            minutes=int(stop_time[2:4])
-            )
-        self._store_timerange.append((start_timedelta, stop_timedelta))
+        if start_time == 'SR':
+            start_timedelta = SUNRISE
+        else:
+            start_timedelta = datetime.timedelta(
+                hours=int(start_time[0:2]),
+                minutes=int(start_time[2:4])
+                )
+        if stop_time == 'SS':
+            stop_timedelta = SUNSET
+        else:
+            stop_timedelta = datetime.timedelta(
+                hours=int(stop_time[0:2]),
+                minutes=int(stop_time[2:4])
+                )
+        context.store_timerange.append((start_timedelta, stop_timedelta))
 
     def p_exclusion(self, p):
         """exclusion : EXC exc_weekdays
@@ -707,9 +1184,10 @@ class ScheduleParser():
                         | DAY
                         | HOL
         """
+        context = p.lexer.context
 
         logger.debug('exc_weekdays: excluding day %s', str(p[1]))
-        self._store_exc_weekdays.append(WEEK[p[1]])
+        context.store_exc_weekdays.append(WEEK[p[1]])
         if len(p) == 3:
             logger.debug('exc_weekdays: more weekdays to exclude')
             p[0] = p[2]
@@ -718,107 +1196,290 @@ class ScheduleParser():
         logger.error('Parsing error')
         logger.error(p)
 
-    def _set_timeslice_initial_state(self, ref_month=''):
-        '''Setting the timeslice in its initial state
-
-            ref_month (str, optional): Defaults to ''. [description]
-        '''
-
-        if ref_month:
-            logger.debug('Setting timeslice initial state')
-        else:
-            logger.debug('Setting timeslice initial state')
-        # Internal temporary "store"
-        self._store_month = '' # The latest month discovered by the parser
-        self._store_dates = []
-        self._store_timerange = []
-        self._store_weekdays = []
-        self._store_exc_weekdays = []
-        self._store_timeslice = []
-        self._store_multimonth = None
-
-        self._ref_month = ref_month
-
-        # Internal "state flags"
-        self._day_mode = False
-        self._multimonth = False
-        #self._flag_sched_differed = False
-
-    def _set_schedule_initial_state(self, notam_begin, notam_end):
-
-        logger.debug('Setting schedule initial state')
-        # Internal "store"
-        self._store_schedule = []
-
-        self._notam_begin = notam_begin
-        self._notam_end = notam_end
-        self._set_timeslice_initial_state(ref_month=notam_begin.month)
-
     def get_schedule(self):
         '''Retrieve the latest parsed schedule
 
+        When the object is shared by several threads, use the parse() result instead.
+
         Returns:
             [list]: list of datetime tupple
         '''
 
         return self._store_schedule
 
-    def __init__(self):
+    def __init__(self, fast_path=True):
         '''Create a new Schedule parser object
 
-        Constructor
+        Args:
+            fast_path ([bool], optional): Defaults to True. Decode the common schedule shapes
+                with fast_rules() instead of PLY (same results)
         '''
 
         logger.info('ScheduleParser: new object creation')
+        self.fast_path = fast_path
         self.lexer = ScheduleLexer()
         self.tokens = self.lexer.tokens
 
-        #self.parser = yacc.yacc(module=self, write_tables=0, debug=True)
-        self.parser = yacc.yacc(module=self, write_tables=0, errorlog=yacc.NullLogger())
+        # The shared LALR tables with the grammar rules bound to this object
+        self.parser = yacc.LRParser(_BoundTables(_master_parser(), self), self.p_error)
         logger.debug('ScheduleParser: LEX/YAC ready')
 
-        # All _private attributes to store "partial" timeslot information & parser status flag
-        self._store_month = '' # The latest month discovered by the parser
-        self._store_dates = []
-        self._store_timerange = []
-        self._store_weekdays = []
-        self._store_exc_weekdays = []
-        self._store_timeslice = []
-        self._store_multimonth = None
+        # The latest parsed schedule (see get_schedule())
+        self._store_schedule = []
+
+    def _parse_rules(self, notam_begin, notam_end, data):
+        '''Parse a schedule string into its expansion rules
 
-        self._day_mode = False
-        self._flag_sched_differed = False
-        self._multimonth = False
+        Returns:
+            [list]: the DayRule/DateRule of each timeslice
+        '''
 
-        self._notam_begin = None
-        self._notam_end = None
-        self._ref_month = None
+        if self.fast_path:
+            rules = fast_rules(notam_begin, notam_end, data)
+            if rules is not None:
+                logger.debug('ScheduleParser: fast path used for %s', data)
+                return rules
 
+        # The parsing state is only reachable from this call (through its lexer clone)
+        lexer = self.lexer.lexer.clone()
+        lexer.context = ParseContext(notam_begin, notam_end)
 
-        self._store_schedule = []
+        logger.info('ScheduleParser: Parsing starting')
+        logger.info('Args: %s', data)
+        self.parser.parse(data, lexer, 0, 0, None)
+        logger.info('ScheduleParser: Parsing completed')
+        return lexer.context.rules
 
-    def parse(self, notam_begin, notam_end, data):
+    def parse(self, notam_begin, notam_end, data, location=None):
         '''Execute the parsing to generate the expanded list of timeslots
 
         Args:
             notam_begin ([datetime]): the effective start of the NOTAM
             notam_end ([datetime]): the effective end of the NOTAM
             data ([string]): the schedule string to parse/expand into timeslot
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM for the
+                SR/SS bounds (0000/2359 without location, see Notam.location)
 
         Returns:
             [list]: list of datetime tupple
         '''
 
         if data:
-            self._set_schedule_initial_state(notam_begin, notam_end)
-
-            logger.info('ScheduleParser: Parsing starting')
-            logger.info('Args: %s', data)
-            self.parser.parse(data, self.lexer.lexer, 0, 0, None)
-            logger.info('ScheduleParser: Parsing completed')
+            rules = self._parse_rules(notam_begin, notam_end, data)
+            self._store_schedule = list(expand_rules(rules, location=location))
             return self._store_schedule
         return []
 
+    def iter_slots(self, notam_begin, notam_end, data, window_start=None, window_end=None, location=None):
+        '''Parse a schedule string & expand its timeslots lazily
+
+        The string is parsed immediately (errors are raised by this call) but the timeslots are
+        only generated while iterating, and only those intersecting [window_start, window_end):
+        a PERM NOTAM queried for the next hours does not expand its whole span.
+        Without window the timeslots are the ones (& in the order) returned by parse().
+
+        Args:
+            notam_begin ([datetime]): the effective start of the NOTAM
+            notam_end ([datetime]): the effective end of the NOTAM
+            data ([string]): the schedule string to parse/expand into timeslot
+            window_start ([datetime], optional): Defaults to None (no lower bound).
+            window_end ([datetime], optional): Defaults to None (no upper bound).
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM for the
+                SR/SS bounds (0000/2359 without location, see Notam.location)
+
+        Returns:
+            [generator]: generator of datetime tupple
+        '''
+
+        if not data:
+            return iter(())
+        rules = self._parse_rules(notam_begin, notam_end, data)
+        return expand_rules(rules, window_start, window_end, location)
+
+    def parse_arrays(self, notam_begin, notam_end, data, window_start=None, window_end=None,
+                     location=None):
+        '''Parse a schedule string & expand its timeslots as NumPy arrays (requires numpy)
+
+        Args:
+            notam_begin ([datetime]): the effective start of the NOTAM
+            notam_end ([datetime]): the effective end of the NOTAM
+            data ([string]): the schedule string to parse/expand into timeslot
+            window_start ([datetime], optional): Defaults to None (no lower bound).
+            window_end ([datetime], optional): Defaults to None (no upper bound).
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM for the
+                SR/SS bounds (0000/2359 without location, see Notam.location)
+
+        Returns:
+            [tuple]: (starts, stops) datetime64[m] arrays (see notam.slot_arrays)
+        '''
+
+        from .slot_arrays import expand_rules_arrays
+
+        rules = self._parse_rules(notam_begin, notam_end, data) if data else []
+        return expand_rules_arrays(rules, window_start, window_end, location)
+
+    def schedule(self, notam_begin, notam_end, data, location=None):
+        '''Parse a schedule string into a compact Schedule (no timeslot expansion)
+
+        Args:
+            notam_begin ([datetime]): the effective start of the NOTAM
+            notam_end ([datetime]): the effective end of the NOTAM
+            data ([string]): the schedule string to parse
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM for the
+                SR/SS bounds (0000/2359 without location, see Notam.location)
+
+        Returns:
+            [Schedule]: the rule based schedule (see notam.schedule)
+        '''
+
+        from .schedule import Schedule
+
+        if not data:
+            return Schedule([])
+        return Schedule(self._parse_rules(notam_begin, notam_end, data), location)
+
+_LOCAL = threading.local()
+
+
+def get_parser():
+    '''The ScheduleParser of the current thread (created on first use)
+
+    The ScheduleParser keeps its parsing state in a per call ParseContext, so one object can be
+    shared; this factory also gives each thread its own PLY parser stacks & get_schedule().
+
+    Returns:
+        [ScheduleParser]: the parser of the current thread
+    '''
+
+    parser = getattr(_LOCAL, 'parser', None)
+    if parser is None:
+        parser = _LOCAL.parser = ScheduleParser()
+    return parser
+
+
+class ScheduleCache(object):
+    '''Bounded LRU cache of the parsed schedules
+
+    Many NOTAMs of a briefing share the same schedule string (ex. "MON-FRI 0700-1600"): the
+    expanded timeslots are cached by (normalized schedule string, notam_begin, notam_end & the
+    rounded location of the SR/SS schedules).
+    The results are tuples (immutable) so they can be shared by all the callers.
+    The parsing errors are not cached.
+
+    Attributes:
+        maxsize ([int]): maximum number of cached schedules
+        hits ([int]): number of parse() calls answered from the cache
+        misses ([int]): number of parse() calls that required a parsing
+    '''
+
+    def __init__(self, maxsize=1024, parser=None):
+        '''Create an empty cache
+
+        Args:
+            maxsize ([int], optional): Defaults to 1024. Maximum number of cached schedules
+            parser ([ScheduleParser], optional): Defaults to None (a new ScheduleParser).
+        '''
+
+        self.maxsize = maxsize
+        self.parser = parser or ScheduleParser()
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(data):
+        '''Normalized schedule string (the spaces & tabs ignored by the lexer are collapsed)
+
+        The newlines are kept: they are GROUP tokens.
+
+        Args:
+            data ([string]): the schedule string
+
+        Returns:
+            [string]: the cache key string
+        '''
+
+        return re.sub(r'[ \t]+', ' ', data).strip(' \t')
+
+    @staticmethod
+    def location_key(data, location):
+        '''Location part of the cache key: only the SR/SS schedules depend on the location
+
+        Args:
+            data ([string]): the schedule string
+            location ([tuple]): (latitude, longitude) or None
+
+        Returns:
+            [tuple]: the rounded location (as used by the solar table) or None
+        '''
+
+        if location is None or (SUNRISE not in data and SUNSET not in data):
+            return None
+        from .solar import SOLAR_TABLE
+
+        return SOLAR_TABLE.location_key(*location)
+
+    def parse(self, notam_begin, notam_end, data, location=None):
+        '''Parsed timeslots of a schedule (see ScheduleParser.parse)
+
+        Args:
+            notam_begin ([datetime]): the effective start of the NOTAM
+            notam_end ([datetime]): the effective end of the NOTAM
+            data ([string]): the schedule string to parse/expand into timeslot
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM for the
+                SR/SS bounds (0000/2359 without location, see Notam.location)
+
+        Returns:
+            [tuple]: tuple of datetime tupple
+        '''
+
+        if not data:
+            return ()
+        key = (self.normalize(data), notam_begin, notam_end, self.location_key(data, location))
+        with self._lock:
+            result = self._cache.pop(key, None)
+            if result is not None:
+                self.hits += 1
+                self._cache[key] = result
+                return result
+
+        # Parsed outside of the lock (a concurrent miss of the same key parses it twice)
+        result = tuple(self.parser.parse(notam_begin, notam_end, key[0], location))
+        with self._lock:
+            self.misses += 1
+            self._cache.pop(key, None)
+            if len(self._cache) >= self.maxsize:
+                self._cache.popitem(last=False)
+            # Inserted as the most recently used
+            self._cache[key] = result
+        return result
+
+    def stats(self):
+        '''Cache statistics
+
+        Returns:
+            [dict]: hits, misses, hit_rate, size & maxsize
+        '''
+
+        calls = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / calls if calls else 0.0,
+            'size': len(self._cache),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        '''Empty the cache & reset the statistics
+        '''
+
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
 if __name__ == '__main__':
 
     # We run our demo in DEBUG mode
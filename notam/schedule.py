@@ -0,0 +1,345 @@
+'''NOTAM notam.schedule Module
+
+Compact rule based representation of a parsed NOTAM schedule.
+
+A Schedule keeps the expansion rules reduced by the ScheduleParser (weekday mask & span,
+list of dates, daily time ranges with the exclusions already applied) instead of the
+expanded list of timeslots. The queries are answered from the rules: the day of a datetime
+is found by arithmetic (weekday rules) or binary search (date rules), so a PERM NOTAM costs
+the same as a one day NOTAM.
+
+The timeslots of a rule day start within 24h of the day start. An overnight range (ex.
+2200-0200) ends the next day: a datetime can be in a timeslot of the last rule day starting
+before it or of the previous one (margin of the rule).
+
+With a location, the SR/SS bounds are resolved for each day from the solar table. They are
+anchored at the UTC midnight of the day and may fall on the previous or next UTC day (see
+notam.solar): the neighbouring rule days are then checked too (SOLAR_SPAN).
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import bisect
+import datetime
+import logging
+
+from .sched_parser import (DayRule, SOLAR_SPAN, anchor_sun_times, expand_rules, is_solar,
+                           resolve_timeranges)
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# Rule days around the day of a datetime that may have a SR/SS timeslot containing it
+SOLAR_MARGIN = SOLAR_SPAN[1].days
+
+
+def _seconds(delta):
+    '''Number of seconds of a timedelta (as a float)
+    '''
+
+    return delta.total_seconds()
+
+
+def _merge_timeranges(timeranges):
+    '''Union of the daily timeranges as sorted (start, stop) seconds
+
+    The timeranges are resolved (see resolve_timeranges): an overnight range stops after
+    SECONDS_PER_DAY.
+    '''
+
+    merged = []
+    for start, stop in sorted((_seconds(start), _seconds(stop)) for start, stop in timeranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return tuple(merged)
+
+
+def _union_seconds(slots, window_start, window_end):
+    '''Seconds of the union of datetime intervals within [window_start, window_end)
+    '''
+
+    seconds = 0.0
+    current_start = current_stop = None
+    for start, stop in sorted(slots):
+        start, stop = max(start, window_start), min(stop, window_end)
+        if current_stop is not None and start <= current_stop:
+            current_stop = max(current_stop, stop)
+            continue
+        if current_stop is not None:
+            seconds += _seconds(current_stop - current_start)
+        current_start, current_stop = start, stop
+    if current_stop is not None:
+        seconds += _seconds(current_stop - current_start)
+    return seconds
+
+
+class _Rule(object):
+    '''Days (sorted "bases" spaced by one day at least) & the daily active intervals
+
+    Subclasses implement base(), included(), last_index(), next_included() & count_included()
+    '''
+
+    __slots__ = ('count', 'timeranges', 'location', 'margin', 'intervals', 'daily_seconds')
+
+    def __init__(self, count, timeranges, location=None):
+        self.count = count
+        self.timeranges = timeranges
+        # Only the SR/SS rules have intervals depending on the day
+        self.location = location if is_solar(timeranges) else None
+        self.intervals = _merge_timeranges(resolve_timeranges(timeranges))
+        # Rule days before & after the day of a datetime to check (overnight ranges: 1 day)
+        if self.location is not None:
+            self.margin = SOLAR_MARGIN + 1
+        else:
+            self.margin = int(any(stop > SECONDS_PER_DAY for _, stop in self.intervals))
+        self.daily_seconds = sum(stop - start for start, stop in self.intervals)
+
+    def day_intervals(self, index):
+        '''Active intervals of a rule day
+        '''
+
+        if self.location is None:
+            return self.intervals
+
+        from .solar import SOLAR_TABLE
+
+        base = self.base(index)
+        sun_times = SOLAR_TABLE.sun_times(self.location[0], self.location[1], [base.date()])
+        return _merge_timeranges(resolve_timeranges(self.timeranges, anchor_sun_times(base, sun_times[0])))
+
+    def _clipped_seconds(self, index, window_start, window_end):
+        '''Active seconds of a rule day within the window
+        '''
+
+        if not self.included(index):
+            return 0.0
+        offset_start = _seconds(window_start - self.base(index))
+        offset_end = _seconds(window_end - self.base(index))
+        return sum(
+            max(0.0, min(stop, offset_end) - max(start, offset_start))
+            for start, stop in self.day_intervals(index)
+        )
+
+    def is_active(self, instant):
+        '''True if the datetime is within a timeslot
+        '''
+
+        last = self.last_index(instant)
+        for index in range(max(last - self.margin, 0), min(last + self.margin, self.count - 1) + 1):
+            if not self.included(index):
+                continue
+            offset = _seconds(instant - self.base(index))
+            if any(start <= offset < stop for start, stop in self.day_intervals(index)):
+                return True
+        return False
+
+    def next_activation(self, instant):
+        '''Start of the first timeslot starting at or after the datetime (None if none)
+        '''
+
+        if not self.intervals or not self.count:
+            return None
+        if self.location is not None:
+            window_end = self.base(self.count - 1) + SOLAR_SPAN[1]
+            for start, _ in self.slots(instant, window_end):
+                if start >= instant:
+                    return start
+            return None
+        index = self.last_index(instant)
+        if index >= 0 and self.included(index):
+            base = self.base(index)
+            offset = _seconds(instant - base)
+            for start, _ in self.day_intervals(index):
+                if start >= offset:
+                    return base + datetime.timedelta(seconds=start)
+        index = self.next_included(index + 1)
+        if index is None:
+            return None
+        return self.base(index) + datetime.timedelta(seconds=self.day_intervals(index)[0][0])
+
+    def active_seconds(self, window_start, window_end):
+        '''Active seconds within [window_start, window_end)
+        '''
+
+        if self.margin:
+            # The days may overlap (overnight ranges) or differ (SR/SS)
+            return _union_seconds(self.slots(window_start, window_end), window_start, window_end)
+        last = self.last_index(window_end)
+        if last < 0 or not self.intervals:
+            return 0.0
+        first = max(self.last_index(window_start), 0)
+        seconds = self._clipped_seconds(first, window_start, window_end)
+        if last > first:
+            seconds += self._clipped_seconds(last, window_start, window_end)
+            seconds += self.count_included(first + 1, last) * self.daily_seconds
+        return seconds
+
+    def slots(self, window_start, window_end):
+        '''Active (start, stop) datetime intervals intersecting [window_start, window_end)
+        '''
+
+        last = min(self.last_index(window_end) + self.margin, self.count - 1)
+        index = self.next_included(max(self.last_index(window_start) - self.margin, 0))
+        while index is not None and index <= last:
+            base = self.base(index)
+            for start, stop in self.day_intervals(index):
+                slot = (base + datetime.timedelta(seconds=start), base + datetime.timedelta(seconds=stop))
+                if slot[1] > window_start and slot[0] < window_end:
+                    yield slot
+            index = self.next_included(index + 1)
+
+
+class _WeekdayRule(_Rule):
+    '''Every day of a span whose weekday is in a mask (bit 0 = Monday)
+    '''
+
+    __slots__ = ('start', 'mask')
+
+    def __init__(self, rule, location=None):
+        super(_WeekdayRule, self).__init__(rule.days, rule.timeranges, location)
+        self.start = rule.start
+        self.mask = sum(1 << weekday for weekday in rule.weekdays if weekday < 7)
+
+    def base(self, index):
+        return self.start + datetime.timedelta(days=index)
+
+    def included(self, index):
+        return bool(self.mask >> ((self.start.weekday() + index) % 7) & 1)
+
+    def last_index(self, instant):
+        index = int(_seconds(instant - self.start) // SECONDS_PER_DAY)
+        return min(max(index, -1), self.count - 1)
+
+    def next_included(self, index):
+        for candidate in range(index, min(index + 7, self.count)):
+            if self.included(candidate):
+                return candidate
+        return None
+
+    def count_included(self, first, last):
+        '''Number of included days in [first, last)
+        '''
+
+        weeks, remainder = divmod(max(last - first, 0), 7)
+        count = weeks * bin(self.mask).count('1')
+        return count + sum(1 for index in range(last - remainder, last) if self.included(index))
+
+
+class _DateRule(_Rule):
+    '''A sorted list of dates
+    '''
+
+    __slots__ = ('dates',)
+
+    def __init__(self, rule, location=None):
+        dates = tuple(sorted(set(rule.dates)))
+        super(_DateRule, self).__init__(len(dates), rule.timeranges, location)
+        self.dates = dates
+
+    def base(self, index):
+        return self.dates[index]
+
+    def included(self, index):
+        return True
+
+    def last_index(self, instant):
+        return bisect.bisect_right(self.dates, instant) - 1
+
+    def next_included(self, index):
+        return index if index < self.count else None
+
+    def count_included(self, first, last):
+        return max(last - first, 0)
+
+
+class Schedule(object):
+    '''Parsed NOTAM schedule answering activity queries without expanding the timeslots
+
+    Attributes:
+        rules ([tuple]): the DayRule/DateRule reduced by the ScheduleParser
+        location ([tuple]): (latitude, longitude) used for the SR/SS bounds (None: 0000/2359)
+    '''
+
+    __slots__ = ('rules', 'location', '_rules')
+
+    def __init__(self, rules, location=None):
+        '''Create a Schedule from the rules of a ScheduleParser (see ScheduleParser.schedule())
+
+        Args:
+            rules ([list]): the DayRule/DateRule of the schedule
+            location ([tuple], optional): Defaults to None. (latitude, longitude) of the NOTAM
+        '''
+
+        self.rules = tuple(rules)
+        self.location = location
+        self._rules = [
+            _WeekdayRule(rule, location) if isinstance(rule, DayRule) else _DateRule(rule, location)
+            for rule in self.rules
+        ]
+
+    def is_active(self, instant):
+        '''Check if the schedule is active at a given time
+
+        Args:
+            instant ([datetime]): the time to check
+
+        Returns:
+            [bool]: True if the time is within a timeslot
+        '''
+
+        return any(rule.is_active(instant) for rule in self._rules)
+
+    def next_activation(self, instant):
+        '''Next time the schedule is active
+
+        Args:
+            instant ([datetime]): the reference time
+
+        Returns:
+            [datetime]: the reference time if active, else the next timeslot start (None if none)
+        '''
+
+        if self.is_active(instant):
+            return instant
+        starts = [rule.next_activation(instant) for rule in self._rules]
+        starts = [start for start in starts if start is not None]
+        return min(starts) if starts else None
+
+    def active_duration(self, window_start, window_end):
+        '''Active time within a window (overlapping timeslots are counted once)
+
+        Args:
+            window_start ([datetime]): start of the window
+            window_end ([datetime]): end of the window (excluded)
+
+        Returns:
+            [timedelta]: the active time
+        '''
+
+        if window_end <= window_start:
+            return datetime.timedelta(0)
+        if len(self._rules) == 1:
+            return datetime.timedelta(seconds=self._rules[0].active_seconds(window_start, window_end))
+
+        # Several rules may overlap: union of their timeslots within the window
+        slots = [slot for rule in self._rules for slot in rule.slots(window_start, window_end)]
+        return datetime.timedelta(seconds=_union_seconds(slots, window_start, window_end))
+
+    def slots(self, window_start=None, window_end=None):
+        '''The timeslots of the schedule (same as ScheduleParser.parse() without window)
+
+        Args:
+            window_start ([datetime], optional): Defaults to None (no lower bound).
+            window_end ([datetime], optional): Defaults to None (no upper bound).
+
+        Returns:
+            [generator]: generator of datetime tupple
+        '''
+
+        return expand_rules(self.rules, window_start, window_end, self.location)
+
+    def __repr__(self):
+        return 'Schedule({!r})'.format(list(self.rules))
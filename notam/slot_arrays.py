@@ -0,0 +1,129 @@
+'''NOTAM notam.slot_arrays Module
+
+Vectorized expansion of the schedule rules into NumPy datetime64[m] arrays.
+
+The rule days are built at once (weekday mask lookup on a day index array) and the
+timeslots are the broadcast sum of the days & the daily time ranges: a PERM daily schedule
+expands in a few NumPy calls instead of a Python loop creating datetime objects.
+The slots are in the same order as ScheduleParser.parse() (rule, day, time range). The
+times are truncated to the minute. The overnight ranges end the next day (see
+resolve_timeranges). With a location, the SR/SS bounds of all the days are
+computed at once by notam.solar.sun_minutes.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import logging
+
+import numpy as np
+
+from .sched_parser import DayRule, SUNRISE, SUNSET, _day_index_range, is_solar, resolve_timeranges
+from .solar import SOLAR_TABLE, sun_minutes
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 1440
+
+
+def _minutes(delta):
+    '''Number of minutes of a timedelta (truncated)
+    '''
+
+    return int(delta.total_seconds() // 60)
+
+
+def _rule_bases(rule, window_start, window_end):
+    '''datetime64[m] start of the days of a rule
+    '''
+
+    if isinstance(rule, DayRule):
+        first, last = _day_index_range(rule, window_start, window_end)
+        days = np.arange(first, max(first, last), dtype=np.int64)
+        weekdays = np.zeros(7, dtype=bool)
+        weekdays[[weekday for weekday in rule.weekdays if weekday < 7]] = True
+        days = days[weekdays[(rule.start.weekday() + days) % 7]]
+        return np.datetime64(rule.start, 'm') + days * MINUTES_PER_DAY
+    return np.array(rule.dates, dtype='datetime64[m]').reshape(-1)
+
+
+def _offsets(rule, bases, location):
+    '''(days, timeranges, 2) minute offsets of the timeslots from the day starts
+    '''
+
+    offsets = np.array(
+        [[_minutes(start), _minutes(stop)] for start, stop in resolve_timeranges(rule.timeranges)],
+        dtype=np.int64
+    )
+    offsets = np.broadcast_to(offsets, (len(bases),) + offsets.shape)
+    if location is None or not is_solar(rule.timeranges):
+        return offsets
+
+    # Same rounded location as the solar table of the tuple expansion
+    latitude, longitude = SOLAR_TABLE.location_key(*location)
+    offsets = offsets.copy()
+    midnights = bases.astype('datetime64[D]')
+    sunrise, sunset = sun_minutes(latitude, longitude, midnights)
+    # SR & SS are anchored at the day's midnight, not at the rule day start (see anchor_sun_times)
+    time_of_day = (bases - midnights).astype('timedelta64[m]').astype(np.int64)
+    sunrise, sunset = sunrise - time_of_day, sunset - time_of_day
+    sun_bounds = {SUNRISE: sunrise, SUNSET: sunset}
+    for index, trange in enumerate(rule.timeranges):
+        if not is_solar((trange,)):
+            continue
+        # The overnight roll depends on the sun times of each day (see resolve_timeranges)
+        for bound, value in enumerate(trange):
+            offsets[:, index, bound] = sun_bounds[value] if value in sun_bounds else _minutes(value)
+        overnight = offsets[:, index, 1] <= offsets[:, index, 0]
+        offsets[overnight, index, 1] += MINUTES_PER_DAY
+    return offsets
+
+
+def expand_rules_arrays(rules, window_start=None, window_end=None, location=None):
+    '''Expand schedule rules into start & stop arrays
+
+    Args:
+        rules ([list]): the DayRule/DateRule of a schedule (see ScheduleParser)
+        window_start ([datetime], optional): Defaults to None. Only the timeslots stopping after it
+        window_end ([datetime], optional): Defaults to None. Only the timeslots starting before it
+        location ([tuple], optional): Defaults to None. (latitude, longitude) for the SR/SS bounds
+
+    Returns:
+        [tuple]: (starts, stops) datetime64[m] arrays
+    '''
+
+    starts, stops = [], []
+    for rule in rules:
+        if not rule.timeranges:
+            continue
+        bases = _rule_bases(rule, window_start, window_end)
+        offsets = _offsets(rule, bases, location).astype('timedelta64[m]')
+        starts.append((bases[:, np.newaxis] + offsets[:, :, 0]).reshape(-1))
+        stops.append((bases[:, np.newaxis] + offsets[:, :, 1]).reshape(-1))
+
+    if not starts:
+        empty = np.array([], dtype='datetime64[m]')
+        return empty, empty.copy()
+    starts, stops = np.concatenate(starts), np.concatenate(stops)
+
+    keep = np.ones(len(starts), dtype=bool)
+    if window_start is not None:
+        keep &= stops > np.datetime64(window_start, 'm')
+    if window_end is not None:
+        keep &= starts < np.datetime64(window_end, 'm')
+    if not keep.all():
+        starts, stops = starts[keep], stops[keep]
+    return starts, stops
+
+
+def to_tuples(starts, stops):
+    '''Convert start & stop arrays to the list of datetime tupple of ScheduleParser.parse()
+
+    Args:
+        starts ([ndarray]): datetime64 starts
+        stops ([ndarray]): datetime64 stops
+
+    Returns:
+        [list]: list of datetime tupple
+    '''
+
+    return list(zip(starts.astype(object).tolist(), stops.astype(object).tolist()))
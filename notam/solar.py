@@ -0,0 +1,135 @@
+'''NOTAM notam.solar Module
+
+Sunrise & sunset times (UTC) for the SR/SS bounds of the NOTAM schedules.
+
+The times are computed with the NOAA general solar position equations (fractional year,
+equation of time & declination, sunrise/sunset hour angle at -0.833 degree), vectorized with
+NumPy over arrays of dates: the accuracy is about a minute, enough for NOTAM schedules.
+
+The times are minutes from 00:00 UTC of the date. They are not clamped to the UTC day: the
+sunrise & sunset of a date are the ones around its solar noon (720 - 4 * longitude minutes), so
+far from Greenwich they can fall on the previous (east, ex. Sydney: sunrise ~20:50 UTC the day
+before) or the next (west) UTC day. The daylight of consecutive dates never overlaps. When there
+is no sunrise or sunset (polar day/night), the historical values of the parser are used:
+SR = 0000, SS = 2359 of the UTC date.
+
+SolarTable caches the times by rounded location & date.
+'''
+
+from __future__ import absolute_import, division, print_function
+
+import datetime
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Used when the sun does not rise or set
+FALLBACK_SUNRISE = 0
+FALLBACK_SUNSET = 23 * 60 + 59
+
+# Solar zenith angle of the sunrise/sunset (refraction & solar disc radius included)
+SUNRISE_ZENITH = 90.833
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def sun_minutes(latitude, longitude, dates):
+    '''Sunrise & sunset of each date, in minutes from 00:00 UTC
+
+    Args:
+        latitude ([float]): latitude in degree (north positive)
+        longitude ([float]): longitude in degree (east positive)
+        dates ([array-like]): datetime64 (or date/datetime) values
+
+    Returns:
+        [tuple]: (sunrise, sunset) int arrays (negative or above 1439 when on the previous or
+            next UTC day, 0 & 1439 when the sun does not rise or set)
+    '''
+
+    days = np.asarray(dates, dtype='datetime64[D]').reshape(-1)
+    years = days.astype('datetime64[Y]')
+    day_of_year = (days - years).astype(np.int64) + 1
+    year_days = ((years + 1).astype('datetime64[D]') - years.astype('datetime64[D]')).astype(np.int64)
+
+    # Fractional year at noon UTC (radian)
+    gamma = 2 * np.pi / year_days * (day_of_year - 1)
+    eqtime = 229.18 * (0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+                       - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma))
+    declination = (0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+                   - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+                   - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma))
+
+    phi = np.radians(latitude)
+    cos_hour_angle = (np.cos(np.radians(SUNRISE_ZENITH)) / (np.cos(phi) * np.cos(declination))
+                      - np.tan(phi) * np.tan(declination))
+    polar = np.abs(cos_hour_angle) > 1
+    hour_angle = np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1)))
+
+    sunrise = 720 - 4 * (longitude + hour_angle) - eqtime
+    sunset = 720 - 4 * (longitude - hour_angle) - eqtime
+    sunrise = np.where(polar, FALLBACK_SUNRISE, np.round(sunrise))
+    sunset = np.where(polar, FALLBACK_SUNSET, np.round(sunset))
+    return sunrise.astype(np.int64), sunset.astype(np.int64)
+
+
+class SolarTable(object):
+    '''Cache of the sunrise & sunset times by rounded location & date
+
+    Attributes:
+        precision ([int]): number of decimals of the rounded latitude/longitude (1 = ~10km,
+            less than a minute of sunrise shift)
+        maxsize ([int]): maximum number of cached days (the cache is emptied when full)
+    '''
+
+    def __init__(self, precision=1, maxsize=1000000):
+        self.precision = precision
+        self.maxsize = maxsize
+        self._cache = {}
+
+    def location_key(self, latitude, longitude):
+        '''Rounded location used as cache key
+
+        Returns:
+            [tuple]: (latitude, longitude)
+        '''
+
+        return round(latitude, self.precision), round(longitude, self.precision)
+
+    def sun_times(self, latitude, longitude, dates):
+        '''Sunrise & sunset of each date (missing ones computed in one vectorized call)
+
+        Args:
+            latitude ([float]): latitude in degree (north positive)
+            longitude ([float]): longitude in degree (east positive)
+            dates ([list]): date (or datetime) objects
+
+        Returns:
+            [list]: (sunrise, sunset) timedelta from 00:00 UTC of each date (see sun_minutes)
+        '''
+
+        latitude, longitude = self.location_key(latitude, longitude)
+        ordinals = [date.toordinal() for date in dates]
+        missing = sorted(set(ordinal for ordinal in ordinals
+                             if (latitude, longitude, ordinal) not in self._cache))
+        if missing:
+            if len(self._cache) + len(missing) > self.maxsize:
+                self._cache.clear()
+            days = np.array(missing, dtype=np.int64) - _EPOCH_ORDINAL
+            sunrises, sunsets = sun_minutes(latitude, longitude, days.astype('datetime64[D]'))
+            for ordinal, sunrise, sunset in zip(missing, sunrises.tolist(), sunsets.tolist()):
+                self._cache[(latitude, longitude, ordinal)] = (
+                    datetime.timedelta(minutes=sunrise), datetime.timedelta(minutes=sunset)
+                )
+        return [self._cache[(latitude, longitude, ordinal)] for ordinal in ordinals]
+
+    def clear(self):
+        '''Empty the cache
+        '''
+
+        self._cache.clear()
+
+
+# Process wide table used by the schedule expansions
+SOLAR_TABLE = SolarTable()
@@ -7,9 +7,20 @@ import unittest
 import datetime
 import logging
 import ast
+import os
+import runpy
+import shutil
+import tempfile
+import threading
 
-from .sched_parser import ScheduleParser
+from .sched_parser import ScheduleParser, ScheduleLexer, ScheduleCache, fast_rules, get_parser, \
+    build_tables, _lextab_is_current, MONTH
+from .schedule import Schedule
+from .batch import expand_schedules
+from .slot_arrays import to_tuples
 from .notam import Notam
+from .solar import SolarTable
+from .sched_fuzz import ScheduleGrammar, generate_corpus
 
 logger = logging.getLogger(__name__)
 
@@ -84,6 +95,19 @@ class TestScheduleParser(unittest.TestCase):
             )
         )
 
+        tests_data.append(
+            dict(
+                schedule='MAR 12 14 0800-1000 EXC SAT',
+                effective_start=datetime.datetime(2018, 3, 10),
+                effective_end=datetime.datetime(2018, 4, 20),
+                expected_output=
+                [
+                    (datetime.datetime(2018, 3, 14, 8, 0), datetime.datetime(2018, 3, 14, 10, 0)),
+                    (datetime.datetime(2018, 3, 12, 8, 0), datetime.datetime(2018, 3, 12, 10, 0))
+                ]
+            )
+        )
+
         test = ScheduleParser()
         for test_data in tests_data:
             test.parse(
@@ -94,6 +118,403 @@ class TestScheduleParser(unittest.TestCase):
 
             self.assertEqual(test.get_schedule(), test_data['expected_output'])
 
+    def test_shared_tables(self):
+        '''The parsers share the LALR tables but keep their own state
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 3, 25)
+        first = ScheduleParser()
+        daily = first.parse(begin, end, 'DAILY 0700-1500 EXC SAT SUN')
+        second = ScheduleParser()
+        second.parse(begin, end, 'FEB 17 AND 18 0900-1100 1230-1600')
+
+        self.assertIs(first.parser.action, second.parser.action)
+        self.assertIsNot(first.lexer.lexer, second.lexer.lexer)
+        self.assertEqual(first.get_schedule(), daily)
+        self.assertEqual(first.parse(begin, end, 'DAILY 0700-1500 EXC SAT SUN'), daily)
+        self.assertEqual(len(daily), 10)
+
+    def test_stale_lextab(self):
+        '''A generated lexer table is only used when it matches the token rules
+        '''
+
+        directory = tempfile.mkdtemp()
+        try:
+            build_tables(directory)
+            lextab = runpy.run_path(os.path.join(directory, 'sched_lextab.py'))
+        finally:
+            shutil.rmtree(directory)
+        self.assertTrue(_lextab_is_current(lextab))
+
+        master, names = lextab['_lexstatere']['INITIAL'][0]
+        lextab['_lexstatere'] = {'INITIAL': [(master.replace('(?P<t_SUNSET>SS)', '(?P<t_SUNSET>SSX)'), names)]}
+        self.assertFalse(_lextab_is_current(lextab))
+        lextab['_lextokens'] = set(ScheduleLexer.tokens) - set(['EVERY'])
+        self.assertFalse(_lextab_is_current(lextab))
+
+    def test_windowed_expansion(self):
+        '''The lazy expansion yields the parse() timeslots intersecting the window
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 4, 20)
+        window_start, window_end = datetime.datetime(2018, 3, 31, 12), datetime.datetime(2018, 4, 3, 8)
+        test = ScheduleParser()
+        for schedule in ('MON-FRI 0630-1600', 'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000'):
+            expanded = test.parse(begin, end, schedule)
+            self.assertEqual(list(test.iter_slots(begin, end, schedule)), expanded)
+            self.assertEqual(
+                list(test.iter_slots(begin, end, schedule, window_start, window_end)),
+                [slot for slot in expanded if slot[1] > window_start and slot[0] < window_end]
+            )
+
+        # A PERM NOTAM only expands the requested window
+        slots = test.iter_slots(begin, datetime.datetime(2099, 12, 31), 'DAILY 0700-1500',
+                                window_start, window_end)
+        self.assertEqual(len(list(slots)), 4)
+
+class TestConcurrentParsing(unittest.TestCase):
+    '''A ScheduleParser shared by several threads
+    '''
+
+    def test_threads(self):
+        '''Concurrent parsings of a shared parser give the sequential results
+        '''
+
+        begin, end = datetime.datetime(2018, 1, 10), datetime.datetime(2018, 4, 20)
+        schedules = [
+            'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000',
+            'JAN 27 0900-0950 1800-1850, 28 1000-1050, 29 AND 30 1400-1450',
+            'FEB 03 10 19 24 0930-1100, 04 1130-1300 AND 05 11 0730-1300',
+            'MON WED 0800-1000',
+        ]
+        shared = ScheduleParser(fast_path=False)
+        expected = [shared.parse(begin, end, schedule) for schedule in schedules]
+        errors = []
+
+        def worker(index):
+            try:
+                for _ in range(50):
+                    for position in range(len(schedules)):
+                        schedule = schedules[(position + index) % len(schedules)]
+                        result = shared.parse(begin, end, schedule)
+                        if result != expected[schedules.index(schedule)]:
+                            errors.append(schedule)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+        # One parser per thread
+        self.assertIs(get_parser(), get_parser())
+        others = []
+        thread = threading.Thread(target=lambda: others.append(get_parser()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(others[0], get_parser())
+
+class TestSlotArrays(unittest.TestCase):
+    '''NumPy expansion of the schedules
+    '''
+
+    def test_arrays(self):
+        '''Same timeslots as the tuple expansion, as datetime64[m] arrays
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10, 7, 12), datetime.datetime(2018, 4, 20)
+        window_start, window_end = datetime.datetime(2018, 3, 31, 12), datetime.datetime(2018, 4, 3, 8)
+        test = ScheduleParser()
+        for schedule in ('DAILY 0700-1500 EXC SAT SUN', 'MON WED 2200-2359',
+                         'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000'):
+            starts, stops = test.parse_arrays(begin, end, schedule)
+            self.assertEqual(starts.dtype, 'datetime64[m]')
+            self.assertEqual(to_tuples(starts, stops), test.parse(begin, end, schedule))
+            self.assertEqual(
+                to_tuples(*test.parse_arrays(begin, end, schedule, window_start, window_end)),
+                list(test.iter_slots(begin, end, schedule, window_start, window_end))
+            )
+
+        starts, stops = test.parse_arrays(begin, datetime.datetime(2099, 12, 31), 'DAILY 0700-1500')
+        self.assertEqual(len(starts), len(test.parse(begin, datetime.datetime(2099, 12, 31), 'DAILY 0700-1500')))
+        self.assertEqual(len(test.parse_arrays(begin, end, '')[0]), 0)
+
+class TestBatchExpansion(unittest.TestCase):
+    '''Batch expansion of many schedules
+    '''
+
+    def test_batch(self):
+        '''Results in the input order, identical to the parser, with & without process pool
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 4, 20)
+        triples = [
+            ('MON-FRI 0630-1600', begin, end),
+            ('MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000', begin, end),
+            ('MON-FRI  0630-1600', begin, end),
+            ('MON WED 0800-1000', begin, datetime.datetime(2018, 3, 20)),
+            ('FEB 30 0800-1000', begin, end),
+            ('', begin, end),
+        ]
+        parser = ScheduleParser()
+        expected = [tuple(parser.parse(notam_begin, notam_end, schedule))
+                    for schedule, notam_begin, notam_end in triples[:4]]
+        expected.extend([None, ()])
+
+        self.assertEqual(expand_schedules(triples, processes=1), expected)
+        results = expand_schedules(triples * 3, processes=2, chunksize=1)
+        self.assertEqual(results, expected * 3)
+
+class TestFastPath(unittest.TestCase):
+    '''Differential testing of the regex fast path against the PLY parser
+    '''
+
+    def test_fast_path(self):
+        '''Same timeslots with & without the fast path
+        '''
+
+        corpus = [
+            # Fast path shapes
+            'DAILY 0700-1500 EXC SAT SUN', 'DAILY SR-SS', 'DAILY 0530-2100', 'DAILY H24 EXC HOL',
+            'DAILY 0700-1000 1200-SS', 'MON-FRI 0630-1600', 'MON-FRI H24', 'SAT-MON 0800-1000',
+            'MAR 12 0800-1000 1400-1600', 'FEB 28 0800-1000', 'H24', ' DAILY\t0700-1500 ',
+            # PLY only
+            'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000', 'FEB 17 AND 18 0900-1100 1230-1600',
+            'JAN 27 0900-0950 1800-1850, 28 1000-1050, 29 AND 30 1400-1450', 'MON WED 0800-1000',
+        ]
+        fast, ply = ScheduleParser(), ScheduleParser(fast_path=False)
+        windows = [
+            (datetime.datetime(2018, 3, 10, 7, 12), datetime.datetime(2018, 4, 20)),
+            (datetime.datetime(2020, 1, 1), datetime.datetime(2020, 3, 2, 12)),
+        ]
+        for notam_begin, notam_end in windows:
+            for schedule in corpus:
+                self.assertEqual(fast.parse(notam_begin, notam_end, schedule),
+                                 ply.parse(notam_begin, notam_end, schedule), schedule)
+
+        self.assertIsNotNone(fast_rules(windows[0][0], windows[0][1], 'MON-FRI 0630-1600'))
+        self.assertIsNone(fast_rules(windows[0][0], windows[0][1], 'MON WED 0800-1000'))
+        # Invalid date: the parser raises its usual error
+        self.assertIsNone(fast_rules(windows[0][0], windows[0][1], 'FEB 29 0800-1000'))
+        self.assertRaises(ValueError, fast.parse, windows[0][0], windows[0][1], 'FEB 29 0800-1000')
+        # Timeslice without timeslots: no date is built
+        self.assertEqual(fast.parse(windows[0][0], windows[0][1], 'NOV 32 AND'), [])
+
+class TestScheduleCache(unittest.TestCase):
+    '''LRU cache of the parsed schedules
+    '''
+
+    def test_cache(self):
+        '''Identical schedules are parsed once, the least recently used is evicted
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 3, 25)
+        cache = ScheduleCache(maxsize=2)
+        first = cache.parse(begin, end, 'MON-FRI 0700-1600')
+        self.assertIsInstance(first, tuple)
+        self.assertEqual(list(first), ScheduleParser().parse(begin, end, 'MON-FRI 0700-1600'))
+        self.assertIs(cache.parse(begin, end, ' MON-FRI  0700-1600 '), first)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+        cache.parse(begin, end, 'DAILY 0530-2100')
+        cache.parse(begin, end, 'MON-FRI 0700-1600')
+        cache.parse(begin, datetime.datetime(2018, 3, 20), 'MON-FRI 0700-1600')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 3, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 0.4)
+
+        # 'DAILY 0530-2100' was evicted
+        cache.parse(begin, end, 'DAILY 0530-2100')
+        self.assertEqual(cache.stats()['misses'], 4)
+
+class TestSchedule(unittest.TestCase):
+    '''Queries of the rule based Schedule
+    '''
+
+    def test_queries(self):
+        '''is_active, next_activation & active_duration from the rules
+        '''
+
+        begin = datetime.datetime(2018, 3, 10)
+        test = ScheduleParser()
+        schedule = test.schedule(begin, datetime.datetime(2099, 12, 31), 'DAILY 0700-1500 EXC SAT SUN')
+        self.assertIsInstance(schedule, Schedule)
+
+        # Monday 2018/03/12
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 12, 7, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 3, 12, 15, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 3, 17, 10, 0)))
+        self.assertEqual(schedule.next_activation(datetime.datetime(2018, 3, 16, 16, 0)),
+                         datetime.datetime(2018, 3, 19, 7, 0))
+        self.assertEqual(schedule.next_activation(datetime.datetime(2018, 3, 16, 8, 0)),
+                         datetime.datetime(2018, 3, 16, 8, 0))
+        self.assertEqual(schedule.active_duration(datetime.datetime(2018, 3, 12, 12, 0),
+                                                  datetime.datetime(2018, 3, 26, 8, 0)),
+                         datetime.timedelta(hours=3 + 9 * 8 + 1))
+
+        # Same answers as the expanded timeslots
+        schedule = test.schedule(begin, datetime.datetime(2018, 4, 20),
+                                 'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000')
+        expanded = test.parse(begin, datetime.datetime(2018, 4, 20),
+                              'MAR 31-APR 02 0730-1000 1130-1500 AND 03 0730-1000')
+        self.assertEqual(list(schedule.slots()), expanded)
+        self.assertEqual(schedule.active_duration(begin, datetime.datetime(2018, 4, 20)),
+                         sum((stop - start for start, stop in expanded), datetime.timedelta(0)))
+        self.assertIsNone(schedule.next_activation(datetime.datetime(2018, 4, 3, 10, 0)))
+
+    def test_overnight(self):
+        '''An overnight range (2200-0200) ends the next day
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 3, 20)
+        test = ScheduleParser()
+        expanded = test.parse(begin, end, 'DAILY 2200-0200')
+        self.assertEqual(len(expanded), 11)
+        self.assertEqual(expanded[0], (datetime.datetime(2018, 3, 10, 22, 0), datetime.datetime(2018, 3, 11, 2, 0)))
+
+        schedule = test.schedule(begin, end, 'DAILY 2200-0200')
+        self.assertEqual(list(schedule.slots()), expanded)
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 12, 23, 0)))
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 13, 1, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 3, 13, 2, 0)))
+        self.assertEqual(schedule.next_activation(datetime.datetime(2018, 3, 13, 3, 0)),
+                         datetime.datetime(2018, 3, 13, 22, 0))
+        self.assertEqual(schedule.active_duration(begin, expanded[-1][1]), datetime.timedelta(hours=44))
+
+        # Date mode: the next date is checked too
+        schedule = test.schedule(begin, end, 'MAR 12 13 2300-0100')
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 13, 0, 30)))
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 14, 0, 30)))
+        self.assertEqual(schedule.active_duration(begin, end), datetime.timedelta(hours=4))
+
+class TestSolar(unittest.TestCase):
+    '''Sunrise & sunset resolution of the SR/SS bounds
+    '''
+
+    def test_sun_times(self):
+        '''NOAA times, polar fallback & cache
+        '''
+
+        table = SolarTable()
+        # Brussels, summer solstice: 03:29 & 19:59 UTC (published times, +/- 1 minute)
+        (sunrise, sunset), = table.sun_times(50.85, 4.35, [datetime.date(2018, 6, 21)])
+        self.assertLessEqual(abs(sunrise - datetime.timedelta(hours=3, minutes=29)), datetime.timedelta(minutes=2))
+        self.assertLessEqual(abs(sunset - datetime.timedelta(hours=19, minutes=59)), datetime.timedelta(minutes=2))
+        # Polar day: historical 0000-2359
+        self.assertEqual(table.sun_times(78.2, 15.6, [datetime.date(2018, 6, 21)])[0],
+                         (datetime.timedelta(0), datetime.timedelta(hours=23, minutes=59)))
+        self.assertEqual(len(table._cache), 2)
+        table.sun_times(50.8512, 4.3488, [datetime.date(2018, 6, 21)])
+        self.assertEqual(len(table._cache), 2)
+
+    def test_solar_schedule(self):
+        '''Same SR/SS timeslots for the expansions & the Schedule, fallback without location
+        '''
+
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 4, 20)
+        location = (50.9, 4.48)
+        test = ScheduleParser()
+        for schedule in ('DAILY SR-SS', 'MON-FRI SR-1200 1400-SS', 'MAR 12 AND 14 SR-1000'):
+            expected = test.parse(begin, end, schedule, location)
+            self.assertEqual(ScheduleParser(fast_path=False).parse(begin, end, schedule, location), expected)
+            self.assertEqual(to_tuples(*test.parse_arrays(begin, end, schedule, None, None, location)), expected)
+            self.assertEqual(list(test.schedule(begin, end, schedule, location).slots()), expected)
+
+        slots = test.parse(begin, end, 'DAILY SR-SS', location)
+        sun_times = SolarTable().sun_times(location[0], location[1], [begin.date()])[0]
+        self.assertEqual(slots[0], (begin + sun_times[0], begin + sun_times[1]))
+        schedule = test.schedule(begin, end, 'DAILY SR-SS', location)
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 3, 10, 12, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 3, 10, 5, 0)))
+        self.assertEqual(schedule.active_duration(begin, end + datetime.timedelta(days=1)),
+                         sum((stop - start for start, stop in slots), datetime.timedelta(0)))
+
+        self.assertEqual(test.parse(begin, end, 'DAILY SR-SS')[0],
+                         (begin, datetime.datetime(2018, 3, 10, 23, 59)))
+        self.assertEqual(expand_schedules([('DAILY SR-SS', begin, end, location), ('DAILY SR-SS', begin, end)],
+                                          processes=1),
+                         [tuple(slots), tuple(test.parse(begin, end, 'DAILY SR-SS'))])
+
+    def test_solar_anchoring(self):
+        '''SR/SS anchored at the UTC midnight of the day, on the previous UTC day east of Greenwich
+        '''
+
+        test = ScheduleParser()
+        # Day mode with a notam_begin after midnight (Brussels)
+        begin = datetime.datetime(2018, 6, 21, 7, 30)
+        end = begin + datetime.timedelta(days=10)
+        location = (50.85, 4.35)
+        slots = test.parse(begin, end, 'DAILY SR-SS', location)
+        self.assertEqual(slots[0], (datetime.datetime(2018, 6, 21, 3, 28), datetime.datetime(2018, 6, 21, 20, 0)))
+        schedule = test.schedule(begin, end, 'DAILY SR-SS', location)
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 6, 21, 8, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 6, 22, 2, 0)))
+        self.assertEqual(to_tuples(*test.parse_arrays(begin, end, 'DAILY SR-SS', None, None, location)), slots)
+        # Hours stay offsets from the rule day start
+        self.assertEqual(test.parse(begin, end, 'DAILY SR-1200', location)[0],
+                         (datetime.datetime(2018, 6, 21, 3, 28), datetime.datetime(2018, 6, 21, 19, 30)))
+
+        # Sydney: the sunrise is on the previous UTC day
+        begin = datetime.datetime(2018, 6, 21)
+        end = begin + datetime.timedelta(days=10)
+        location = (-33.87, 151.21)
+        for schedule in ('DAILY SR-SS', 'JUN 22 AND 25 SR-SS'):
+            slots = test.parse(begin, end, schedule, location)
+            self.assertEqual(to_tuples(*test.parse_arrays(begin, end, schedule, None, None, location)), slots)
+            self.assertEqual(list(test.schedule(begin, end, schedule, location).slots()), slots)
+        slots = test.parse(begin, end, 'DAILY SR-SS', location)
+        self.assertEqual(slots[0], (datetime.datetime(2018, 6, 20, 21, 0), datetime.datetime(2018, 6, 21, 6, 53)))
+        schedule = test.schedule(begin, end, 'DAILY SR-SS', location)
+        self.assertTrue(schedule.is_active(datetime.datetime(2018, 6, 20, 22, 0)))
+        self.assertFalse(schedule.is_active(datetime.datetime(2018, 6, 21, 12, 0)))
+        self.assertEqual(schedule.next_activation(datetime.datetime(2018, 6, 21, 12, 0)),
+                         datetime.datetime(2018, 6, 21, 21, 0))
+        self.assertEqual(schedule.active_duration(begin - datetime.timedelta(days=1), end + datetime.timedelta(days=1)),
+                         sum((stop - start for start, stop in slots), datetime.timedelta(0)))
+
+class TestScheduleFuzz(unittest.TestCase):
+    '''Grammar based corpus of schedules
+    '''
+
+    def test_corpus(self):
+        '''Reproducible corpus, valid cases lexed as generated, same results with & without fast path
+        '''
+
+        corpus = list(generate_corpus(300, seed=1))
+        self.assertEqual(corpus, list(generate_corpus(300, seed=1)))
+        self.assertEqual(set(case.shape for case in corpus), set(ScheduleGrammar().shapes))
+        self.assertIn('DAILY timeslots exclusion', ScheduleGrammar().shapes)
+        # drop & swap only on schedules of 2 tokens or more (ex. not on 'H24')
+        self.assertTrue(all(len(case.tokens) > 1 for case in corpus if case.kind in ('drop', 'swap')))
+        # Some month ranges cross the year end
+        ranges = [case.schedule.split()[:5] for case in corpus
+                  if case.kind == 'valid' and case.shape == 'MONTH DATE RANGE MONTH DATE timeslots']
+        self.assertTrue(any((MONTH[first], int(date1)) > (MONTH[last], int(date2))
+                            for first, date1, _, last, date2 in ranges))
+
+        lexer = ScheduleLexer().lexer
+        fast, ply = ScheduleParser(), ScheduleParser(fast_path=False)
+        begin, end = datetime.datetime(2018, 3, 10), datetime.datetime(2018, 6, 30)
+
+        def parse(parser, schedule):
+            try:
+                return parser.parse(begin, end, schedule)
+            except Exception as exc:
+                return type(exc)
+
+        logging.disable(logging.ERROR)
+        try:
+            for case in corpus:
+                if case.kind == 'valid':
+                    lexer.input(case.schedule)
+                    self.assertEqual(tuple(token.type for token in iter(lexer.token, None)), case.tokens)
+                self.assertEqual(parse(fast, case.schedule), parse(ply, case.schedule), case.schedule)
+        finally:
+            logging.disable(logging.NOTSET)
+
 class TestNotam(unittest.TestCase):
 
     def test_notam(self):
@@ -106,6 +527,10 @@ class TestNotam(unittest.TestCase):
         self.assertEqual(notam.icao, 'LFFF')
         self.assertEqual(notam.fl_lower, '005')
         self.assertEqual(notam.reference, 'R0576/18')
+        self.assertAlmostEqual(notam.latitude, 48 + 37 / 60)
+        self.assertAlmostEqual(notam.longitude, 2 + 40 / 60)
+        self.assertEqual(notam.radius, 3)
+        self.assertEqual(notam.location, (notam.latitude, notam.longitude))
 
 
 if __name__ == '__main__':